@@ -1,9 +1,18 @@
+from Manager.app.models.catalog import CATALOG
+
 from pydantic import BaseModel, Field, model_validator
-from typing import Optional, List
+from typing import Optional, List, NamedTuple, Set
 from datetime import date, time
 from collections import defaultdict, Counter
 import uuid
 
+def _drinkDicts(values: dict) -> List[dict]:
+    '''The drinks of raw order input that are objects, anything else is left for validation to reject'''
+    drinks = values.get('drinks')
+    if not isinstance(drinks, list):
+        return []
+    return [drink for drink in drinks if isinstance(drink, dict)]
+
 class Drink(BaseModel):
     orderID: Optional[str]
     drink: str 
@@ -17,11 +26,16 @@ class Drink(BaseModel):
     identifier: Optional[str] = Field(default_factory = lambda: f'_id_{str(uuid.uuid4())}', init = False)
     timeReceived: Optional[time]
     timeComplete: Optional[time]
+    # Catalog codes, stamped on validation and never serialised, see Manager.app.models.catalog
+    batchKey: int = Field(default = -1, exclude = True)
+    optionBits: int = Field(default = 0, exclude = True)
 
     def __init__(self, **data):
         super().__init__(**data)
         if not data.get('identifier'):
             object.__setattr__(self, 'identifier', f'_id_{str(uuid.uuid4())}')
+        object.__setattr__(self, 'batchKey', CATALOG.key(self.milk, self.texture))
+        object.__setattr__(self, 'optionBits', CATALOG.optionBits(self.options))
 
     def __hash__(self):
         return hash(self.identifier)
@@ -98,9 +112,10 @@ class Order(BaseModel):
     @model_validator(mode = 'before')
     @classmethod
     def check_drinkOwner(cls, values):
+        if not isinstance(values, dict):
+            return values
         customer = values.get('customer')
-        drinks = values.get('drinks', [])
-        for drink in drinks:
+        for drink in _drinkDicts(values):
             if drink.get('customer') is None:
                 drink['customer'] = customer
         return values
@@ -108,9 +123,10 @@ class Order(BaseModel):
     @model_validator(mode = 'before')
     @classmethod
     def check_drinkOrderID(cls, values):
+        if not isinstance(values, dict):
+            return values
         orderID = values.get('orderID')
-        drinks = values.get('drinks', [])
-        for drink in drinks:
+        for drink in _drinkDicts(values):
             if drink.get('orderID') is None:
                 drink['orderID'] = orderID
         return values
@@ -118,9 +134,10 @@ class Order(BaseModel):
     @model_validator(mode = 'before')
     @classmethod
     def check_drinkTime(cls, values):
+        if not isinstance(values, dict):
+            return values
         order_time = values.get('timeReceived')
-        drinks = values.get('drinks', [])
-        for drink in drinks:
+        for drink in _drinkDicts(values):
             if drink.get('timeReceived') is None:
                 drink['timeReceived'] = order_time
         return values
@@ -129,9 +146,88 @@ class Order(BaseModel):
         drink_groups = defaultdict(list)
 
         for drink in self.drinks:
-            if drink.milk:
-                key = (drink.milk, drink.texture)
-                drink_groups[key].append(drink)
+            # Milks that aren't configured share one key, they can't go in a jug together
+            if drink.milk and drink.batchKey != CATALOG.otherKey:
+                drink_groups[drink.batchKey].append(drink)
         
         return list(drink_groups.values())
-    
\ No newline at end of file
+    
+
+class Completion(NamedTuple):
+    '''
+    Drinks, and the orders they finished, completed together at one time.
+
+    Attributes:
+    - time: time - timeComplete written to every drink and order
+    - drinkIDs: Set[str] - Identifiers of the completed drinks
+    - orderIDs: Set[str] - Orders whose last pending drink was completed
+    '''
+    time: time
+    drinkIDs: Set[str]
+    orderIDs: Set[str]
+
+
+class Station(BaseModel):
+    '''
+    One espresso machine and the barista working it.
+
+    Attributes:
+    - name: str - Name shown on the station's tablet
+    - groups: int - Group heads, i.e. shot pulls that can run at once
+    - steam_wands: int - Jugs of milk that can be steamed at once
+    - jug_size: float - Largest milk volume one jug holds, in the same units as Drink.milk_volume
+    '''
+    name: str
+    groups: int = 2
+    steam_wands: int = 1
+    jug_size: float = 5
+
+
+class ShotGroup(BaseModel):
+    '''
+    Shots ground from the same hopper with the same shot count, pulled one after another.
+
+    Attributes:
+    - grinder: str - "regular" or "decaf"
+    - shots: int - Shots per drink
+    - drinkIDs: List[str] - Identifiers of the drinks the shots are for, in queue order
+    '''
+    grinder: str
+    shots: int
+    drinkIDs: List[str]
+
+
+class Jug(BaseModel):
+    '''
+    One jug of milk steamed for one or more drinks.
+
+    Attributes:
+    - milk: str - Milk type
+    - texture: str - Milk texture
+    - volume: float - Milk in the jug, in the same units as Drink.milk_volume
+    - drinkIDs: List[str] - Identifiers of the drinks poured from the jug
+    '''
+    milk: str
+    texture: Optional[str]
+    volume: float
+    drinkIDs: List[str]
+
+
+class StationPlan(BaseModel):
+    '''
+    What a station makes next: its jugs of milk and shot pulls for the next few items assigned to it.
+
+    Attributes:
+    - station: str - Station name
+    - indexes: List[int] - Queue indexes of the items the plan covers
+    - jugs: List[Jug] - Jugs to steam, in queue order
+    - shots: List[ShotGroup] - Shot pulls in the order to make them
+    - grinderSwitches: int - Hopper changes when pulling in plan order
+    - queueOrderSwitches: int - Hopper changes when pulling drink by drink in queue order
+    '''
+    station: str
+    indexes: List[int]
+    jugs: List[Jug]
+    shots: List[ShotGroup]
+    grinderSwitches: int
+    queueOrderSwitches: int
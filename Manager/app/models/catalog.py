@@ -0,0 +1,85 @@
+'''
+Small integer codes for the categorical values drinks are batched and filtered on.
+
+Every Drink is stamped with CATALOG codes when it is validated: batchKey, one code per (milk, texture) pair,
+and optionBits, one bit per option. The Queue's lookupTable, batching and grouping then compare integers
+instead of building and comparing strings for every drink.
+
+Codes are only ever added, never reassigned, so codes already held by drinks stay valid when config.json is
+reloaded. load() compiles the configured milks, textures and options, in config order. Once a config has been
+loaded nothing else is interned, values come from clients: a drink with a milk and texture that aren't
+configured gets otherKey, which is never batched, and options that aren't configured all share the OTHER bit.
+Until then, e.g. for codes taken at import, every value is interned the first time it is used.
+'''
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+
+OTHER = '(other)'
+NO_MILK = 'No Milk'
+
+class Catalog:
+    '''
+    Attributes:
+    - keys: Dict[Tuple[str, str], int] - Batching key of every (milk, texture) pair interned
+    - names: List[str] - "milk_texture" name of every batching key, indexed by key
+    - bits: Dict[str, int] - Bit of every option interned
+    - loaded: bool - Whether a config has been loaded, from then on only configured values are interned
+    '''
+    def __init__(self):
+        self.keys: Dict[Tuple[Optional[str], Optional[str]], int] = {}
+        self.names: List[str] = []
+        self.bits: Dict[str, int] = {}
+        self.loaded = False
+
+    def load(self, milks: Iterable[str], textures: Iterable[str], options: Iterable[str]) -> List[int]:
+        'Interns the configured values. Returns the batching keys of every configured milk and texture.'
+        milks, textures = list(milks), list(textures)
+        for option in [*options, OTHER]:
+            self._bit(option)
+        configured = [self._key(milk, texture) for milk, texture in product(milks, textures)]
+        # Drinks without milk or without a texture are never batched, but keep a key of their own
+        for milk in [*milks, NO_MILK, None]:
+            self._key(milk, None)
+        self._key(OTHER, OTHER)
+        self.loaded = True
+        return configured
+
+    @property
+    def otherKey(self) -> int:
+        'Batching key of every milk and texture that is not configured'
+        return self._key(OTHER, OTHER)
+
+    def key(self, milk: Optional[str], texture: Optional[str]) -> int:
+        'Batching key of drinks with this milk and texture'
+        code = self.keys.get((milk, texture))
+        if code is None:
+            code = self.otherKey if self.loaded else self._key(milk, texture)
+        return code
+
+    def _key(self, milk: Optional[str], texture: Optional[str]) -> int:
+        code = self.keys.get((milk, texture))
+        if code is None:
+            code = self.keys[(milk, texture)] = len(self.names)
+            self.names.append(f"{milk}_{texture}")
+        return code
+
+    def bit(self, option: str) -> int:
+        "Bit of option in a drink's optionBits"
+        bit = self.bits.get(option)
+        if bit is None:
+            bit = self._bit(OTHER if self.loaded else option)
+        return bit
+
+    def _bit(self, option: str) -> int:
+        bit = self.bits.get(option)
+        if bit is None:
+            bit = self.bits[option] = 1 << len(self.bits)
+        return bit
+
+    def optionBits(self, options: Iterable[str]) -> int:
+        bits = 0
+        for option in options:
+            bits |= self.bit(option)
+        return bits
+
+CATALOG = Catalog()
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, String, Integer, Float, Time, Date
+from sqlalchemy import ForeignKey, Index, String, Integer, Float, Time, Date
 from sqlalchemy.orm import relationship, Mapped, mapped_column, DeclarativeBase
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
@@ -12,7 +12,8 @@ class Base(DeclarativeBase):
 
 class Orders(Base):
     __tablename__ = 'orders'
-    
+    __table_args__ = (Index('ix_orders_received', 'dateReceived', 'timeReceived'),)
+
     orderID: Mapped[str] = mapped_column(String, primary_key=True)
     customer: Mapped[str] = mapped_column(String)
     dateReceived: Mapped[date] = mapped_column(Date)
@@ -28,7 +29,7 @@ class Drinks(Base):
     __tablename__ = 'drinks'
     
     identifier: Mapped[str] = mapped_column(String, primary_key=True)
-    orderID: Mapped[Optional[str]] = mapped_column(String, ForeignKey('orders.orderID', ondelete="CASCADE"))
+    orderID: Mapped[Optional[str]] = mapped_column(String, ForeignKey('orders.orderID', ondelete="CASCADE"), index=True)
     drink: Mapped[str] = mapped_column(String)
     milk: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     milk_volume: Mapped[float] = mapped_column(Float, nullable = True)
@@ -49,10 +50,14 @@ class Database:
         self.engine = engine
 
     @classmethod
-    async def init_db(cls, URI: str) -> None:
-        engine = create_async_engine(URI, echo=True)
+    async def init_db(cls, URI: str, echo: bool = False) -> None:
+        engine = create_async_engine(URI, echo = echo)
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            # create_all skips tables that already exist, indexes added since are created on their own
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    await conn.run_sync(index.create, checkfirst=True)
         return cls(URI, engine)
 
     async def getSession(self) -> AsyncSession:
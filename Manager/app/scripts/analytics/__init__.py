@@ -0,0 +1,175 @@
+from Manager.app.models import Drink, Order
+
+from collections import Counter
+from datetime import datetime, date, time, timedelta
+from typing import List, Optional
+import math
+
+BUCKET_SECONDS = 3600
+BUCKETS_PER_DAY = 86400 // BUCKET_SECONDS
+
+class QuantileSketch:
+    '''
+    Streaming quantile estimator with bounded relative error.
+
+    Values are counted into logarithmically spaced buckets so memory depends on the range of values seen,
+    not on how many were added. Any quantile is reported within `relative_accuracy` of the true value.
+
+    Attributes:
+    - relative_accuracy: float - Maximum relative error of a reported quantile
+    - count: int - Number of values added
+    - total: float - Sum of values added, used for the mean
+    '''
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Counter = Counter()
+        self._zeros: int = 0
+        self.count: int = 0
+        self.total: float = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value <= 0:
+            self._zeros += 1
+        else:
+            self._buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self._buckets) / (self._gamma + 1)
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+class Rollups:
+    '''
+    Incrementally maintained throughput statistics for the current day.
+
+    Every counter is updated as orders arrive and drinks are completed, so reading a summary
+    costs the same whether one order or ten thousand have passed through the queue. The first event
+    of a later day resets every counter, events of an earlier day than the one covered are not counted.
+
+    Attributes:
+    - day: date - The day the rollups cover, that of the first event since they were last reset
+    - ordersReceived: List[int] - Orders received per hourly bucket
+    - drinksReceived: List[int] - Drinks received per hourly bucket
+    - drinksComplete: List[int] - Drinks completed per hourly bucket
+    - drinksByMilk: Counter - Completed drinks per milk type
+    - drinksByStation: Counter - Completed drinks per station, for completions made from a station view
+    - batchSizes: Counter - Number of drinks completed together from one Batch
+    - waitTimes: QuantileSketch - Seconds from timeReceived to timeComplete per drink
+    '''
+    def __init__(self):
+        self.reset()
+
+    def reset(self, day: Optional[date] = None) -> None:
+        'Empties every counter, to cover day'
+        self.day: Optional[date] = day
+        self.ordersReceived: List[int] = [0] * BUCKETS_PER_DAY
+        self.drinksReceived: List[int] = [0] * BUCKETS_PER_DAY
+        self.drinksComplete: List[int] = [0] * BUCKETS_PER_DAY
+        self.drinksByMilk: Counter = Counter()
+        self.drinksByStation: Counter = Counter()
+        self.batchSizes: Counter = Counter()
+        self.waitTimes: QuantileSketch = QuantileSketch()
+        self.firstReceived: Optional[time] = None
+        self.lastComplete: Optional[time] = None
+
+    @staticmethod
+    def bucket(t: time) -> int:
+        return (t.hour * 3600 + t.minute * 60 + t.second) // BUCKET_SECONDS
+
+    @staticmethod
+    def _seconds_between(start: time, end: time) -> float:
+        delta = datetime.combine(date.min, end) - datetime.combine(date.min, start)
+        if delta < timedelta(0):
+            # Completed after midnight
+            delta += timedelta(days = 1)
+        return delta.total_seconds()
+
+    def _covers(self, day: Optional[date]) -> bool:
+        'Whether an event of day is counted, resetting the rollups first if it is a later day. None is the day covered.'
+        if day is None or day == self.day:
+            return True
+        if self.day is not None and day < self.day:
+            return False
+        self.reset(day)
+        return True
+
+    def recordOrder(self, order: Order) -> None:
+        '''Counts a newly received order and its drinks against the hour it was received in.'''
+        if not self._covers(order.dateReceived):
+            return
+        bucket = self.bucket(order.timeReceived)
+        self.ordersReceived[bucket] += 1
+        self.drinksReceived[bucket] += len(order.drinks)
+        if self.firstReceived is None or order.timeReceived < self.firstReceived:
+            self.firstReceived = order.timeReceived
+
+    def recordDrinksReceived(self, count: int, received: time, day: Optional[date] = None) -> None:
+        '''Counts drinks of an order already counted without them, e.g. those completed before a reload.'''
+        if self._covers(day):
+            self.drinksReceived[self.bucket(received)] += count
+
+    def recordDrinkComplete(self, drink: Drink, station: Optional[str] = None, day: Optional[date] = None) -> None:
+        '''Counts a completed drink and its wait time. The drink must have timeComplete set, on day.'''
+        if not self._covers(day):
+            return
+        self.drinksComplete[self.bucket(drink.timeComplete)] += 1
+        self.drinksByMilk[drink.milk] += 1
+        if station:
+            self.drinksByStation[station] += 1
+        if drink.timeReceived:
+            self.waitTimes.add(self._seconds_between(drink.timeReceived, drink.timeComplete))
+        if self.lastComplete is None or drink.timeComplete > self.lastComplete:
+            self.lastComplete = drink.timeComplete
+
+    def recordBatchComplete(self, size: int, day: Optional[date] = None) -> None:
+        if self._covers(day):
+            self.batchSizes[size] += 1
+
+    def summary(self) -> dict:
+        total_complete = sum(self.drinksComplete)
+        drinks_per_hour = None
+        if self.firstReceived and self.lastComplete:
+            elapsed = self._seconds_between(self.firstReceived, self.lastComplete)
+            if elapsed > 0:
+                drinks_per_hour = total_complete * 3600 / elapsed
+
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'ordersReceived': sum(self.ordersReceived),
+            'drinksReceived': sum(self.drinksReceived),
+            'drinksComplete': total_complete,
+            'drinksPerHour': drinks_per_hour,
+            'waitSeconds': {
+                'mean': self.waitTimes.mean(),
+                'p50': self.waitTimes.quantile(0.5),
+                'p95': self.waitTimes.quantile(0.95),
+            },
+            'drinksByMilk': dict(self.drinksByMilk),
+            'drinksByStation': dict(self.drinksByStation),
+            'batchSizes': {str(size): n for size, n in sorted(self.batchSizes.items())},
+            'hourly': [
+                {
+                    'hour': hour,
+                    'ordersReceived': self.ordersReceived[hour],
+                    'drinksReceived': self.drinksReceived[hour],
+                    'drinksComplete': self.drinksComplete[hour],
+                }
+                for hour in range(BUCKETS_PER_DAY) if self.drinksReceived[hour] or self.drinksComplete[hour]
+            ],
+        }
@@ -0,0 +1,293 @@
+'''
+The day's completed drinks as fixed-width columns in memory-mapped files.
+
+Queue.orderHistory keeps a pydantic Order for each recent order, and walking it costs an attribute lookup
+per field per drink. DrinkLog keeps one row per completed drink instead, one file per column, so counts and
+filters scan flat arrays:
+
+    received, completed, wait   float64 - epoch seconds, and seconds waited
+    shots, milk, texture,       uint8   - small integer codes, 0 for None, see codes.json
+    drink, station
+    options                     uint64  - one bit per option, see codes.json
+
+A day is a directory, e.g. database.history/2024-05-01/, holding <column>.col files and codes.json, the
+values behind each code in the order they were first seen. Files are headerless arrays in native byte order,
+so numpy.memmap reads a column directly, but nothing here needs numpy: rows are appended in completion order,
+so time ranges are a bisect of the completed column, and every other filter is a mask built with
+bytes.translate over the column's bytes, or over one byte of each options value, and combined as one int, a
+C-speed scan with no Python objects per row. Wait quantiles are the exception, they sort the selected waits
+as a list of floats. At most 255 values are coded per column per day, and 64 options: the values come from
+orders, so once a column is full its last code stands for OTHER, every value not seen before.
+
+The log is derived from completions, the journal and the database stay authoritative, so completions are
+only added once they are committed. Rows, and any new codes, are flushed to the OS after every completion,
+not fsynced. codes.json is replaced whole, by renaming a temporary file over it, so it is never half written.
+'''
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Tuple
+import json, mmap, os, sys
+
+COLUMNS: Dict[str, str] = {
+    'received': 'd',
+    'completed': 'd',
+    'wait': 'd',
+    'shots': 'B',
+    'milk': 'B',
+    'texture': 'B',
+    'drink': 'B',
+    'station': 'B',
+    'options': 'Q'
+}
+ITEMSIZE: Dict[str, int] = {column: array(kind).itemsize for column, kind in COLUMNS.items()}
+CODED = ('milk', 'texture', 'drink', 'station')
+MAX_CODES = 255
+MAX_OPTIONS = 64
+OTHER = '(other)'
+
+def _quantile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Selection:
+    '''
+    Rows of a DrinkLog matching some filters.
+
+    Attributes:
+    - start, stop: int - Row range, from the time filters
+    - mask: int - Bit 8 * i set where row start + i matched every other filter, None if there were none
+    '''
+    def __init__(self, start: int, stop: int, mask: Optional[int] = None):
+        self.start = start
+        self.stop = stop
+        self.mask = mask
+
+    def __len__(self) -> int:
+        if self.mask is None:
+            return self.stop - self.start
+        return self.mask.bit_count()
+
+    def selectors(self) -> bytes:
+        'One byte per row in the range, 1 where the row is selected'
+        return self.mask.to_bytes(self.stop - self.start, 'little')
+
+
+class DrinkLog:
+    '''
+    Attributes:
+    - directory: str - Holds one directory per day
+    - day: date - The day being written and read
+    - codes: Dict[str, List] - Values behind the codes of each coded column, and option names by bit
+    - rows: int - Rows written today
+    '''
+    def __init__(self, directory: str, day: Optional[date] = None):
+        self.directory = directory
+        self.day: Optional[date] = None
+        self.codes: Dict[str, List] = {}
+        self.rows: int = 0
+        self._files: Dict[str, object] = {}
+        self._maps: Dict[str, Tuple[int, mmap.mmap]] = {}
+        self._codesChanged = False
+        self.openDay(day or date.today())
+
+    @classmethod
+    def forDatabase(cls, URI: str) -> Optional['DrinkLog']:
+        'The drink log next to the SQLite database at URI, e.g. database.history/, None for in-memory databases'
+        if ':memory:' in URI:
+            return None
+        root, _ = os.path.splitext(URI.split(':///', 1)[1])
+        return cls(root + '.history')
+
+    @property
+    def dayDirectory(self) -> str:
+        return os.path.join(self.directory, self.day.isoformat())
+
+    def openDay(self, day: date) -> None:
+        'Switches to the files of day, creating them if needed'
+        self.close()
+        self.day = day
+        os.makedirs(self.dayDirectory, exist_ok = True)
+        codes_path = os.path.join(self.dayDirectory, 'codes.json')
+        if os.path.exists(codes_path):
+            with open(codes_path) as f:
+                self.codes = json.load(f)
+        else:
+            self.codes = {column: [None] for column in CODED}
+            self.codes['options'] = []
+        self._codeIndex = {column: {value: i for i, value in enumerate(values)} for column, values in self.codes.items()}
+
+        self._files = {column: open(self._path(column), 'a+b') for column in COLUMNS}
+        # Rows every column has, a torn append leaves some columns a row ahead
+        self.rows = min(os.path.getsize(self._path(column)) // ITEMSIZE[column] for column in COLUMNS)
+        for column in COLUMNS:
+            self._files[column].truncate(self.rows * ITEMSIZE[column])
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.dayDirectory, f'{column}.col')
+
+    def _code(self, column: str, value) -> int:
+        index = self._codeIndex[column]
+        code = index.get(value)
+        if code is None:
+            limit = MAX_OPTIONS if column == 'options' else MAX_CODES
+            if len(self.codes[column]) >= limit - 1:
+                # The last code is kept for OTHER
+                value = OTHER
+                code = index.get(value)
+                if code is not None:
+                    return code
+            code = index[value] = len(self.codes[column])
+            self.codes[column].append(value)
+            # Written out with the rows, see flush
+            self._codesChanged = True
+        return code
+
+    def _optionBits(self, options: Iterable[str]) -> int:
+        bits = 0
+        for option in options:
+            bits |= 1 << self._code('options', option)
+        return bits
+
+    ######################################################### WRITING ########################################################
+    def append(self, received: datetime, completed: datetime, drink, station: Optional[str] = None) -> None:
+        'Adds a completed drink, received and completed at those times, to the day it was completed'
+        if completed.date() != self.day:
+            self.openDay(completed.date())
+        row = {
+            'received': received.timestamp(),
+            'completed': completed.timestamp(),
+            'wait': (completed - received).total_seconds(),
+            'shots': min(drink.shots, 255),
+            'milk': self._code('milk', drink.milk),
+            'texture': self._code('texture', drink.texture),
+            'drink': self._code('drink', drink.drink),
+            'station': self._code('station', station),
+            'options': self._optionBits(drink.options)
+        }
+        for column, kind in COLUMNS.items():
+            self._files[column].write(array(kind, [row[column]]).tobytes())
+        self.rows += 1
+
+    def flush(self) -> None:
+        if self._codesChanged:
+            path = os.path.join(self.dayDirectory, 'codes.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.codes, f)
+            os.replace(path + '.tmp', path)
+            self._codesChanged = False
+        for f in self._files.values():
+            f.flush()
+
+    def close(self) -> None:
+        if self._files:
+            self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files, self._maps = {}, {}
+
+    ######################################################### READING ########################################################
+    def _bytes(self, column: str) -> memoryview:
+        'The column as written so far, mapped read-only and remapped when it has grown'
+        size = self.rows * ITEMSIZE[column]
+        mapped = self._maps.get(column)
+        if mapped is None or mapped[0] < size:
+            # The old map is left to be collected, views of it may still be held
+            self.flush()
+            if not size:
+                return memoryview(b'')
+            mapped = self._maps[column] = (size, mmap.mmap(self._files[column].fileno(), size, access = mmap.ACCESS_READ))
+        return memoryview(mapped[1])[:size]
+
+    def column(self, column: str) -> memoryview:
+        "The column's values, e.g. sum(log.column('wait')), without copying them"
+        return self._bytes(column).cast(COLUMNS[column])
+
+    def select(self,
+               since: Optional[datetime] = None,
+               until: Optional[datetime] = None,
+               **filters) -> Selection:
+        '''
+        Rows completed in [since, until) whose coded columns (milk, texture, drink, station) equal the values
+        given, and whose options include every option in `options`.
+        '''
+        completed = self.column('completed')
+        start = bisect_left(completed, since.timestamp()) if since else 0
+        stop = bisect_left(completed, until.timestamp()) if until else self.rows
+        stop = max(start, stop)
+
+        mask: Optional[int] = None
+        for column, value in filters.items():
+            if column == 'options':
+                matches = self._optionsMask(value, start, stop)
+            else:
+                code = self._codeIndex[column].get(value)
+                if code is None:
+                    return Selection(start, start)
+                matches = self._mask(column, code, start, stop)
+            mask = matches if mask is None else mask & matches
+        return Selection(start, stop, mask)
+
+    def _mask(self, column: str, code: int, start: int, stop: int) -> int:
+        'Bit 8 * i set where row start + i of a coded column is code'
+        table = bytearray(256)
+        table[code] = 1
+        return int.from_bytes(self._bytes(column)[start:stop].tobytes().translate(table), 'little')
+
+    def _optionsMask(self, options: Iterable[str], start: int, stop: int) -> int:
+        'Bit 8 * i set where row start + i has every option, testing one byte of each value per byte of options'
+        bits: Dict[int, int] = {}
+        for option in options:
+            code = self._codeIndex['options'].get(option)
+            if code is None:
+                return 0
+            bits[code // 8] = bits.get(code // 8, 0) | 1 << code % 8
+
+        size = ITEMSIZE['options']
+        values = self._bytes('options')[start * size:stop * size].tobytes()
+        mask = int.from_bytes(b'\x01' * (stop - start), 'little')
+        for index, required in bits.items():
+            table = bytes(1 if value & required == required else 0 for value in range(256))
+            offset = index if sys.byteorder == 'little' else size - 1 - index
+            mask &= int.from_bytes(values[offset::size].translate(table), 'little')
+        return mask
+
+    def count(self, since: Optional[datetime] = None, until: Optional[datetime] = None, **filters) -> int:
+        return len(self.select(since, until, **filters))
+
+    def values(self, column: str, selection: Selection) -> List:
+        values = self.column(column)[selection.start:selection.stop]
+        if selection.mask is None:
+            return values.tolist()
+        return list(compress(values, selection.selectors()))
+
+    def countBy(self, column: str, selection: Selection) -> Dict:
+        'Rows of the selection per value of a coded column'
+        if selection.mask is None:
+            counts = Counter(self._bytes(column)[selection.start:selection.stop].tobytes())
+            return {self.codes[column][code]: n for code, n in counts.items()}
+        counts = {}
+        for code, value in enumerate(self.codes[column]):
+            n = (self._mask(column, code, selection.start, selection.stop) & selection.mask).bit_count()
+            if n:
+                counts[value] = n
+        return counts
+
+    def summary(self, since: Optional[datetime] = None, until: Optional[datetime] = None, **filters) -> dict:
+        selection = self.select(since, until, **filters)
+        waits = sorted(self.values('wait', selection))
+        return {
+            'day': self.day.isoformat(),
+            'drinks': len(waits),
+            'waitSeconds': {
+                'mean': sum(waits) / len(waits) if waits else None,
+                'p50': _quantile(waits, 0.5),
+                'p95': _quantile(waits, 0.95)
+            },
+            'drinksByMilk': self.countBy('milk', selection),
+            'drinksByStation': {k: v for k, v in self.countBy('station', selection).items() if k is not None}
+        }
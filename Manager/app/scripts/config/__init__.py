@@ -0,0 +1,153 @@
+'''
+Typed, cached view of Manager/config/config.json, shared by the Manager and Orders services.
+
+CONFIG.get() parses the file the first time it is called and hands back the same Config afterwards, so
+callers that run often, e.g. every Queue that is constructed, never touch the filesystem. CONFIG.watch()
+reloads the file whenever it changes on disk and passes the new Config to every subscriber, e.g. the
+Queue rebuilding its lookupTable keys and batching limits. A file that doesn't parse or validate is
+logged and ignored, the last good Config stays in use.
+'''
+from Manager.app.models import Station
+
+from pydantic import BaseModel, ValidationError
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import asyncio, json, logging, os
+
+CONFIG_FILE_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), "../../../config/config.json"))
+
+logger = logging.getLogger(__name__)
+
+class MenuDrink(BaseModel):
+    drink: str
+    milk_volume: float = 0
+    shots: int = 0
+    texture: Optional[str] = None
+
+class PriorityConfig(BaseModel):
+    aging_seconds: Optional[float] = None
+    max_wait_seconds: Optional[float] = None
+    seconds_per_drink: float = 24
+
+class HoldConfig(BaseModel):
+    window_seconds: Optional[float] = None
+    max_delay_seconds: float = 0
+
+class ProfilingConfig(BaseModel):
+    enabled: bool = False
+    slow_ms: float = 50.0
+    # The /admin routes have no authentication, they are only served when this is on
+    admin_routes: bool = False
+
+class JournalConfig(BaseModel):
+    enabled: bool = False
+    snapshot_every: int = 1000
+    fsync: bool = True
+
+class HistoryConfig(BaseModel):
+    max_orders: int = 2000
+    max_age_seconds: Optional[float] = 86400
+
+class CompressionConfig(BaseModel):
+    enabled: bool = True
+    minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+class AdmissionConfig(BaseModel):
+    enabled: bool = False
+    max_pending: int = 256
+    max_queue_drinks: Optional[int] = 500
+    source_rate: Optional[float] = 5
+    source_burst: int = 20
+    retry_after_seconds: float = 1
+    trusted_proxies: List[str] = []
+
+class Config(BaseModel):
+    '''
+    Contents of config.json. Field names follow the file's keys, every field has a default so a partial
+    file (or Config() in tests) is still a complete configuration.
+    '''
+    drinks: List[MenuDrink] = []
+    milks: List[str] = []
+    textures: List[str] = []
+    options: List[str] = []
+    MILK_COLORS: Dict[str, str] = {}
+    SEARCH_DEPTH: int = 1
+    BATCH_VOLUME: float = 5
+    PRIORITY: PriorityConfig = PriorityConfig()
+    HOLD: HoldConfig = HoldConfig()
+    STATIONS: List[Station] = []
+    PREP_SECONDS: Dict[str, float] = {}
+    PLAN_LOOKAHEAD: int = 2
+    REBALANCE_SECONDS: float = 300
+    METRICS: bool = True
+    PROFILING: ProfilingConfig = ProfilingConfig()
+    JOURNAL: JournalConfig = JournalConfig()
+    DRINK_LOG: bool = False
+    HISTORY: HistoryConfig = HistoryConfig()
+    COMPRESSION: CompressionConfig = CompressionConfig()
+    ADMISSION: AdmissionConfig = AdmissionConfig()
+    PORT: int = 8080
+    ENDPOINT: Optional[str] = None
+    LOGGING: Optional[dict] = None
+    STORES: List[str] = []
+
+class ConfigLoader:
+    '''
+    Attributes:
+    - path: str - config.json to read
+    - subscribers: List[Callable] - Called, or awaited if they are coroutine functions, with every reloaded Config
+    '''
+    def __init__(self, path: str = CONFIG_FILE_PATH):
+        self.path = path
+        self.subscribers: List[Callable[[Config], Union[None, Awaitable[None]]]] = []
+        self._config: Optional[Config] = None
+
+    def get(self) -> Config:
+        'The cached Config, read from path on first use.'
+        if self._config is None:
+            self._config = self._read()
+        return self._config
+
+    def _read(self) -> Config:
+        with open(self.path, 'r') as f:
+            return Config.model_validate(json.load(f))
+
+    def subscribe(self, callback: Callable[[Config], Union[None, Awaitable[None]]]) -> None:
+        self.subscribers.append(callback)
+
+    async def reload(self) -> Optional[Config]:
+        'Re-reads path and notifies subscribers. Returns the new Config, or None if the file was rejected.'
+        try:
+            config = self._read()
+        except (OSError, ValueError, ValidationError) as e:
+            logger.error(f'Ignoring invalid config at {self.path}: {e}')
+            return None
+        if config == self._config:
+            return config
+
+        self._config = config
+        for callback in self.subscribers:
+            try:
+                result = callback(config)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f'Config subscriber {callback} failed: {e}')
+        logger.info(f'Reloaded config from {self.path}')
+        return config
+
+    async def watch(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        '''
+        Reloads whenever path changes, until stop_event is set or the task is cancelled.
+        The directory is watched rather than the file, editors often save by replacing it.
+        '''
+        from watchfiles import awatch
+
+        path = os.path.abspath(self.path)
+        async for _ in awatch(os.path.dirname(path),
+                              watch_filter = lambda change, changed: os.path.abspath(changed) == path,
+                              stop_event = stop_event):
+            await self.reload()
+
+CONFIG = ConfigLoader()
@@ -0,0 +1,234 @@
+'''
+Minimal Prometheus text-format metrics.
+
+Metrics are declared once at import time next to the code they measure and registered on REGISTRY.
+While REGISTRY.enabled is False, Counter.inc() and Histogram.observe() return immediately and
+Histogram.time() hands back a shared no-op context manager, so instrumented hot paths pay for one
+attribute lookup and nothing else.
+'''
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+from bisect import bisect_left
+import time
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+_NOOP = nullcontext()
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+class Registry:
+    '''
+    Holds every declared metric and renders them for the /metrics endpoint.
+
+    Attributes:
+    - enabled: bool - Whether metrics record observations
+    - metrics: List - Registered metrics in declaration order
+    '''
+    def __init__(self):
+        self.enabled: bool = True
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+
+class _CounterChild:
+    def __init__(self, parent: 'Counter', labels: Dict[str, str]):
+        self._parent = parent
+        self._labels = labels
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        if self._parent._registry.enabled:
+            self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f'{self._parent.name}{_format_labels(self._labels)} {self.value}']
+
+
+class Counter:
+    '''
+    Monotonic count. Like Histogram, call labels(value) once at import time to get a child per label value.
+    '''
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelname: Optional[str] = None, registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelname = labelname
+        self._registry = registry
+        self._children: Dict[str, _CounterChild] = {}
+        if labelname is None:
+            self._children[''] = _CounterChild(self, {})
+        registry.register(self)
+
+    @property
+    def value(self) -> float:
+        return self._children[''].value
+
+    def labels(self, value: str) -> _CounterChild:
+        if value not in self._children:
+            self._children[value] = _CounterChild(self, {self.labelname: value})
+        return self._children[value]
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[''].inc(amount)
+
+    def samples(self) -> List[str]:
+        return [line for child in self._children.values() for line in child.samples()]
+
+
+class Gauge:
+    '''
+    Gauge read from a callback at scrape time, so there is no cost on the hot path at all.
+    The callback may return a number, or a dict of {label value: number} when labelname is set.
+    '''
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labelname: Optional[str] = None, registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelname = labelname
+        self.callback: Optional[Callable] = None
+        registry.register(self)
+
+    def set_function(self, callback: Callable) -> None:
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        if self.callback is None:
+            return []
+        value = self.callback()
+        if self.labelname is None:
+            return [f'{self.name} {value}']
+        return [
+            f'{self.name}{_format_labels({self.labelname: label})} {v}' for label, v in value.items()
+        ]
+
+
+class _HistogramChild:
+    def __init__(self, parent: 'Histogram', labels: Dict[str, str]):
+        self._parent = parent
+        self._labels = labels
+        self._counts: List[int] = [0] * (len(parent.buckets) + 1)
+        self._sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        if not self._parent._registry.enabled:
+            return
+        self._counts[bisect_left(self._parent.buckets, value)] += 1
+        self._sum += value
+
+    def time(self):
+        if not self._parent._registry.enabled:
+            return _NOOP
+        return _Timer(self)
+
+    def samples(self) -> List[str]:
+        name = self._parent.name
+        out = []
+        cumulative = 0
+        for bound, count in zip(self._parent.buckets, self._counts):
+            cumulative += count
+            out.append(f'{name}_bucket{_format_labels({**self._labels, "le": str(bound)})} {cumulative}')
+        cumulative += self._counts[-1]
+        out.append(f'{name}_bucket{_format_labels({**self._labels, "le": "+Inf"})} {cumulative}')
+        out.append(f'{name}_sum{_format_labels(self._labels)} {self._sum}')
+        out.append(f'{name}_count{_format_labels(self._labels)} {cumulative}')
+        return out
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram:
+    '''
+    Latency histogram with fixed bucket bounds in seconds.
+
+    Use directly, or call labels(value) once at import time to get a child per label value, e.g.
+    one child per database operation.
+    '''
+    type = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 help: str,
+                 labelname: Optional[str] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelname = labelname
+        self.buckets = tuple(sorted(buckets))
+        self._registry = registry
+        self._children: Dict[str, _HistogramChild] = {}
+        if labelname is None:
+            self._children[''] = _HistogramChild(self, {})
+        registry.register(self)
+
+    def labels(self, value: str) -> _HistogramChild:
+        if value not in self._children:
+            self._children[value] = _HistogramChild(self, {self.labelname: value})
+        return self._children[value]
+
+    def observe(self, value: float) -> None:
+        self._children[''].observe(value)
+
+    def time(self):
+        return self._children[''].time()
+
+    def samples(self) -> List[str]:
+        return [line for child in self._children.values() for line in child.samples()]
+
+
+################################################# BREWFLOW METRICS ##########################################################
+
+ORDERS_RECEIVED = Counter('brewflow_orders_received_total', 'Orders added to the queue')
+DRINKS_COMPLETED = Counter('brewflow_drinks_completed_total', 'Drinks marked as complete')
+ORDERS_ADMITTED = Counter('brewflow_orders_admitted_total', 'Orders /receive accepted and passed to the queue')
+ORDERS_SHED = Counter('brewflow_orders_shed_total', 'Orders /receive turned away to protect the queue', labelname = 'reason')
+ORDERS_INVALID = Counter('brewflow_orders_invalid_total', 'Requests to /receive that were not a valid order')
+FRAGMENT_HITS = Counter('brewflow_fragment_cache_hits_total', 'Queue and history cards served from the fragment cache')
+FRAGMENT_RENDERS = Counter('brewflow_fragment_renders_total', 'Queue and history cards rendered')
+
+ADD_ORDER_SECONDS = Histogram('brewflow_add_order_seconds', 'Time spent planning a new order into the queue')
+COMPLETE_DRINKS_SECONDS = Histogram('brewflow_complete_drinks_seconds', 'Time spent completing drinks, including DB writes')
+DB_COMMIT_SECONDS = Histogram('brewflow_db_commit_seconds', 'Time spent in database writes', labelname = 'operation')
+BROADCAST_SECONDS = Histogram('brewflow_broadcast_seconds', 'Time spent sending a queue update to every WebSocket client')
+RENDER_SECONDS = Histogram('brewflow_template_render_seconds', 'Time spent rendering HTML templates', labelname = 'template')
+
+QUEUE_ITEMS = Gauge('brewflow_queue_items', 'Orders and batches waiting in the queue')
+QUEUE_DRINKS = Gauge('brewflow_queue_drinks', 'Drinks waiting in the queue')
+LOOKUP_TABLE_SIZE = Gauge('brewflow_lookup_table_size', 'Queue positions indexed per milk and texture', labelname = 'key')
+INGEST_PENDING = Gauge('brewflow_ingest_pending', 'Orders admitted by /receive and not yet planned and persisted')
+WEBSOCKET_CLIENTS = Gauge('brewflow_websocket_clients', 'Connected WebSocket clients')
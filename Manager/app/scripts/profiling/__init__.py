@@ -0,0 +1,103 @@
+'''
+Opt-in profiling for Queue and Connection operations.
+
+Decorate an async method with @profiled(name) to record its wall time. While PROFILER.enabled is False the
+wrapper awaits the method straight away and records nothing. When enabled, every call slower than
+PROFILER.threshold_ms is logged with its inputs and kept in PROFILER.slowOperations, and the next N calls
+after PROFILER.arm(N) are run under cProfile so their stats can be dumped with PROFILER.dump().
+'''
+from collections import deque
+from functools import wraps
+from typing import Callable, Deque, Optional
+import cProfile, io, logging, pstats, time
+
+MAX_INPUT_REPR = 500
+
+logger = logging.getLogger(__name__)
+
+class Profiler:
+    '''
+    Attributes:
+    - enabled: bool - Whether decorated calls are measured at all
+    - threshold_ms: float - Calls slower than this are logged and kept
+    - slowOperations: Deque[dict] - Most recent slow calls, newest last
+    - pendingSamples: int - Number of upcoming calls that will run under cProfile
+    '''
+    def __init__(self, threshold_ms: float = 50.0, max_slow_operations: int = 100):
+        self.enabled: bool = False
+        self.threshold_ms: float = threshold_ms
+        self.slowOperations: Deque[dict] = deque(maxlen = max_slow_operations)
+        self.pendingSamples: int = 0
+        self.sampledCalls: int = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._profiling: bool = False
+
+    def arm(self, calls: int) -> None:
+        'Run the next `calls` decorated calls under cProfile.'
+        self.pendingSamples = calls
+
+    def dump(self, sort: str = 'cumulative', limit: int = 40) -> str:
+        'Returns the accumulated cProfile stats as text and clears them.'
+        if self._stats is None:
+            return 'No profiled calls recorded. Arm the profiler first.\n'
+        out = io.StringIO()
+        self._stats.stream = out
+        out.write(f'{self.sampledCalls} profiled calls\n')
+        self._stats.sort_stats(sort).print_stats(limit)
+        self._stats = None
+        self.sampledCalls = 0
+        return out.getvalue()
+
+    def _collect(self, profile: cProfile.Profile) -> None:
+        if self._stats is None:
+            self._stats = pstats.Stats(profile)
+        else:
+            self._stats.add(profile)
+        self.sampledCalls += 1
+
+    def _report(self, name: str, elapsed_ms: float, args: tuple, kwargs: dict, context: dict) -> None:
+        inputs = repr((args, kwargs))[:MAX_INPUT_REPR]
+        record = {'operation': name, 'ms': round(elapsed_ms, 3), 'inputs': inputs, **context}
+        self.slowOperations.append(record)
+        logger.warning(f'Slow operation {name} took {elapsed_ms:.1f}ms {context} inputs={inputs}')
+
+    def profiled(self, name: str, context: Optional[Callable[..., dict]] = None):
+        '''
+        Decorator for async methods. `self` is left out of the logged inputs.
+
+        Parameters:
+            - name: str label used in logs and profiles
+            - context: callable receiving the same arguments as the decorated method, returning a dict
+              of extra fields (e.g. queue size) to record with a slow call. Evaluated after the call returns.
+        '''
+        def decorator(fn):
+            @wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+
+                # Only one cProfile profiler can be active at a time, nested and concurrent calls are timed only
+                profile = None
+                if self.pendingSamples > 0 and not self._profiling:
+                    self.pendingSamples -= 1
+                    self._profiling = True
+                    profile = cProfile.Profile()
+                    profile.enable()
+
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    if profile is not None:
+                        profile.disable()
+                        self._profiling = False
+                        self._collect(profile)
+                    if elapsed_ms >= self.threshold_ms:
+                        extra = context(*args, **kwargs) if context else {}
+                        self._report(name, elapsed_ms, args[1:], kwargs, extra)
+            return wrapper
+        return decorator
+
+PROFILER = Profiler()
+profiled = PROFILER.profiled
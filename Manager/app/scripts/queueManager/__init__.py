@@ -1,14 +1,27 @@
-from Manager.app.models import Drink, Order
+from Manager.app.models import Drink, Order, Completion
+from Manager.app.models.catalog import CATALOG
 from Manager.app.scripts.services.CRUD import Connection
-
-from pydantic import BaseModel
-
-from typing import List, Set, Union, Optional
-from itertools import product
-from datetime import datetime
-import logging, json, os, copy
-
-logging.basicConfig(level = logging.DEBUG)
+from Manager.app.scripts.analytics import Rollups
+from Manager.app.scripts.analytics.drinklog import DrinkLog
+from Manager.app.scripts.queueManager.history import OrderHistory
+from Manager.app.scripts.metrics import ADD_ORDER_SECONDS, COMPLETE_DRINKS_SECONDS, ORDERS_RECEIVED, DRINKS_COMPLETED
+from Manager.app.scripts.profiling import profiled
+from Manager.app.scripts.config import CONFIG, Config
+
+from pydantic import BaseModel, Field
+
+from typing import Callable, Dict, List, Set, Tuple, Union, Optional
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import copy, uuid
+
+def _queue_context(queue: 'Queue', *args, **kwargs) -> dict:
+    'Queue state recorded alongside slow operations by the profiler'
+    return {
+        'queueItems': len(queue.orders),
+        'queueDrinks': queue.totalDrinks,
+        'searchDepth': queue.lastSearchDepth
+    }
 
 class Batch(BaseModel):
     '''
@@ -19,11 +32,19 @@ class Batch(BaseModel):
     - milk: str (default None) - String to dictate which milk type the batch requires
     - texture: str (default None) - String to dictate the milk texture
     - volume: float - The current volume of milk the batch requires
+    - heldSince: datetime (default None) - When the batch's hold window opened, see Queue
+    - heldUntil: datetime (default None) - When the hold window closes, None once the batch is ready to make
+    - batchKey: int - Catalog batching key of the batch's milk and texture, -1 while empty
+    - batchID: str - Identifies the batch to clients as orderID does an order, for as long as it is in the queue
     '''
     drinks: List[Drink] = []
     milk: Union[str, None] = None
     texture: Union[str, None] = None
     volume: float = 0.0
+    heldSince: Optional[datetime] = None
+    heldUntil: Optional[datetime] = None
+    batchKey: int = Field(default = -1, exclude = True)
+    batchID: str = Field(default_factory = lambda: uuid.uuid4().hex)
 
     def __repr__(self):
         result = "Batch Instance\n"
@@ -39,14 +60,15 @@ class Batch(BaseModel):
             self.milk = drink.milk
         if not self.texture:
             self.texture = drink.texture
+        if self.batchKey < 0:
+            self.batchKey = drink.batchKey
         self.drinks.append(drink)
         self.volume += drink.milk_volume
 
-    def can_add_drink(self, drink: Drink) -> bool:
+    def can_add_drink(self, drink: Drink, max_volume: float = 5) -> bool:
         return(
-            self.milk == drink.milk and
-            self.texture == drink.texture and
-            self.volume + drink.milk_volume <= 5
+            self.batchKey == drink.batchKey and
+            self.volume + drink.milk_volume <= max_volume
         )
 
 class Queue:
@@ -55,11 +77,28 @@ class Queue:
 
     Attributes:
     - orders: List[Order] - List to store pending drink orders
+    - orderHistory: OrderHistory - Recent orders as received, bounded by HISTORY in the config
     - totalOrders: int - Keeps track of how many orders there are
     - totalDrinks: int - Keeps track of how many drinks awaiting preparation
     - OrdersComplete: int - Number of completed orders
     - DrinksComplete: int - Number of drinks made
-    - lookupTable: dict - Hashmap of index/queue position of drink types
+    - lookupTable: dict - Hashmap of index/queue position of drink types, by catalog batching key (milk and texture)
+    - searchDepth: int - How many queue positions in front of a multi drink order step 3 searches
+    - batchVolume: float - Most milk a batch can hold, one jug
+    - analytics: Rollups - Running throughput and wait time statistics for the day
+    - lastSearchDepth: int - How many queue positions the last planned order was allowed to search
+    - agingSeconds: float - Once an item has waited this long, batching can no longer place drinks in front of it
+    - maxWaitSeconds: float - SLA, batching can't place drinks in front of an item if it would then wait longer
+    - secondsPerDrink: float - Estimated seconds to make one drink, used to project waits against maxWaitSeconds
+    - receivedAt: dict - Hashmap of pending orderIDs and when they were received
+    - now: Callable - Returns the current datetime, replaced by a simulated clock in benchmarks
+    - holdSeconds: float - Hold window, how long a new batch waits for more drinks after the last one joined
+    - maxHoldSeconds: float - Longest a batch is held after its first drink, however many drinks keep joining
+    - held: List[Batch] - Batches whose hold window is open
+    - version: int - Counts the changes to the queue, its history and its settings, see etag
+
+    Settings are read from the Config passed in, or the cached config.json (see Manager.app.scripts.config),
+    and can be swapped at runtime with applyConfig.
 
     Workflow queue optimization logic:
         1. Add new order to queue
@@ -83,61 +122,208 @@ class Queue:
 
         5. Update lookup table with new postions should drinks be moved into batches.
            Drinks can only be added to batches, not removed.
+
+    Aging and SLA:
+        Items are always in order of their longest waiting drink: orders are appended, and batches are only
+        created in place of an older order. So the front of the queue is the highest priority, and the only
+        thing that can starve an order is batching, since every drink moved into a batch delays the items behind it.
+        Step 3 therefore only searches indexes behind the last item that has either waited agingSeconds, or would
+        be finished later than maxWaitSeconds after it was received if the new order's drinks were made before it,
+        projecting secondsPerDrink for every drink ahead. Either is disabled when set to None.
+
+    Hold window:
+        With holdSeconds set, a milk drink that step 3 couldn't batch, and that would be started before the window
+        closes (projecting secondsPerDrink for every drink ahead), is moved into a new Batch of its own. Batches
+        made in step 2 are kept open the same way. While a batch is held, step 3 also searches it beyond the search
+        depth, as far forward as the last protected item (see Aging and SLA) but never in front of it, so drinks of
+        the same milk and texture that arrive within the window are packed into one jug. Each drink that joins
+        extends the window by holdSeconds, up to maxHoldSeconds after the first drink, and a full jug is released
+        straight away. Held batches are shown as collecting until releaseHeld() closes them.
     '''
 
-    def __init__(self):
+    def __init__(self, config: Optional[Config] = None):
         self.orders: List[Order, Batch] = []
-        self.orderHistory: List[Order] = []
-        self.orderHistoryIndex: dict = {}
+        self.orderHistory: OrderHistory = OrderHistory()
         self.totalOrders: int = 0
         self.totalDrinks: int = 0
         self.OrdersComplete: int = 0
         self.DrinksComplete: int = 0
-        self._initialize_lookupTable()
+        self.analytics: Rollups = Rollups()
+        self.lastSearchDepth: int = 0
+        self.receivedAt: Dict[str, datetime] = {}
+        self.now: Callable[[], datetime] = datetime.now
+        self.held: List[Batch] = []
+        self.drinkLog: Optional[DrinkLog] = None
+        # (received, completed, drink, station) of completions not yet committed, see logCompletions
+        self._unlogged: List[tuple] = []
+        self.version: int = 0
+        self._epoch: str = uuid.uuid4().hex[:12]
+        self.applyConfig(config or CONFIG.get())
         self.connection: Optional[Connection] = None
 
 ################################################# INIT AND DUNDER METHODS #######################################################        
     @classmethod
-    async def create(cls, URI: str):
-        self = cls()
+    async def create(cls, URI: str, config: Optional[Config] = None):
+        self = cls(config)
         self.connection = await Connection.new(URI)
         return self
 
-    def _initialize_lookupTable(self):
-        RELATIVE_PATH = "../../../config/config.json"
-        CONFIG_FILE_PATH = os.path.join(
-            os.path.dirname(__file__), RELATIVE_PATH
-        )
-
-        with open(CONFIG_FILE_PATH, 'r') as f:
-            data = json.load(f)
-
-        MILKS = data.get('milks', [])
-        TEXTURES = data.get('textures', [])
-        COMBINATIONS = product(MILKS, TEXTURES)
-
-        self.__SEARCH_DEPTH = data.get('SEARCH_DEPTH')
-        self.lookupTable: dict[str, Set[int]] = {
-            f"{milk}_{texture}": set() for milk, texture in COMBINATIONS
+    def applyConfig(self, config: Config) -> None:
+        '''
+        Applies the batching settings of config, on construction and whenever the config is reloaded.
+        The lookupTable gets a key for every configured milk and texture, keeping the indexes of keys it
+        already had. Keys that are no longer configured are dropped once nothing in the queue uses them.
+        '''
+        self.searchDepth: int = config.SEARCH_DEPTH
+        self.batchVolume: float = config.BATCH_VOLUME
+        self.agingSeconds: Optional[float] = config.PRIORITY.aging_seconds
+        self.maxWaitSeconds: Optional[float] = config.PRIORITY.max_wait_seconds
+        self.secondsPerDrink: float = config.PRIORITY.seconds_per_drink
+        self.holdSeconds: Optional[float] = config.HOLD.window_seconds
+        self.maxHoldSeconds: float = config.HOLD.max_delay_seconds
+        self.orderHistory.maxOrders = config.HISTORY.max_orders
+        self.orderHistory.maxAgeSeconds = config.HISTORY.max_age_seconds
+
+        previous = getattr(self, 'lookupTable', {})
+        lookupTable: Dict[int, Set[int]] = {
+            key: previous.get(key, set()) for key in CATALOG.load(config.milks, config.textures, config.options)
         }
+        for key, indexes in previous.items():
+            if indexes and key not in lookupTable:
+                lookupTable[key] = indexes
+        self.lookupTable = lookupTable
+        self.version += 1
+
+    async def reload(self) -> None:
+        '''
+        Drops everything the queue holds and loads it from the database again, e.g. after changes it had
+        applied in memory failed to commit. Settings are kept.
+        '''
+        self.orders = []
+        self.orderHistory = OrderHistory(self.orderHistory.maxOrders, self.orderHistory.maxAgeSeconds)
+        self.totalOrders = self.totalDrinks = self.OrdersComplete = self.DrinksComplete = 0
+        self.analytics = Rollups()
+        self.receivedAt = {}
+        self.held = []
+        self._unlogged = []
+        self.lookupTable = {key: set() for key in self.lookupTable}
+        self.version += 1
+        await self._load_from_db()
 
     async def _load_from_db(self) -> None:
         orders = await self.connection.getQueue()
 
         for order in orders:
-            self._add_orderHistoryIndex(order)
+            for drink in order.drinks:
+                if drink.timeComplete:
+                    self.analytics.recordDrinkComplete(drink, day = order.dateReceived)
             if order.timeComplete:
+                self.orderHistory.add(order)
+                self.analytics.recordOrder(order)
+                self.OrdersComplete += 1
                 self.DrinksComplete += len(order.drinks)
                 continue
-            else:
-                order_total_drinks = len(order.drinks)
-                order.drinks = [
-                    d for d in order.drinks if not d.timeComplete
-                ]
-                await self.addOrder(order, update_db=False)
-                self.DrinksComplete += order_total_drinks - len(order.drinks)
+
+            received = copy.deepcopy(order)
+            order.drinks = [d for d in order.drinks if not d.timeComplete]
+            completed_drinks = len(received.drinks) - len(order.drinks)
+            await self.addOrder(order, update_db=False)
+            # addOrder only saw the drinks still pending: keep the whole order in orderHistory and count the
+            # rest as received too
+            self.orderHistory.add(received)
+            self.DrinksComplete += completed_drinks
+            self.analytics.recordDrinksReceived(completed_drinks, order.timeReceived, order.dateReceived)
+        self.orderHistory.trim(self.now())
         return None
 
+    @contextmanager
+    def clockAt(self, moment: datetime):
+        'Runs the block with now() fixed at moment, so the block can be replayed with the same result'
+        now = self.now
+        self.now = lambda: moment
+        try:
+            yield
+        finally:
+            self.now = now
+
+    async def replay(self, event: dict) -> Tuple[List[Order], List[Completion]]:
+        '''
+        Applies a journal event, see Manager.app.scripts.queueManager.journal, at the time it was first applied.
+        Nothing is written to the database. Returns the orders and completions the event committed, or was
+        about to, for Connection.saveMissing.
+        '''
+        # Completions were added to the drink log when they were first applied
+        drinkLog, self.drinkLog = self.drinkLog, None
+        try:
+            with self.clockAt(datetime.fromisoformat(event['at'])):
+                if event['kind'] == 'add':
+                    orders = [Order.model_validate(order) for order in event['orders']]
+                    return await self.addOrders(orders, update_db = False), []
+                elif event['kind'] == 'complete':
+                    return [], [await self.completeDrinks(event['drinks'], update_db = False, station = event['station'])]
+                else:
+                    raise ValueError(f"Unknown journal event: {event['kind']}")
+        finally:
+            self.drinkLog = drinkLog
+
+    def getState(self) -> dict:
+        '''
+        Everything the queue has been told, for a snapshot. Settings are not included, they come from the
+        config. Batching keys are process-local, so the catalog they were drawn from is included with them.
+        '''
+        return {
+            'orders': self.orders,
+            'orderHistory': self.orderHistory,
+            'totalOrders': self.totalOrders,
+            'totalDrinks': self.totalDrinks,
+            'OrdersComplete': self.OrdersComplete,
+            'DrinksComplete': self.DrinksComplete,
+            'analytics': self.analytics,
+            'receivedAt': self.receivedAt,
+            'held': self.held,
+            'lookupTable': self.lookupTable,
+            'catalog': {code: pair for pair, code in CATALOG.keys.items()}
+        }
+
+    def setState(self, state: dict) -> None:
+        'Restores a state from getState(), in place of whatever the queue held'
+        state = dict(state)
+        catalog = state.pop('catalog')
+        configured = self.lookupTable
+        bounds = self.orderHistory
+        if isinstance(state.get('orderHistory'), list):
+            # Snapshots taken before orderHistory was bounded hold a list, newest first, and its index
+            history = OrderHistory()
+            for order in reversed(state.pop('orderHistory')):
+                history.add(order)
+            state.pop('orderHistoryIndex', None)
+            state['orderHistory'] = history
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.orderHistory.maxOrders, self.orderHistory.maxAgeSeconds = bounds.maxOrders, bounds.maxAgeSeconds
+
+        # Re-stamp drinks, batches and the lookupTable with this process's catalog codes
+        for order in [*self.orderHistory, *self.orders]:
+            for drink in order.drinks:
+                object.__setattr__(drink, 'batchKey', CATALOG.key(drink.milk, drink.texture))
+                object.__setattr__(drink, 'optionBits', CATALOG.optionBits(drink.options))
+            if isinstance(order, Batch) and order.batchKey != -1:
+                object.__setattr__(order, 'batchKey', CATALOG.key(*catalog[order.batchKey]))
+        self.lookupTable = {key: set() for key in configured}
+        for key, indexes in state['lookupTable'].items():
+            key = CATALOG.key(*catalog[key])
+            if key != CATALOG.otherKey:
+                self.lookupTable[key] = indexes
+        self.version += 1
+
+    @property
+    def etag(self) -> str:
+        '''
+        Changes whenever the queue, its history or its settings do, and differs between Queue instances,
+        so a response built from the queue can be revalidated against it, e.g. as an HTTP ETag
+        '''
+        return f'{self._epoch}-{self.version}'
+
     def __repr__(self):
         output = [f"Queue Instance @{hex(id(self))}:\n", "Orders:\n"]
 
@@ -151,18 +337,6 @@ class Queue:
     
 
 ########################################## PRIVATE LOOKUPTABLE & DATA MANIPULATION METHODS ##########################################
-    def _add_orderHistoryIndex(self, order) -> None:
-        '''
-        Updates the hashmap of orderID's and their position (index) in the orderHistory list when an order is added to
-        the orderHistory list.
-        '''
-        self.orderHistory.insert(0, copy.deepcopy(order))
-        self.orderHistoryIndex[order.orderID] = {
-            'drinkIDs': set(d.identifier for d in order.drinks),
-            'index': -1} 
-        for idx in self.orderHistoryIndex.keys():
-            self.orderHistoryIndex[idx]['index'] += 1
-    
     def _remove_item_from_lookupTable(self, position: int) -> None:
         '''
         When an item is removed at queue position/index N,
@@ -188,7 +362,51 @@ class Queue:
 
         self.totalOrders = len(set(drink.orderID for order in self.orders for drink in order.drinks))
 
-    def _update_lookupTable_on_Batch(self, position: int, milk_type: str) -> None:
+    def _waited(self, item: Union[Order, Batch], now: datetime) -> float:
+        'Seconds the longest waiting drink in the item has waited'
+        return max(((now - self.receivedAt[d.orderID]).total_seconds() for d in item.drinks), default = 0.0)
+
+    def _protected_index(self, end: int, delay_drinks: int) -> int:
+        '''
+        Index of the last item before end that batching must not place drinks in front of: an item that has
+        waited agingSeconds, or one that is projected to be finished within maxWaitSeconds but would miss it if
+        delay_drinks more drinks were made before it. 0 when there is none.
+        '''
+        protected = 0
+        if self.agingSeconds is None and self.maxWaitSeconds is None:
+            return protected
+
+        now = self.now()
+        drinks_ahead = 0
+        for index, item in enumerate(self.orders[:end]):
+            drinks_ahead += len(item.drinks)
+            waited = self._waited(item, now)
+            if self.agingSeconds is not None and waited >= self.agingSeconds:
+                protected = index
+            elif self.maxWaitSeconds is not None and \
+                    waited + drinks_ahead * self.secondsPerDrink <= self.maxWaitSeconds < \
+                    waited + (drinks_ahead + delay_drinks) * self.secondsPerDrink:
+                protected = index
+        return protected
+
+    def _hold(self, batch: Batch, now: datetime) -> None:
+        '''
+        Opens or extends the hold window of a batch that a drink has just joined. Full batches are released.
+        '''
+        if self.holdSeconds is None:
+            return
+        if batch.volume >= self.batchVolume:
+            batch.heldSince = batch.heldUntil = None
+            return
+        if batch.heldSince is None:
+            batch.heldSince = now
+            self.held.append(batch)
+        batch.heldUntil = min(
+            now + timedelta(seconds = self.holdSeconds),
+            batch.heldSince + timedelta(seconds = self.maxHoldSeconds)
+        )
+
+    def _update_lookupTable_on_Batch(self, position: int, milk_type: int) -> None:
         '''
         Batches are always created immediately infront of an existing order. Therefore if a new order
         spawns batches infront of its own position in the queue, everything that is behind the new batch's
@@ -200,36 +418,26 @@ class Queue:
             elif v:
                 self.lookupTable[k] = set(i+1 if i > position - 1 else i for i in v)
 
-
-################################################# PUBLIC METHODS ##########################################################
-    async def addOrder(self, order: Order, update_db: bool) -> None:
-        self.orders.append(order)
-        self.orderHistory.insert(0, copy.deepcopy(order))
-
-        # Update orderHistory hashmap
-        # Previous implimentation of Queue did not have orderHistoryIndex leading to traversal of entire orderHistory list
-        # to update timeComplete in both orders and another nested traversal of the drinks list in each order.
-        # This lead to minimum quadratic time complexity (frontend waiting 3 seconds to respond).
-        # Now impliment hashmap to keep track of the index of orderIDs as well as what drinkIDs they have.
-        self._add_orderHistoryIndex(order)
-
-        new_order_index = len(self.orders) - 1
-        self.totalOrders += 1
-        self.totalDrinks += len(order.drinks)
-        
-        if update_db:
-            await self.connection.addOrder(order)
-
+    def _plan_order(self, order: Order, new_order_index: int) -> None:
+        '''
+        Moves the drinks of a newly appended order into batches, see the workflow in the class docstring.
+        '''
         # If order has mutiple drinks, you may want to batch drinks with others
         # near the original order's position, else if it a single drink
         # you can move the individual forward in the queue any amount
         search_depth = new_order_index
+        first_new_index = new_order_index
+        now = self.now()
+        # Only hold drinks that would be started before the window closes, further back in the queue
+        # later drinks can batch with them through the normal search anyway
+        hold = self.holdSeconds is not None and \
+            sum(len(item.drinks) for item in self.orders[:first_new_index]) * self.secondsPerDrink < self.holdSeconds
 
         # Prioritize creating batches of same milk type within the order,
         # by searching inside order.drinks first.
         if len(order.drinks) > 1:
             grouped_drinks = order.group_drinks()
-            search_depth = self.__SEARCH_DEPTH
+            search_depth = self.searchDepth
             if grouped_drinks:
                 for group in grouped_drinks:
                     if len(group) > 1:
@@ -238,32 +446,45 @@ class Queue:
                         list(map(lambda drink: batch.add_drink(drink), group)) # Add drinks to batch
                         list(map(lambda drink: order.drinks.remove(drink), group)) # Remove drink from original order
                         self.orders.insert(new_order_index, batch) # Batch is inserted in front of original order
+                        if hold:
+                            self._hold(batch, now)
                         try:
-                            self.lookupTable[f"{batch.milk}_{batch.texture}"].add(new_order_index)
+                            self.lookupTable[batch.batchKey].add(new_order_index)
                         except KeyError:
                             continue
                         new_order_index += 1 # Batch inserted infront so new order is moved back in the queue by one
                     else:
                         continue
 
-        # For remaining drinks, have option to search for orders ahead
-        for drink in order.drinks:
-            if drink.milk == "No Milk":
+        self.lastSearchDepth = search_depth
+        # Drinks can't overtake items that have aged or would miss the SLA, nor anything in front of them. Held
+        # batches are searched as far forward as that item, other items never in the front two
+        held_index = self._protected_index(first_new_index, len(order.drinks))
+        protected_index = max(held_index, 1)
+
+        # For remaining drinks, have option to search for orders ahead.
+        # Iterate over a copy, drinks are removed from the order as they are batched.
+        for drink in list(order.drinks):
+            milk_type = drink.batchKey
+            # Drinks without milk, and milks or textures that aren't configured, are never batched
+            if drink.milk == "No Milk" or milk_type not in self.lookupTable:
                 continue
-            milk_type = f"{drink.milk}_{drink.texture}"
             batch_found = False
             indexes = [
-                i for i in self.lookupTable[milk_type] if 1 < i and 
-                new_order_index - search_depth <= i < new_order_index 
-                ]
+                i for i in self.lookupTable[milk_type] if i < new_order_index and (
+                    protected_index < i and new_order_index - search_depth <= i or
+                    held_index <= i and isinstance(self.orders[i], Batch) and self.orders[i].heldUntil is not None
+                )]
             
             for index in indexes:
                 # Check if drink can be added to an existing batch
                 if isinstance(self.orders[index], Batch):
                     batch: Batch = self.orders[index]
-                    if batch.can_add_drink(drink):
+                    if batch.can_add_drink(drink, self.batchVolume):
                         batch.add_drink(drink)
                         order.drinks.remove(drink)
+                        if batch.heldUntil is not None:
+                            self._hold(batch, now)
                         batch_found = True
                         break
                 
@@ -271,11 +492,11 @@ class Queue:
                 elif isinstance(self.orders[index], Order):
                     existing_order: Order = self.orders[index]
                     similar_drinks = [
-                        d for d in existing_order.drinks if d.milk == drink.milk and
-                        d.texture == drink.texture
+                        d for d in existing_order.drinks if d.batchKey == drink.batchKey
                     ]
 
-                    if similar_drinks:
+                    if similar_drinks and \
+                            sum(d.milk_volume for d in similar_drinks) + drink.milk_volume <= self.batchVolume:
                         batch = Batch()
                         for d in similar_drinks + [drink]:
                             batch.add_drink(d)
@@ -287,57 +508,151 @@ class Queue:
                         batch_found = True
                         break
 
-            if not batch_found:
+            if not batch_found and hold:
+                # Hold the drink in a batch of its own in front of its order, for later drinks to join
+                batch = Batch()
+                batch.add_drink(drink)
+                order.drinks.remove(drink)
+                self._update_lookupTable_on_Batch(new_order_index, milk_type)
+                self.orders.insert(new_order_index, batch)
+                self._hold(batch, now)
                 self.lookupTable[milk_type].add(new_order_index)
-        
-        self._clean_empty_orders() 
+                new_order_index += 1
+            elif not batch_found:
+                self.lookupTable[milk_type].add(new_order_index)
+
+    def _receive_order(self, order: Order) -> Order:
+        '''
+        Appends an order to the queue and plans it into batches. Emptied orders are left in place for the
+        caller to clean up. Returns the order as received, before planning moved any of its drinks.
+        '''
+        self.orders.append(order)
+
+        # orderHistory is keyed by orderID, completions find their orders without walking it
+        received = self.orderHistory.add(copy.deepcopy(order))
+        self.orderHistory.trim(self.now())
+        self.receivedAt[order.orderID] = datetime.combine(order.dateReceived, order.timeReceived)
+
+        new_order_index = len(self.orders) - 1
+        self.totalOrders += 1
+        self.totalDrinks += len(order.drinks)
+        self.analytics.recordOrder(order)
+        ORDERS_RECEIVED.inc()
+
+        with ADD_ORDER_SECONDS.time():
+            self._plan_order(order, new_order_index)
+
+        return received
+
+
+################################################# PUBLIC METHODS ##########################################################
+    @profiled('Queue.addOrder', context = _queue_context)
+    async def addOrder(self, order: Order, update_db: bool) -> None:
+        await self.addOrders([order], update_db)
+
+    @profiled('Queue.addOrders', context = _queue_context)
+    async def addOrders(self, orders: List[Order], update_db: bool) -> List[Order]:
+        """
+        Plans several orders into the queue in arrival order, then drops emptied orders and
+        writes the new orders to the database in a single commit.
+
+        Returns the orders as received, before planning moved any drinks into batches.
+        """
+        self.releaseHeld()
+        received = [self._receive_order(order) for order in orders]
+        self._clean_empty_orders()
+        self.version += 1
+
+        if update_db:
+            await self.connection.saveChanges(orders = received)
+        return received
 
 
-    async def completeDrinks(self, drink_identifiers: List[int]) -> None:
+    @profiled('Queue.completeDrinks', context = _queue_context)
+    async def completeDrinks(self,
+                             drink_identifiers: List[int],
+                             update_db: bool = True,
+                             station: Optional[str] = None) -> Completion:
         """
         Logic to complete one or more drinks and remove it from the preparation list.
 
         Parameters:
             - drink_identifiers: List[int] list of drink identifiers that are to be removed from the queue
+            - update_db: bool write the completion to the database in a single commit, if there is a connection
+            - station: str name of the station that made the drinks, for analytics
+
+        Returns the Completion that was, or is to be, written to the database.
         """
-        time_complete = datetime.now().time()
-        # Use sets for O(1) time complexity
-        complete_drink_identifier_set: set[int] = set(drink_identifiers)
-        order_identifier_set: set[int] = set() 
-
-        for item in self.orders:
-            item_drinkIDs = set(d.identifier for d in item.drinks)
-            if complete_drink_identifier_set & item_drinkIDs:
-                for drink in item.drinks:
-                    if drink.identifier in drink_identifiers:
-                        order_identifier_set.add(drink.orderID) # Add drink's parent order to list of orders to be updated
-                item.drinks = [
-                    drink for drink in item.drinks if drink.identifier not in drink_identifiers
-                ]
+        with COMPLETE_DRINKS_SECONDS.time():
+            self.releaseHeld()
+            now = self.now()
+            time_complete = now.time()
+            # Use sets for O(1) time complexity
+            complete_drink_identifier_set: set[int] = set(drink_identifiers)
+            order_identifier_set: set[int] = set() 
+            completed_orders: set[str] = set()
+
+            for item in self.orders:
+                item_drinkIDs = set(d.identifier for d in item.drinks)
+                if complete_drink_identifier_set & item_drinkIDs:
+                    batch_size = 0
+                    for drink in item.drinks:
+                        if drink.identifier in complete_drink_identifier_set:
+                            order_identifier_set.add(drink.orderID) # Add drink's parent order to list of orders to be updated
+                            batch_size += 1
+                    if isinstance(item, Batch):
+                        self.analytics.recordBatchComplete(batch_size, now.date())
+                    item.drinks = [
+                        drink for drink in item.drinks if drink.identifier not in complete_drink_identifier_set
+                    ]
 
-        self._clean_empty_orders()
+            self._clean_empty_orders()
 
-        for orderID in order_identifier_set:
-            idx = self.orderHistoryIndex[orderID]['index']
-            order = self.orderHistory[idx]
+            for orderID in order_identifier_set:
+                order = self.orderHistory.get(orderID)
 
-            for drink in order.drinks:
-                if drink.identifier in complete_drink_identifier_set:
-                    drink.timeComplete = time_complete
-                    if self.connection:
-                        await self.connection.completeDrink(drink.identifier, time_complete)
+                for drink in order.drinks:
+                    if drink.identifier in complete_drink_identifier_set:
+                        drink.timeComplete = time_complete
+                        self.analytics.recordDrinkComplete(drink, station, now.date())
+                        if self.drinkLog:
+                            received = datetime.combine(order.dateReceived, drink.timeReceived or order.timeReceived)
+                            self._unlogged.append((received, now, drink, station))
 
-            if all(drink.timeComplete for drink in order.drinks):
-                self.orderHistory[idx].timeComplete = time_complete
-                self.OrdersComplete += 1
+                if all(drink.timeComplete for drink in order.drinks):
+                    order.timeComplete = time_complete
+                    self.OrdersComplete += 1
+                    completed_orders.add(orderID)
+                    self.receivedAt.pop(orderID, None)
+
+            self.totalDrinks -= len(complete_drink_identifier_set)
+            self.DrinksComplete += len(complete_drink_identifier_set)
+            self.version += 1
+            DRINKS_COMPLETED.inc(len(complete_drink_identifier_set))
+
+            completion = Completion(time_complete, complete_drink_identifier_set, completed_orders)
+            if update_db:
                 if self.connection:
-                    await self.connection.completeOrder(order.orderID, time_complete)
+                    await self.connection.saveChanges(completions = [completion])
+                self.logCompletions()
 
-        self.totalDrinks -= len(complete_drink_identifier_set)
-        self.DrinksComplete += len(complete_drink_identifier_set)
+        return completion
+
+    def logCompletions(self) -> None:
+        '''
+        Adds the drinks completed since the last call to the drink log. Callers that complete drinks with
+        update_db = False call this once they have committed the completions.
+        '''
+        unlogged, self._unlogged = self._unlogged, []
+        if not self.drinkLog:
+            return
+        for received, completed, drink, station in unlogged:
+            self.drinkLog.append(received, completed, drink, station)
+        self.drinkLog.flush()
 
 
-    async def completeItem(self, index: int) -> None:
+    @profiled('Queue.completeItem', context = _queue_context)
+    async def completeItem(self, index: int, update_db: bool = True, station: Optional[str] = None) -> Completion:
         """
         Logic to complete an entire Batch or Order and remove it from the preparation list.
 
@@ -345,20 +660,58 @@ class Queue:
             - index: int index of the item to be completed.
         """
         drink_identifiers = [d.identifier for d in self.orders[index].drinks]
-        await self.completeDrinks(drink_identifiers)
+        return await self.completeDrinks(drink_identifiers, update_db, station)
         
 
+    def releaseHeld(self) -> int:
+        '''
+        Closes the hold window of every batch whose window has passed, and forgets batches that were made
+        while held. Returns the number of batches released.
+        '''
+        now = self.now()
+        released = 0
+        still_held = []
+        for batch in self.held:
+            if batch.heldUntil is None or not batch.drinks:
+                continue
+            if batch.heldUntil <= now:
+                batch.heldSince = batch.heldUntil = None
+                released += 1
+            else:
+                still_held.append(batch)
+        self.held = still_held
+        if released:
+            self.version += 1
+        return released
+
+
+    def nextRelease(self) -> Optional[datetime]:
+        'When the next hold window closes, or None if no batch is held'
+        return min((batch.heldUntil for batch in self.held if batch.heldUntil is not None and batch.drinks), default = None)
+
+
     def getCompletedItems(self) -> List[Order]:
         out = []
         for order in self.orderHistory:
             completed_drinks = [drink for drink in order.drinks if drink.timeComplete is not None]
             if completed_drinks:
-                order_copy = copy.deepcopy(order)
-                order_copy.drinks = completed_drinks
-                out.append(order_copy)
+                # Only the drinks differ, and they are the queue's own either way, so a shallow copy will do
+                out.append(order.model_copy(update = {'drinks': completed_drinks}))
         return out
 
 
     def countCompletedOrders(self) -> int:
-        return len([order for order in self.orderHistory if order.timeComplete])
+        'Every completed order, including those evicted from orderHistory'
+        return self.OrdersComplete
+
+
+    async def getOrder(self, orderID: str) -> Optional[Order]:
+        '''
+        The order as received, with its completion times. Orders evicted from orderHistory are read from the
+        database, None if it isn't there either.
+        '''
+        order = self.orderHistory.get(orderID)
+        if order is None and self.connection:
+            order = await self.connection.getOrder(orderID)
+        return order
     
\ No newline at end of file
@@ -0,0 +1,274 @@
+from Manager.app.models import Order, Completion
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.journal import Journal
+from Manager.app.scripts.queueManager.scheduler import StationScheduler
+from Manager.app.scripts.config import CONFIG, Config
+
+from contextlib import nullcontext
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+import asyncio, logging
+
+MAX_GROUP_SIZE = 64
+
+class ActorStopped(Exception):
+    'The actor was stopped before it applied the command'
+
+class QueueActor:
+    '''
+    Single writer for a Queue.
+
+    Requests never mutate the Queue themselves; they submit commands and await the result. One task
+    consumes the commands, taking everything that is pending at once as a group. Consecutive new orders
+    are planned together with Queue.addOrders, the group's database writes go out in one commit and
+    clients are notified once, after the group has been persisted. While batches are held open the task
+    also wakes when the next hold window closes, to release it and notify clients.
+
+    With a journal, every change is also appended to it as it is applied, the journal is synced once per
+    group before its commit, and a group is applied with the queue's clock fixed at its start so the journal
+    replays it exactly.
+
+    Commands are checked before they change anything: an order already queued, drinks not in the queue or an
+    item index past its end fail that command alone. Nothing is acknowledged before it is committed. If a group
+    fails before its commit, the queue is reloaded from the database, its journal events are discarded and its
+    commands are applied again one at a time, so only those that cannot be committed fail. Commands still
+    pending when the actor is stopped fail with ActorStopped.
+
+    The actor also assigns the queue's items to stations after every change, before onChange, so that
+    every process serving the queue shows an item on the same station, see StationScheduler.views.
+
+    Attributes:
+    - queue: Queue - The queue this actor owns
+    - onChange: Callable - Awaited once after every group that changed the queue, e.g. a broadcast
+    - journal: Journal - Optional, see Manager.app.scripts.queueManager.journal
+    - commands: asyncio.Queue - Pending (kind, payload, future) commands
+    - scheduler: StationScheduler - Assigns items to stations, rebuilt from every reloaded config
+    - views: Dict[str, List[int]] - Queue indexes of the items on each station, as of the last change
+    '''
+    def __init__(self,
+                 queue: Queue,
+                 onChange: Optional[Callable[[], Awaitable[None]]] = None,
+                 journal: Optional[Journal] = None,
+                 scheduler: Optional[StationScheduler] = None):
+        self.queue = queue
+        self.onChange = onChange
+        self.journal = journal
+        self.commands: asyncio.Queue = asyncio.Queue()
+        self.scheduler = scheduler or StationScheduler.fromConfig(CONFIG.get())
+        # Station of every item, by orderID or batchID, so items stay where they were assigned
+        self._stationOf: Dict[str, str] = {}
+        self.views: Dict[str, List[int]] = {}
+        self._assignStations()
+        self._task: Optional[asyncio.Task] = None
+        # The group being applied, failed by stop() if it is cancelled part way
+        self._group: List[Tuple] = []
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending, self._group = self._group, []
+        while not self.commands.empty():
+            pending.append(self.commands.get_nowait())
+        for _, _, future in pending:
+            if not future.done():
+                future.set_exception(ActorStopped('The queue actor stopped before applying the command'))
+
+    async def _submit(self, kind: str, payload) -> None:
+        future = asyncio.get_running_loop().create_future()
+        await self.commands.put((kind, payload, future))
+        return await future
+
+    async def addOrder(self, order: Order) -> None:
+        'Adds an order to the queue and returns once it has been planned and persisted.'
+        return await self._submit('add', order)
+
+    async def complete(self,
+                       drink_identifiers: Sequence[str] = (),
+                       item_index: Optional[int] = None,
+                       station: Optional[str] = None) -> None:
+        'Completes drinks by identifier and/or the item at item_index, in that order, made at station.'
+        return await self._submit('complete', (drink_identifiers, item_index, station))
+
+    async def reconfigure(self, config: Config) -> None:
+        'Applies a reloaded config to the queue between commands, so planning never sees half of it.'
+        return await self._submit('config', config)
+
+################################################# COMMAND LOOP ##########################################################
+    def _until_release(self) -> Optional[float]:
+        next_release = self.queue.nextRelease()
+        if next_release is None:
+            return None
+        return max(0.0, (next_release - self.queue.now()).total_seconds())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                group = [await asyncio.wait_for(self.commands.get(), self._until_release())]
+            except asyncio.TimeoutError:
+                if self.queue.releaseHeld():
+                    await self._notify()
+                continue
+            while len(group) < MAX_GROUP_SIZE and not self.commands.empty():
+                group.append(self.commands.get_nowait())
+            self._group = group
+            try:
+                await self._apply(group)
+            except Exception as e:
+                logging.error(f'Queue actor failed to apply {len(group)} commands: {e}')
+                await self._applyEach(group, e)
+            self._group = []
+
+    async def _applyEach(self, group: List[Tuple], error: Exception) -> None:
+        'Applies the commands of a group that failed one at a time, so a command that cannot be committed fails alone'
+        pending = [command for command in group if not command[2].done()]
+        if len(pending) == 1:
+            pending[0][2].set_exception(error)
+            return
+        for command in pending:
+            try:
+                await self._apply([command])
+            except Exception as e:
+                logging.error(f'Queue actor failed to apply a {command[0]} command: {e}')
+                if not command[2].done():
+                    command[2].set_exception(e)
+
+    async def _apply(self, group: List[Tuple]) -> None:
+        if self.journal is None:
+            return await self._applyGroup(group)
+        with self.queue.clockAt(self.queue.now()):
+            await self._applyGroup(group)
+
+    def _record(self, event: dict) -> None:
+        self.journal.append({**event, 'at': self.queue.now().isoformat()})
+
+    async def _rollback(self, mark: Optional[Tuple]) -> None:
+        'Undoes a group that failed before its commit: the database still holds the queue as it was before it'
+        if mark is not None:
+            await self.journal.discard(mark)
+        if self.queue.connection:
+            await self.queue.reload()
+        else:
+            self.queue._unlogged.clear()
+        self._assignStations()
+
+    async def _applyGroup(self, group: List[Tuple]) -> None:
+        mark = self.journal.mark() if self.journal else None
+        try:
+            applied, reconfigured, changes = await self._applyCommands(group)
+            if self.journal:
+                # Durable before the commit, so a crash after it leaves no committed change out of the journal
+                await self.journal.sync()
+            if self.queue.connection and (changes['orders'] or changes['completions']):
+                await self.queue.connection.saveChanges(**changes)
+        except Exception:
+            await self._rollback(mark)
+            raise
+        if not applied:
+            return
+
+        # The group is committed, none of its commands may fail from here on
+        try:
+            self.queue.logCompletions()
+            # Events after a config change are replayed under the new config, so it starts a new snapshot
+            if self.journal and (reconfigured or self.journal.snapshotDue()):
+                await self.journal.snapshot(self.queue)
+        except Exception as e:
+            logging.error(f'Queue actor failed to log or snapshot {len(applied)} committed commands: {e}')
+
+        for future in applied:
+            if not future.done():
+                future.set_result(None)
+
+        await self._notify()
+
+    async def _applyCommands(self, group: List[Tuple]) -> Tuple[List[asyncio.Future], bool, dict]:
+        '''
+        Applies the group without committing it. Returns the futures of the commands applied, whether one was a
+        config, and the saveChanges arguments that commit it.
+        '''
+        new_orders: List[Order] = []
+        completions: List[Completion] = []
+        pending_adds: List[Tuple] = []
+        applied: List[asyncio.Future] = []
+        added: Set[str] = set()
+        reconfigured = False
+
+        async def plan_pending_adds():
+            # Planning consecutive orders together means emptied orders are cleaned up once per run
+            if not pending_adds:
+                return
+            orders = [payload for _, payload, _ in pending_adds]
+            received = await self.queue.addOrders(orders, update_db = False)
+            if self.journal:
+                self._record({'kind': 'add', 'orders': [order.model_dump(mode = 'json') for order in received]})
+            new_orders.extend(received)
+            applied.extend(future for _, _, future in pending_adds)
+            pending_adds.clear()
+
+        def complete(completion: Completion, station: Optional[str]) -> None:
+            if self.journal:
+                self._record({'kind': 'complete', 'drinks': sorted(completion.drinkIDs), 'station': station})
+            completions.append(completion)
+
+        for command in group:
+            kind, payload, future = command
+            if kind == 'add':
+                if payload.orderID in added or payload.orderID in self.queue.orderHistory:
+                    future.set_exception(ValueError(f'Order {payload.orderID} is already queued'))
+                    continue
+                added.add(payload.orderID)
+                pending_adds.append(command)
+                continue
+
+            await plan_pending_adds()
+            if kind == 'config':
+                self.queue.applyConfig(payload)
+                self.scheduler = StationScheduler.fromConfig(payload)
+                applied.append(future)
+                reconfigured = True
+                continue
+
+            drink_identifiers, item_index, station = payload
+            error = self._invalidCompletion(drink_identifiers, item_index)
+            if error:
+                future.set_exception(error)
+                continue
+            if drink_identifiers:
+                complete(await self.queue.completeDrinks(drink_identifiers, update_db = False, station = station), station)
+            if item_index is not None:
+                complete(await self.queue.completeItem(item_index, update_db = False, station = station), station)
+            applied.append(future)
+        await plan_pending_adds()
+        return applied, reconfigured, {'orders': new_orders, 'completions': completions}
+
+    def _invalidCompletion(self, drink_identifiers: Sequence[str], item_index: Optional[int]) -> Optional[Exception]:
+        'Why a complete command cannot be applied to the queue as it is, checked first so it is never half applied'
+        completed = set(drink_identifiers)
+        unknown = completed.difference(d.identifier for item in self.queue.orders for d in item.drinks)
+        if unknown:
+            return ValueError(f'Drinks not in the queue: {", ".join(sorted(map(str, unknown)))}')
+        if item_index is None:
+            return None
+        # The item is indexed in the queue the drinks leave
+        remaining = sum(1 for item in self.queue.orders if any(d.identifier not in completed for d in item.drinks))
+        if not 0 <= item_index < remaining:
+            return IndexError(f'Item index {item_index} out of range for a queue of {remaining} items')
+        return None
+
+    def _assignStations(self) -> None:
+        self.views = self.scheduler.views(self.queue.orders, self._stationOf)
+
+    async def _notify(self) -> None:
+        self._assignStations()
+        if self.onChange:
+            try:
+                await self.onChange()
+            except Exception as e:
+                logging.error(f'Queue actor change notification failed: {e}')
@@ -0,0 +1,69 @@
+'''
+Recent orders, as received, bounded by count and age.
+
+Queue.orderHistory used to keep every order for the life of the process, with an index of positions that
+was renumbered on every insert. OrderHistory keeps orders in an insertion-ordered dict keyed by orderID
+instead: adding, finding and evicting an order are O(1), and iteration is newest first, as the history
+page shows them.
+
+Once there are more than maxOrders orders, or the oldest was received more than maxAgeSeconds ago, the
+oldest completed orders are evicted. Orders with drinks still in the queue are never evicted, completions
+need them. Evicted orders stay in the database, Queue.getOrder reads them from there by primary key.
+'''
+from Manager.app.models import Order
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+class OrderHistory:
+    '''
+    Attributes:
+    - maxOrders: int - Most orders kept, beyond which the oldest completed orders are evicted
+    - maxAgeSeconds: float - Completed orders received longer ago than this are evicted, None to keep them
+    - evicted: int - Orders evicted so far
+    '''
+    def __init__(self, maxOrders: int = 2000, maxAgeSeconds: Optional[float] = None):
+        self.maxOrders = maxOrders
+        self.maxAgeSeconds = maxAgeSeconds
+        self.evicted: int = 0
+        self._orders: Dict[str, Order] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, orderID: str) -> bool:
+        return orderID in self._orders
+
+    def __iter__(self) -> Iterator[Order]:
+        'Newest first'
+        return reversed(self._orders.values())
+
+    def get(self, orderID: str) -> Optional[Order]:
+        return self._orders.get(orderID)
+
+    def add(self, order: Order) -> Order:
+        'Keeps order as the newest, replacing any order with the same orderID'
+        self._orders.pop(order.orderID, None)
+        self._orders[order.orderID] = order
+        return order
+
+    def trim(self, now: datetime) -> int:
+        '''
+        Evicts the oldest completed orders while there are more than maxOrders, and every completed order
+        received more than maxAgeSeconds before now. Returns the number evicted.
+        '''
+        excess = len(self._orders) - self.maxOrders
+        cutoff = now - timedelta(seconds = self.maxAgeSeconds) if self.maxAgeSeconds is not None else None
+        victims = []
+        for orderID, order in self._orders.items():
+            # Orders are kept in the order they were received, so past the first recent one all are
+            recent = cutoff is None or datetime.combine(order.dateReceived, order.timeReceived) >= cutoff
+            if recent and len(victims) >= excess:
+                break
+            if order.timeComplete is not None:
+                victims.append(orderID)
+
+        for orderID in victims:
+            del self._orders[orderID]
+        self.evicted += len(victims)
+        return len(victims)
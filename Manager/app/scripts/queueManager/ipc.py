@@ -0,0 +1,340 @@
+'''
+Local IPC between the process that owns the Queue and the HTTP/WebSocket worker processes.
+
+One owner process runs the Queue and its QueueActor behind a QueueServer on a Unix domain socket. Each worker
+connects a RemoteQueue, which forwards commands to the owner's actor and keeps a read-only replica of the
+queue items and totals. The replica is updated from the state event the owner publishes after every change.
+Workers never plan or persist anything themselves, so there is one copy of the queue however many workers
+serve requests, and each worker fans state events out to its own WebSocket clients. The owner holds every
+store's queue (see Manager.app.scripts.queueManager.stores), and each connection is bound to one store.
+
+Frames are newline delimited JSON:
+    worker -> owner: {"store": str}, once on connect
+                     {"id": int, "kind": "add" | "complete" | "history" | "summary" | "drinks" | "order", "payload": ...}
+    owner -> worker: {"id": int, "result": ...} or {"id": int, "error": str}
+                     {"event": "state", "orders": [...], "totalOrders": int, "totalDrinks": int, "etag": str,
+                      "views": {station: [queue index, ...]}}
+                     once on connect and after every change of that store
+                     {"event": "error", "error": str} instead when the store can't be opened
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.queueManager import Batch
+from Manager.app.scripts.queueManager.stores import DEFAULT_STORE, Store, Stores, openQueue
+from Manager.app.scripts.config import CONFIG
+
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Union
+import asyncio, json, logging, os
+
+# Largest frame either side accepts, a full queue snapshot has to fit
+FRAME_LIMIT = 64 * 1024 * 1024
+
+class RemoteQueueError(Exception):
+    'A command failed in the owner process'
+
+class OwnerDisconnected(RemoteQueueError, ConnectionError):
+    'The connection to the owner process is closed, the command may or may not have been applied'
+
+def parseItem(data: dict) -> Union[Order, Batch]:
+    'Queue item from its JSON form, orders carry an orderID and batches do not'
+    return Order.model_validate(data) if 'orderID' in data else Batch.model_validate(data)
+
+def _frame(message: dict) -> bytes:
+    return json.dumps(message, default = str).encode() + b'\n'
+
+
+class QueueServer:
+    '''
+    Serves the queues owned by this process to RemoteQueues in other processes.
+
+    Attributes:
+    - stores: Stores - The queues, only read here, every change goes through a store's actor. Each actor's
+      onChange should publish its store.
+    - path: str - Unix domain socket the server listens on
+    '''
+    def __init__(self, stores: Stores, path: str):
+        self.stores = stores
+        self.path = path
+        self._clients: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, self.path, limit = FRAME_LIMIT)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for writers in self._clients.values():
+                for writer in list(writers):
+                    writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def state(self, store: Store) -> dict:
+        queue = store.queue
+        return {
+            'event': 'state',
+            'orders': [item.model_dump(mode = 'json') for item in queue.orders],
+            'totalOrders': queue.totalOrders,
+            'totalDrinks': queue.totalDrinks,
+            'etag': queue.etag,
+            'views': store.actor.views
+        }
+
+    async def publish(self, store: Store) -> None:
+        "Sends the store's queue state to every worker connected to it, serialised once."
+        writers = list(self._clients.get(store.storeID, ()))
+        if not writers:
+            return
+        frame = _frame(self.state(store))
+        for writer in writers:
+            writer.write(frame)
+        await asyncio.gather(*(self._drain(store, writer) for writer in writers))
+
+    async def _drain(self, store: Store, writer: asyncio.StreamWriter) -> None:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            self._clients.get(store.storeID, set()).discard(writer)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            hello = json.loads(await reader.readline() or b'{}')
+            if not isinstance(hello, dict) or not isinstance(hello.get('store', DEFAULT_STORE), str):
+                raise ValueError(f'Expected {{"store": str}}, got {hello!r:.200}')
+            store = await self.stores.get(hello.get('store', DEFAULT_STORE))
+        except KeyError as e:
+            writer.write(_frame({'event': 'error', 'error': f'Unknown store: {e.args[0]}'}))
+            writer.close()
+            return
+        except ValueError as e:
+            # Malformed JSON, or a line past FRAME_LIMIT
+            logging.error(f'Malformed hello from a queue worker: {e}')
+            writer.write(_frame({'event': 'error', 'error': f'Malformed hello: {e}'}))
+            writer.close()
+            return
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.error(f'Queue worker connection lost before its hello: {e}')
+            writer.close()
+            return
+
+        clients = self._clients.setdefault(store.storeID, set())
+        clients.add(writer)
+        writer.write(_frame(self.state(store)))
+        pending: Set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                # Commands from one worker are handled concurrently, so the actor can group them
+                task = asyncio.create_task(self._handle(store, json.loads(line), writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.error(f'Queue worker connection lost: {e}')
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    async def _handle(self, store: Store, message: dict, writer: asyncio.StreamWriter) -> None:
+        try:
+            reply = {'id': message['id'], 'result': await self._dispatch(store, message['kind'], message.get('payload'))}
+        except Exception as e:
+            reply = {'id': message['id'], 'error': str(e)}
+        writer.write(_frame(reply))
+        await self._drain(store, writer)
+
+    async def _dispatch(self, store: Store, kind: str, payload):
+        queue, actor = store.queue, store.actor
+        if kind == 'add':
+            return await actor.addOrder(Order.model_validate(payload))
+        if kind == 'complete':
+            drink_identifiers, item_index, station = payload
+            return await actor.complete(drink_identifiers, item_index, station)
+        if kind == 'history':
+            return {
+                'history': [order.model_dump(mode = 'json') for order in queue.getCompletedItems()],
+                'totalOrders': queue.countCompletedOrders(),
+                'totalDrinks': queue.DrinksComplete
+            }
+        if kind == 'summary':
+            return queue.analytics.summary()
+        if kind == 'drinks':
+            if queue.drinkLog is None:
+                raise ValueError('The drink log is off, see DRINK_LOG in config.json')
+            return queue.drinkLog.summary(**payload)
+        if kind == 'order':
+            order = await queue.getOrder(payload)
+            return order.model_dump(mode = 'json') if order else None
+        raise ValueError(f'Unknown command: {kind}')
+
+
+class RemoteQueue:
+    '''
+    A worker's handle on the Queue owned by another process. Takes the place of both the Queue and its
+    QueueActor: commands are awaited like QueueActor's, and orders, totalOrders and totalDrinks are a replica
+    of the owner's, as of the last state event. Once the connection to the owner is lost, the commands waiting
+    on a reply and every later one fail with OwnerDisconnected.
+
+    Attributes:
+    - path: str - Unix domain socket of the owner's QueueServer
+    - store: str - ID of the store whose queue this is
+    - onChange: Callable - Awaited after every state event, e.g. a broadcast to this worker's WebSockets
+    - orders: List - Replica of the owner's queue items
+    - totalOrders, totalDrinks: int - Replica of the owner's totals
+    - etag: str - The owner's Queue.etag
+    - views: Dict[str, List[int]] - The owner's QueueActor.views, the items on each station
+    '''
+    def __init__(self, path: str, store: str = DEFAULT_STORE, onChange: Optional[Callable[[], Awaitable[None]]] = None):
+        self.path = path
+        self.store = store
+        self.onChange = onChange
+        self.orders: List[Union[Order, Batch]] = []
+        self.totalOrders: int = 0
+        self.totalDrinks: int = 0
+        self.etag: str = ''
+        self.views: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._replies: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def connect(cls,
+                      path: str,
+                      store: str = DEFAULT_STORE,
+                      onChange: Optional[Callable[[], Awaitable[None]]] = None) -> 'RemoteQueue':
+        '''
+        Connects to the owner and returns once the store's first state event has been applied, without
+        awaiting onChange for it. Raises RemoteQueueError if the owner can't open the store.
+        '''
+        self = cls(path, store, onChange)
+        self._reader, self._writer = await asyncio.open_unix_connection(path, limit = FRAME_LIMIT)
+        self._writer.write(_frame({'store': store}))
+        line = await self._reader.readline()
+        message = json.loads(line) if line else {'error': 'Connection to the queue owner closed'}
+        if 'error' in message:
+            self._writer.close()
+            self._writer = None
+            raise RemoteQueueError(message['error'])
+        # onChange waits for the next state event, the caller has not taken the RemoteQueue yet
+        await self._apply_state(message, notify = False)
+        self._task = asyncio.create_task(self._read())
+        return self
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def _read(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                if message.get('event') == 'state':
+                    await self._apply_state(message)
+                    continue
+                future = self._replies.pop(message['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    future.set_exception(RemoteQueueError(message['error']))
+                else:
+                    future.set_result(message['result'])
+        finally:
+            # Later submits fail straight away rather than wait on replies that will never come
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(OwnerDisconnected('Connection to the queue owner closed'))
+            self._replies.clear()
+
+    async def _apply_state(self, message: dict, notify: bool = True) -> None:
+        self.orders = [parseItem(item) for item in message['orders']]
+        self.totalOrders = message['totalOrders']
+        self.totalDrinks = message['totalDrinks']
+        self.etag = message['etag']
+        self.views = message['views']
+        if notify and self.onChange:
+            try:
+                await self.onChange()
+            except Exception as e:
+                logging.error(f'Remote queue change notification failed: {e}')
+
+    async def _submit(self, kind: str, payload = None):
+        if self._writer is None:
+            raise OwnerDisconnected('Not connected to the queue owner')
+        self._next_id += 1
+        messageID = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._replies[messageID] = future
+        self._writer.write(_frame({'id': messageID, 'kind': kind, 'payload': payload}))
+        try:
+            await self._writer.drain()
+        except ConnectionError as e:
+            self._replies.pop(messageID, None)
+            raise OwnerDisconnected(f'Connection to the queue owner lost: {e}') from e
+        return await future
+
+    async def addOrder(self, order: Order) -> None:
+        return await self._submit('add', order.model_dump(mode = 'json'))
+
+    async def complete(self,
+                       drink_identifiers: Sequence[str] = (),
+                       item_index: Optional[int] = None,
+                       station: Optional[str] = None) -> None:
+        return await self._submit('complete', [list(drink_identifiers), item_index, station])
+
+    async def history(self) -> dict:
+        'Completed orders as getCompletedItems returns them, with the completed order and drink totals'
+        result = await self._submit('history')
+        result['history'] = [Order.model_validate(order) for order in result['history']]
+        return result
+
+    async def summary(self) -> dict:
+        return await self._submit('summary')
+
+    async def drinks(self, filters: dict) -> dict:
+        "The owner's DrinkLog.summary(**filters)"
+        return await self._submit('drinks', filters)
+
+    async def getOrder(self, orderID: str) -> Optional[Order]:
+        "The owner's Queue.getOrder(orderID)"
+        order = await self._submit('order', orderID)
+        return Order.model_validate(order) if order else None
+
+
+async def serveQueue(URI: str, path: str, stop: Optional[asyncio.Event] = None) -> None:
+    '''
+    Runs the owner process: loads the default store's Queue from the database at URI, and the other stores'
+    from their partitions of it as workers first ask for them, serves them on path until stop is set, and
+    applies config.json reloads to them.
+    '''
+    server: Optional[QueueServer] = None
+
+    async def open(store: Store) -> None:
+        await openQueue(store, URI, onChange = lambda: server.publish(store))
+
+    stores = Stores(open, CONFIG.get().STORES)
+    server = QueueServer(stores, path)
+    CONFIG.subscribe(stores.reconfigure)
+    await stores.get()
+    await server.start()
+    watcher = asyncio.create_task(CONFIG.watch())
+    try:
+        await (stop or asyncio.Event()).wait()
+    finally:
+        watcher.cancel()
+        await server.stop()
+        await stores.close()
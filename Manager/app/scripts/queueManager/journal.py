@@ -0,0 +1,211 @@
+'''
+Append-only journal of queue mutations, with periodic snapshots, for recovering a Queue after a restart.
+
+Loading from the database replays every order the queue has ever held through Queue.addOrder. With a journal,
+recovery loads the latest snapshot instead and replays only the events written after it.
+
+The journal is a directory next to the database, e.g. database.journal/ for database.db, holding:
+    journal.log   - Records, each a header (payload length, CRC32, sequence number) and a JSON event:
+                    {"kind": "add", "at": iso, "orders": [...]} for every Queue.addOrders run
+                    {"kind": "complete", "at": iso, "drinks": [...], "station": str} for every completion
+    snapshot.bin  - Queue.getState(), the sequence number of the last event in it and the day it was taken,
+                    pickled and compressed
+
+Events are written as the QueueActor applies them, and the journal is fsynced once per group of commands,
+before the group is committed to the database. The events of a group whose commit fails are truncated from
+the log. A crash between the fsync and the commit leaves a group only in the journal, so recovery writes
+whatever of the replayed events the database is missing. Every snapshot_every events, and after a config
+reload, a snapshot is written (to a temporary file, fsynced and renamed over the last one) and the log is
+truncated. A torn record at the end of the log, from a crash mid-write, is dropped on recovery, as are
+records already in the snapshot. The queue only holds the day's orders, so a snapshot taken on an earlier
+day is not recovered: the queue is loaded from the database instead, as Queue._load_from_db loads only
+today's orders.
+'''
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.config import JournalConfig
+
+from typing import Iterator, Optional, Tuple
+import asyncio, json, os, pickle, struct, zlib
+
+HEADER = struct.Struct('>IIQ')
+LOG_FILE = 'journal.log'
+SNAPSHOT_FILE = 'snapshot.bin'
+
+def journalDirectory(URI: str) -> Optional[str]:
+    'Journal directory of the SQLite database at URI, None for in-memory databases'
+    if ':memory:' in URI:
+        return None
+    root, _ = os.path.splitext(URI.split(':///', 1)[1])
+    return root + '.journal'
+
+def _checksum(seq: int, payload: bytes) -> int:
+    return zlib.crc32(payload, zlib.crc32(seq.to_bytes(8, 'big')))
+
+def readRecords(path: str) -> Iterator[Tuple[int, int, dict]]:
+    '''
+    (sequence number, end offset, event) of every intact record in the log at path, stopping at the first
+    record that is short or fails its checksum.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + HEADER.size <= len(data):
+        length, checksum, seq = HEADER.unpack_from(data, offset)
+        start, end = offset + HEADER.size, offset + HEADER.size + length
+        payload = data[start:end]
+        if end > len(data) or _checksum(seq, payload) != checksum:
+            return
+        offset = end
+        yield seq, offset, json.loads(payload)
+
+
+class Journal:
+    '''
+    Attributes:
+    - directory: str - Holds journal.log and snapshot.bin
+    - snapshotEvery: int - Events between snapshots
+    - fsync: bool - fsync the log once per group and snapshots before they replace the last one
+    - seq: int - Sequence number of the last event written
+    - sinceSnapshot: int - Events written since the last snapshot
+    '''
+    def __init__(self, directory: str, snapshotEvery: int = 1000, fsync: bool = True):
+        self.directory = directory
+        self.snapshotEvery = snapshotEvery
+        self.fsync = fsync
+        self.seq: int = 0
+        self.sinceSnapshot: int = 0
+        self._log = None
+        self._dirty = False
+
+    @classmethod
+    def forDatabase(cls, URI: str, config: JournalConfig) -> Optional['Journal']:
+        'The journal of the database at URI, None when journaling is off or the database is in memory'
+        directory = journalDirectory(URI)
+        if not config.enabled or directory is None:
+            return None
+        return cls(directory, config.snapshot_every, config.fsync)
+
+    @property
+    def logPath(self) -> str:
+        return os.path.join(self.directory, LOG_FILE)
+
+    @property
+    def snapshotPath(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshotPath)
+
+    async def recover(self, queue: Queue) -> Optional[int]:
+        '''
+        Restores queue from the latest snapshot and replays the events after it, writing to the queue's database
+        whatever of them it is missing. Truncates a torn record from the end of the log. Returns the number of
+        events replayed, or None, leaving queue as it was, when the snapshot was taken before today by the
+        queue's clock.
+        '''
+        with open(self.snapshotPath, 'rb') as f:
+            snapshot = pickle.loads(zlib.decompress(f.read()))
+        if snapshot.get('date') != queue.now().date().isoformat():
+            return None
+        queue.setState(snapshot['state'])
+        self.seq = snapshot['seq']
+
+        replayed, end = 0, 0
+        orders, completions = [], []
+        if os.path.exists(self.logPath):
+            for seq, end, event in readRecords(self.logPath):
+                if seq <= self.seq:
+                    continue
+                received, completion = await queue.replay(event)
+                orders.extend(received)
+                completions.extend(completion)
+                self.seq = seq
+                replayed += 1
+            if end != os.path.getsize(self.logPath):
+                os.truncate(self.logPath, end)
+        if queue.connection and (orders or completions):
+            await queue.connection.saveMissing(orders, completions)
+        self.sinceSnapshot = replayed
+        self._openLog()
+        return replayed
+
+    def _openLog(self) -> None:
+        os.makedirs(self.directory, exist_ok = True)
+        self._log = open(self.logPath, 'ab')
+
+    def append(self, event: dict) -> int:
+        'Buffers an event, it is durable once sync() returns. Returns its sequence number.'
+        if self._log is None:
+            self._openLog()
+        self.seq += 1
+        payload = json.dumps(event, separators = (',', ':'), default = str).encode()
+        self._log.write(HEADER.pack(len(payload), _checksum(self.seq, payload), self.seq) + payload)
+        self.sinceSnapshot += 1
+        self._dirty = True
+        return self.seq
+
+    def mark(self) -> Tuple[int, int, int]:
+        'Where the log is now, to discard the events appended after it'
+        if self._log is None:
+            self._openLog()
+        return self.seq, self.sinceSnapshot, self._log.tell()
+
+    async def discard(self, mark: Tuple[int, int, int]) -> None:
+        'Drops the events appended since mark, e.g. when their commit failed. They may have been synced, so is the drop.'
+        self.seq, self.sinceSnapshot, position = mark
+        self._log.flush()
+        self._log.truncate(position)
+        # Appends go to the end anyway, this keeps tell(), and so the next mark, in step with it
+        self._log.seek(position)
+        if self.fsync:
+            await asyncio.to_thread(os.fsync, self._log.fileno())
+        self._dirty = False
+
+    async def sync(self) -> None:
+        'Writes out every buffered event, with one fsync for all of them'
+        if not self._dirty:
+            return
+        self._log.flush()
+        if self.fsync:
+            await asyncio.to_thread(os.fsync, self._log.fileno())
+        self._dirty = False
+
+    def snapshotDue(self) -> bool:
+        return self.sinceSnapshot >= self.snapshotEvery
+
+    async def snapshot(self, queue: Queue) -> None:
+        '''
+        Replaces the snapshot with the queue's current state and empties the log. The state is pickled
+        before returning to the event loop, so it is consistent with self.seq.
+        '''
+        await self.sync()
+        data = zlib.compress(pickle.dumps(
+            {'seq': self.seq, 'date': queue.now().date().isoformat(), 'state': queue.getState()}, pickle.HIGHEST_PROTOCOL
+        ), 1)
+        await asyncio.to_thread(self._writeSnapshot, data)
+        self.sinceSnapshot = 0
+
+    def _writeSnapshot(self, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok = True)
+        temporary = self.snapshotPath + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temporary, self.snapshotPath)
+        if self.fsync:
+            directory = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        # Events up to seq are in the snapshot now, recovery would skip them even if this truncate is lost
+        if self._log is None:
+            self._openLog()
+        self._log.truncate(0)
+
+    def close(self) -> None:
+        if self._log:
+            self._log.close()
+            self._log = None
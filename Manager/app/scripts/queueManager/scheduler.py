@@ -0,0 +1,268 @@
+from Manager.app.models import Drink, Order, Station, StationPlan, ShotGroup, Jug
+from Manager.app.models.catalog import CATALOG
+from Manager.app.scripts.queueManager import Batch
+from Manager.app.scripts.config import Config
+from Manager.app.scripts.services.frames import itemID
+
+from typing import Dict, Hashable, Iterable, List, Optional, Union
+import math
+
+DEFAULT_PREP_SECONDS = {'shot': 25, 'steam': 35, 'pour': 10, 'switch': 0}
+DECAF_OPTION = 'Decaf'
+DECAF_BIT = CATALOG.bit(DECAF_OPTION)
+
+def grinder(drink: Drink) -> Optional[str]:
+    "Hopper the drink's shots are ground from, None if it has no shots"
+    if not drink.shots:
+        return None
+    return 'decaf' if drink.optionBits & DECAF_BIT else 'regular'
+
+def countSwitches(grinders: Iterable[Optional[str]], current: Optional[str] = None) -> int:
+    'Hopper changes when pulling shots from grinders in order, starting with the grinder set to current'
+    switches = 0
+    for hopper in grinders:
+        if hopper is None:
+            continue
+        if current is not None and hopper != current:
+            switches += 1
+        current = hopper
+    return switches
+
+def hopperOrder(drinks: Iterable[Drink], current: Optional[str] = None) -> List[str]:
+    'Hoppers the drinks need in the order to pull them: the current one first if needed, then by first appearance'
+    needed = [hopper for hopper in dict.fromkeys(grinder(drink) for drink in drinks) if hopper]
+    if current in needed:
+        needed.remove(current)
+        needed.insert(0, current)
+    return needed
+
+class StationScheduler:
+    '''
+    Assigns the items of a Queue to stations (espresso machines) without changing the queue itself.
+
+    Items are taken in queue order, so nobody is overtaken, and each goes to the station that would finish
+    it soonest given what that station already has (greedy list scheduling). Stations with more group heads or
+    steam wands naturally take more of the work, and every station sees its items in the order customers queued.
+
+    Preparation time of an item on a station:
+        - Shots: each drink needs ceil(shots / 2) pulls, spread over the station's group heads.
+        - Milk: the item's milk is split into jugs of jug_size, spread over the station's steam wands.
+        - Shots and milk run in parallel, then every drink takes a fixed time to pour.
+        - Every change of grinder hopper (regular to decaf or back) adds a fixed time, pulling in plan order.
+
+    Stations are assumed to keep their grinder set to the last hopper they used, so items needing the
+    other hopper are cheaper on a station that is already set to it and decaf work tends to stay together.
+    Each station's next items are also planned along both dimensions, milk and shots, see plan.
+
+    Given a dict of the stations items were assigned to before, views keeps items where they are and only
+    assigns the new ones, so the bar does not see an item it has started move to another machine when the
+    items ahead of it are completed. Work moves between stations only once one station is rebalance_seconds
+    behind another, and then only items past a station's next lookahead items, from the back of its queue.
+
+    Attributes:
+    - stations: List[Station] - Configured stations, in display order
+    - prep_seconds: dict - Seconds per shot pull ('shot'), per jug steamed ('steam'), per drink poured ('pour')
+      and per grinder hopper change ('switch')
+    - lookahead: int - How many of a station's next items a plan covers, and never move to another station
+    - rebalance_seconds: float - How far behind another station a station gets before its work is moved
+    '''
+    def __init__(self,
+                 stations: List[Station],
+                 prep_seconds: Optional[dict] = None,
+                 lookahead: int = 2,
+                 rebalance_seconds: float = 300):
+        self.stations = stations
+        self.prep_seconds = {**DEFAULT_PREP_SECONDS, **(prep_seconds or {})}
+        self.lookahead = lookahead
+        self.rebalance_seconds = rebalance_seconds
+
+    @classmethod
+    def fromConfig(cls, config: Config) -> 'StationScheduler':
+        return cls(config.STATIONS, config.PREP_SECONDS, config.PLAN_LOOKAHEAD, config.REBALANCE_SECONDS)
+
+    def estimate(self, item: Union[Order, Batch], station: Station, current_grinder: Optional[str] = None) -> float:
+        'Seconds the station needs to prepare every drink in the item, with its grinder set to current_grinder.'
+        pulls = sum(math.ceil(d.shots / 2) for d in item.drinks if d.shots)
+        volume = sum(d.milk_volume for d in item.drinks if d.milk and d.milk != "No Milk")
+        jugs = math.ceil(volume / station.jug_size) if volume else 0
+
+        shot_time = math.ceil(pulls / station.groups) * self.prep_seconds['shot']
+        steam_time = math.ceil(jugs / station.steam_wands) * self.prep_seconds['steam']
+        return max(shot_time, steam_time) + len(item.drinks) * self.prep_seconds['pour'] + \
+            self.switchSeconds(item, current_grinder)
+
+    def switchSeconds(self, item: Union[Order, Batch], current_grinder: Optional[str] = None) -> float:
+        'Seconds spent changing grinder hoppers for the item, pulling its shots in plan order.'
+        switches = countSwitches(hopperOrder(item.drinks, current_grinder), current_grinder)
+        return switches * self.prep_seconds['switch']
+
+    def _schedule(self,
+                  items: List[Union[Order, Batch]],
+                  available_in: Optional[Dict[str, float]],
+                  grinders: Optional[Dict[str, str]]):
+        if not self.stations:
+            return [], {}
+        finish = {station.name: (available_in or {}).get(station.name, 0.0) for station in self.stations}
+        hoppers = {station.name: (grinders or {}).get(station.name) for station in self.stations}
+        assignment = []
+        for item in items:
+            finished_at = {s.name: finish[s.name] + self.estimate(item, s, hoppers[s.name]) for s in self.stations}
+            name = min(finished_at, key = finished_at.get)
+            finish[name] = finished_at[name]
+            hoppers[name] = (hopperOrder(item.drinks, hoppers[name]) or [hoppers[name]])[-1]
+            assignment.append(name)
+        return assignment, finish
+
+    def assign(self,
+               items: List[Union[Order, Batch]],
+               available_in: Optional[Dict[str, float]] = None,
+               grinders: Optional[Dict[str, str]] = None) -> List[str]:
+        '''
+        Returns the name of the station each item is assigned to, in queue order, or nothing with no stations.
+
+        Parameters:
+            - items: queue items to assign, in queue order
+            - available_in: seconds until each station is free of work already in progress, default 0
+            - grinders: hopper each station's grinder is set to, default unknown
+        '''
+        return self._schedule(items, available_in, grinders)[0]
+
+    def makespan(self,
+                 items: List[Union[Order, Batch]],
+                 available_in: Optional[Dict[str, float]] = None,
+                 grinders: Optional[Dict[str, str]] = None) -> float:
+        'Seconds until every item is finished under the current assignment.'
+        return max(self._schedule(items, available_in, grinders)[1].values(), default = 0.0)
+
+    def views(self, items: List[Union[Order, Batch]], assigned: Optional[Dict[str, str]] = None) -> Dict[str, List[int]]:
+        '''
+        Queue indexes of the items assigned to each station.
+
+        Parameters:
+            - items: queue items, in queue order
+            - assigned: station names by orderID or batchID from the last call, updated in place. Items keep
+              their station and only new items are assigned, default every item is assigned afresh
+
+        With no stations configured there are no views, and nothing is assigned.
+        '''
+        out = {station.name: [] for station in self.stations}
+        if assigned is None:
+            for index, name in enumerate(self.assign(items)):
+                out[name].append(index)
+            return out
+
+        keys = [itemID(item) for item in items]
+        present = set(keys)
+        for key in [key for key, name in assigned.items() if key not in present or name not in out]:
+            # Completed, or on a station that is no longer configured
+            del assigned[key]
+        if not self.stations:
+            return out
+
+        finish = {station.name: 0.0 for station in self.stations}
+        hoppers: Dict[str, Optional[str]] = {station.name: None for station in self.stations}
+        byName = {station.name: station for station in self.stations}
+        for index, (item, key) in enumerate(zip(items, keys)):
+            name = assigned.get(key)
+            if name is None:
+                finished_at = {s.name: finish[s.name] + self.estimate(item, s, hoppers[s.name]) for s in self.stations}
+                name = assigned[key] = min(finished_at, key = finished_at.get)
+            finish[name] += self.estimate(item, byName[name], hoppers[name])
+            hoppers[name] = (hopperOrder(item.drinks, hoppers[name]) or [hoppers[name]])[-1]
+            out[name].append(index)
+
+        self._rebalance(items, keys, assigned, out, finish, byName)
+        return out
+
+    def _rebalance(self, items, keys, assigned, out, finish, byName) -> None:
+        'Moves items from the back of the busiest station to the idlest while it is rebalance_seconds behind'
+        while len(finish) > 1:
+            busiest = max(finish, key = finish.get)
+            idlest = min(finish, key = finish.get)
+            if finish[busiest] - finish[idlest] <= self.rebalance_seconds or len(out[busiest]) <= self.lookahead:
+                return
+            index = out[busiest][-1]
+            cost = self.estimate(items[index], byName[idlest])
+            if finish[idlest] + cost >= finish[busiest]:
+                # Moving it would only make the other station the busiest
+                return
+            finish[busiest] -= self.estimate(items[index], byName[busiest])
+            finish[idlest] += cost
+            out[busiest].pop()
+            out[idlest] = sorted(out[idlest] + [index])
+            assigned[keys[index]] = idlest
+
+    def plan(self,
+             items: List[Union[Order, Batch]],
+             station: Station,
+             indexes: Optional[List[int]] = None,
+             current_grinder: Optional[str] = None) -> StationPlan:
+        '''
+        Plans the station's next lookahead items along both batching dimensions.
+
+        Milk: every item's milk drinks are poured from jugs of one milk and texture, split at the station's jug_size.
+        Batches are already packed by the Queue, so each jug belongs to one item.
+
+        Shots: pulls across the items are grouped by grinder (regular or decaf hopper) and shot count. Groups on the
+        grinder the station is set to go first, or the first drink's grinder if it isn't needed, then the other hopper.
+        So the grinder changes at most once per plan however the drinks are interleaved in the queue.
+
+        Parameters:
+            - items: the station's items, in queue order
+            - station: Station the plan is for
+            - indexes: queue indexes of items, default their position in items
+            - current_grinder: hopper the station's grinder is set to, if known
+        '''
+        window = items[:self.lookahead]
+        indexes = (indexes if indexes is not None else list(range(len(items))))[:self.lookahead]
+        drinks = [drink for item in window for drink in item.drinks]
+
+        jugs: List[Jug] = []
+        for item in window:
+            open_jugs: Dict[Hashable, Jug] = {}
+            for drink in item.drinks:
+                if not drink.milk_volume or drink.milk in (None, "No Milk"):
+                    continue
+                # Milks that aren't configured share a batching key
+                key = drink.batchKey if drink.batchKey != CATALOG.otherKey else (drink.milk, drink.texture)
+                jug = open_jugs.get(key)
+                if jug is None or jug.volume + drink.milk_volume > station.jug_size:
+                    jug = Jug(milk = drink.milk, texture = drink.texture, volume = 0, drinkIDs = [])
+                    open_jugs[key] = jug
+                    jugs.append(jug)
+                jug.volume += drink.milk_volume
+                jug.drinkIDs.append(drink.identifier)
+
+        groups: Dict[tuple, ShotGroup] = {}
+        hoppers = [grinder(drink) for drink in drinks]
+        for drink, hopper in zip(drinks, hoppers):
+            if hopper is None:
+                continue
+            key = (hopper, drink.shots)
+            if key not in groups:
+                groups[key] = ShotGroup(grinder = hopper, shots = drink.shots, drinkIDs = [])
+            groups[key].drinkIDs.append(drink.identifier)
+
+        shots = [
+            group for hopper in hopperOrder(drinks, current_grinder) for group in groups.values() if group.grinder == hopper
+        ]
+
+        return StationPlan(
+            station = station.name,
+            indexes = indexes,
+            jugs = jugs,
+            shots = shots,
+            grinderSwitches = countSwitches((group.grinder for group in shots), current_grinder),
+            queueOrderSwitches = countSwitches(hoppers, current_grinder)
+        )
+
+    def plans(self,
+              items: List[Union[Order, Batch]],
+              views: Optional[Dict[str, List[int]]] = None,
+              assigned: Optional[Dict[str, str]] = None) -> Dict[str, StationPlan]:
+        'Plans of every station for the current assignment of the queue, or the given views of it'
+        views = views if views is not None else self.views(items, assigned)
+        return {
+            station.name: self.plan([items[i] for i in views.get(station.name, [])], station, views.get(station.name, []))
+            for station in self.stations
+        }
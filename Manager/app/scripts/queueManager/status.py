@@ -0,0 +1,104 @@
+'''
+Where each order is, for customer-facing screens that don't need the whole queue.
+
+An order is
+    queued     - while its drinks are waiting in the queue, none of them in a batch
+    batched    - while any of its waiting drinks is in a batch
+    completed  - once every drink is made
+
+OrderStatuses keeps the status of every order with drinks in the queue in a dict, rebuilt in one pass over the
+items after each change, so looking an order up is O(1). Only the orders whose status changed are passed on
+to subscribers, e.g. a Server-Sent Events stream per pickup screen. Completed orders leave the dict, their
+status is read from the queue's history (Queue.getOrder) instead.
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.queueManager import Batch
+
+from typing import AsyncIterator, Collection, Dict, Iterable, List, Optional, Set, Union
+import asyncio, json
+
+QUEUED = 'queued'
+BATCHED = 'batched'
+COMPLETED = 'completed'
+
+# Changes a subscriber can fall behind by before it is dropped, a screen that reconnects starts afresh
+SUBSCRIBER_BACKLOG = 256
+
+def orderStatuses(items: Iterable[Union[Order, Batch]]) -> Dict[str, dict]:
+    'Status of every order with drinks in items, by orderID'
+    statuses: Dict[str, dict] = {}
+    for item in items:
+        if isinstance(item, Batch):
+            for drink in item.drinks:
+                statuses[drink.orderID] = {'orderID': drink.orderID, 'customer': drink.customer, 'status': BATCHED}
+        elif item.orderID not in statuses:
+            statuses[item.orderID] = {'orderID': item.orderID, 'customer': item.customer, 'status': QUEUED}
+    return statuses
+
+def orderStatus(order: Order) -> dict:
+    'Status of an order as received, from its completion times'
+    return {
+        'orderID': order.orderID,
+        'customer': order.customer,
+        'status': COMPLETED if order.timeComplete else QUEUED
+    }
+
+def serverSentEvent(change: dict) -> str:
+    return f"event: status\ndata: {json.dumps(change)}\n\n"
+
+
+class OrderStatuses:
+    '''
+    Attributes:
+    - statuses: Dict[str, dict] - Status of every order with drinks in the queue, by orderID
+    - subscribers: Set[asyncio.Queue] - Each gets the list of changes of every update
+    '''
+    def __init__(self):
+        self.statuses: Dict[str, dict] = {}
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def get(self, orderID: str) -> Optional[dict]:
+        return self.statuses.get(orderID)
+
+    def update(self, items: Iterable[Union[Order, Batch]]) -> List[dict]:
+        'Rebuilds the statuses from the queue items, notifies subscribers and returns the changes'
+        statuses = orderStatuses(items)
+        changes = [status for orderID, status in statuses.items()
+                   if self.statuses.get(orderID, {}).get('status') != status['status']]
+        changes += [{**status, 'status': COMPLETED} for orderID, status in self.statuses.items() if orderID not in statuses]
+        self.statuses = statuses
+
+        if changes:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.put_nowait(changes)
+                except asyncio.QueueFull:
+                    self.subscribers.discard(subscriber)
+        return changes
+
+    async def stream(self, orderIDs: Collection[str] = (), keepalive: float = 15) -> AsyncIterator[str]:
+        '''
+        Server-Sent Events: the current status of every order in the queue, then each change as it happens,
+        only for orderIDs if any are given. A comment is sent every keepalive seconds without a change, so
+        proxies keep the connection open. Ends if the subscriber falls SUBSCRIBER_BACKLOG updates behind.
+        '''
+        wanted = set(orderIDs)
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize = SUBSCRIBER_BACKLOG)
+        self.subscribers.add(subscriber)
+        try:
+            for status in self.statuses.values():
+                if not wanted or status['orderID'] in wanted:
+                    yield serverSentEvent(status)
+            while True:
+                try:
+                    changes = await asyncio.wait_for(subscriber.get(), keepalive)
+                except asyncio.TimeoutError:
+                    if subscriber not in self.subscribers:
+                        return
+                    yield ': keepalive\n\n'
+                    continue
+                for change in changes:
+                    if not wanted or change['orderID'] in wanted:
+                        yield serverSentEvent(change)
+        finally:
+            self.subscribers.discard(subscriber)
@@ -0,0 +1,142 @@
+'''
+Independent queues for several shops in one Manager process.
+
+Every store has its own Queue (and so its own lookupTable and batching state), its own QueueActor task and its
+own WebSocket clients. Stores are opened on first use, by a function the app supplies, so a store that is
+configured but never used costs nothing, and stores are sharded across asyncio tasks: one actor per store,
+none of them waiting on another store's planning or database writes.
+'''
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.journal import Journal
+from Manager.app.scripts.queueManager.status import OrderStatuses
+from Manager.app.scripts.analytics.drinklog import DrinkLog
+from Manager.app.scripts.services import ConnectionManager
+from Manager.app.scripts.services.admission import Admission
+from Manager.app.scripts.config import CONFIG, Config
+
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+import asyncio, os, re
+
+DEFAULT_STORE = 'default'
+STORE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def storeDatabaseURI(URI: str, storeID: str) -> str:
+    '''
+    The store's persistence partition: URI itself for DEFAULT_STORE, and a database file named after the store
+    next to it for every other store. In-memory databases are already private to each store's connection.
+    '''
+    if storeID == DEFAULT_STORE or ':memory:' in URI:
+        return URI
+    prefix, path = URI.split(':///', 1)
+    root, extension = os.path.splitext(path)
+    return f"{prefix}:///{root}-{storeID}{extension}"
+
+async def openQueue(store: 'Store', URI: str, onChange: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+    '''
+    Loads the store's queue and starts the actor that owns it. The queue is recovered from the journal of the
+    store's partition of URI when it has a snapshot from today, and loaded from the database otherwise, which
+    starts a new journal.
+    '''
+    URI = storeDatabaseURI(URI, store.storeID)
+    config = CONFIG.get()
+    store.queue = await Queue.create(URI)
+    if config.DRINK_LOG:
+        store.queue.drinkLog = DrinkLog.forDatabase(URI)
+    journal = Journal.forDatabase(URI, config.JOURNAL)
+    recovered = journal is not None and journal.exists() and await journal.recover(store.queue) is not None
+    if not recovered:
+        await store.queue._load_from_db()
+        if journal:
+            await journal.snapshot(store.queue)
+    store.actor = QueueActor(store.queue, onChange = onChange, journal = journal)
+    store.actor.start()
+
+
+class Store:
+    '''
+    One shop.
+
+    Attributes:
+    - storeID: str - The store's ID, used in its routes and its database file name
+    - queue: Queue - The store's queue, a RemoteQueue in worker processes
+    - actor: QueueActor - Applies commands to queue, the same RemoteQueue in worker processes
+    - connections: ConnectionManager - The store's WebSocket clients
+    - statuses: OrderStatuses - Status of the store's pending orders, for its order status routes
+    - admission: Admission - The store's ingest buffer and source rate limits, for /receive
+    '''
+    def __init__(self, storeID: str, queue = None, actor = None):
+        self.storeID = storeID
+        self.queue: Optional[Queue] = queue
+        self.actor: Optional[QueueActor] = actor
+        self.connections = ConnectionManager()
+        self.statuses = OrderStatuses()
+        self.admission = Admission()
+
+    async def close(self) -> None:
+        if not isinstance(self.actor, QueueActor):
+            # A RemoteQueue, the owner process closes the queue itself
+            await self.actor.close()
+            return
+        await self.actor.stop()
+        if self.actor.journal:
+            self.actor.journal.close()
+        if self.queue.drinkLog:
+            self.queue.drinkLog.close()
+        if self.queue.connection:
+            await self.queue.connection.close()
+
+
+class Stores:
+    '''
+    Stores keyed by ID, opened on first use.
+
+    Attributes:
+    - open: Callable - Awaited with a Store that has no queue yet, sets its queue and actor
+    - allowed: set - Store IDs that may be opened, besides DEFAULT_STORE
+    - stores: Dict[str, Store] - Open stores
+    '''
+    def __init__(self, open: Callable[[Store], Awaitable[None]], allowed: Iterable[str] = ()):
+        self.open = open
+        self.allowed = set(allowed)
+        self.stores: Dict[str, Store] = {}
+        self._opening: Dict[str, asyncio.Task] = {}
+
+    def exists(self, storeID: str) -> bool:
+        return storeID == DEFAULT_STORE or storeID in self.allowed
+
+    async def get(self, storeID: str = DEFAULT_STORE) -> Store:
+        'The open store, opening it first if needed. Raises KeyError for stores that are not configured.'
+        store = self.stores.get(storeID)
+        if store is not None:
+            return store
+        if not self.exists(storeID) or not STORE_ID_PATTERN.match(storeID):
+            raise KeyError(storeID)
+
+        # Concurrent first requests share one open
+        task = self._opening.get(storeID)
+        if task is None:
+            task = self._opening[storeID] = asyncio.create_task(self._open(storeID))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._opening.pop(storeID, None)
+
+    async def _open(self, storeID: str) -> Store:
+        store = Store(storeID)
+        await self.open(store)
+        self.stores[storeID] = store
+        return store
+
+    async def reconfigure(self, config: Config) -> None:
+        'Applies a reloaded config: the configured STORES, and the batching settings of every open queue'
+        self.allowed = set(config.STORES)
+        for store in list(self.stores.values()):
+            if isinstance(store.actor, QueueActor):
+                await store.actor.reconfigure(config)
+
+    async def close(self) -> None:
+        for store in list(self.stores.values()):
+            await store.close()
+        self.stores.clear()
@@ -1,14 +1,20 @@
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import asc, text
+from sqlalchemy import asc, text, update
 
 from Manager.app.models.db import Orders, Drinks, Database, AsyncSession
 from Manager.app.scripts.services import PydanticORM
+from Manager.app.scripts.metrics import DB_COMMIT_SECONDS
+from Manager.app.scripts.profiling import profiled
 
-from Manager.app.models import Order
-from typing import List
+from Manager.app.models import Order, Completion
+from typing import List, Optional, Sequence
 from datetime import time, date
 
+ADD_ORDER_COMMIT = DB_COMMIT_SECONDS.labels('addOrder')
+COMPLETE_ORDER_COMMIT = DB_COMMIT_SECONDS.labels('completeOrder')
+COMPLETE_DRINK_COMMIT = DB_COMMIT_SECONDS.labels('completeDrink')
+SAVE_CHANGES_COMMIT = DB_COMMIT_SECONDS.labels('saveChanges')
 
 class Connection:
     def __init__(self, session):
@@ -23,39 +29,91 @@ class Connection:
     async def close(self):
         await self.session.close()
 
+    def _stageOrder(self, order: Order) -> None:
+        '''Adds an order and its drinks to the session without committing'''
+        db_order = Orders(
+            orderID = order.orderID,
+            customer = order.customer,
+            dateReceived = order.dateReceived,
+            timeReceived = order.timeReceived 
+        )
+        self.session.add(db_order)
+
+        for drink in order.drinks:
+            db_drink = Drinks(
+                orderID = order.orderID,
+                customer = drink.customer,
+                drink = drink.drink,
+                milk = drink.milk,
+                milk_volume = drink.milk_volume,
+                shots = drink.shots,
+                temperature = drink.temperature,
+                texture = drink.texture,
+                options = ','.join(drink.options),
+                identifier = drink.identifier,
+                timeReceived = drink.timeReceived,
+            )
+            self.session.add(db_drink)
+
+    @profiled('Connection.addOrder')
     async def addOrder(self, order: Order) -> None:
         '''Adds an order and its drinks to the database'''
         try:
-            db_order = Orders(
-                orderID = order.orderID,
-                customer = order.customer,
-                dateReceived = order.dateReceived,
-                timeReceived = order.timeReceived 
-            )
-            self.session.add(db_order)
-
-            for drink in order.drinks:
-                db_drink = Drinks(
-                    orderID = order.orderID,
-                    customer = drink.customer,
-                    drink = drink.drink,
-                    milk = drink.milk,
-                    milk_volume = drink.milk_volume,
-                    shots = drink.shots,
-                    temperature = drink.temperature,
-                    texture = drink.texture,
-                    options = ','.join(drink.options),
-                    identifier = drink.identifier,
-                    timeReceived = drink.timeReceived,
-                )
-                self.session.add(db_drink)
-            await self.session.commit()
+            self._stageOrder(order)
+            with ADD_ORDER_COMMIT.time():
+                await self.session.commit()
+
+        except Exception as e:
+            await self.session.rollback()
+            raise e
+
+    @profiled('Connection.saveChanges')
+    async def saveChanges(self, orders: Sequence[Order] = (), completions: Sequence[Completion] = ()) -> None:
+        '''
+        Adds new orders and marks completed drinks and orders in a single transaction.
+        New orders are written first, so an order may be added and completed in the same call.
+        '''
+        try:
+            for order in orders:
+                self._stageOrder(order)
+
+            for completion in completions:
+                if completion.drinkIDs:
+                    await self.session.execute(
+                        update(Drinks)
+                        .where(Drinks.identifier.in_(completion.drinkIDs))
+                        .values(timeComplete = completion.time)
+                    )
+                if completion.orderIDs:
+                    await self.session.execute(
+                        update(Orders)
+                        .where(Orders.orderID.in_(completion.orderIDs))
+                        .values(timeComplete = completion.time)
+                    )
+
+            with SAVE_CHANGES_COMMIT.time():
+                await self.session.commit()
 
         except Exception as e:
             await self.session.rollback()
             raise e
         
 
+    @profiled('Connection.saveMissing')
+    async def saveMissing(self, orders: Sequence[Order] = (), completions: Sequence[Completion] = ()) -> None:
+        '''
+        Like saveChanges, for changes that may already have been committed: orders the database already has are
+        skipped, and completions write the same timeComplete again.
+        '''
+        if orders:
+            result = await self.session.execute(
+                select(Orders.orderID).where(Orders.orderID.in_([order.orderID for order in orders]))
+            )
+            existing = set(result.scalars())
+            orders = [order for order in orders if order.orderID not in existing]
+        await self.saveChanges(orders, completions)
+
+    @profiled('Connection.completeOrder')
     async def completeOrder(self, orderID: str, time: time) -> None:
         '''Updates the timeComplete field for an order record with the respective orderID'''
         try:
@@ -65,12 +123,14 @@ class Connection:
 
             if order:
                 order.timeComplete = time
-                await self.session.commit()
+                with COMPLETE_ORDER_COMMIT.time():
+                    await self.session.commit()
         
         except Exception as e:
             await self.session.rollback()
             raise e
 
+    @profiled('Connection.completeDrink')
     async def completeDrink(self, identifier: int, time: time) -> None:
         '''Updates the timeComplete field for the drink record with the respective identifier'''
         try:
@@ -80,13 +140,15 @@ class Connection:
 
             if drink:
                 drink.timeComplete = time
-                await self.session.commit()
+                with COMPLETE_DRINK_COMMIT.time():
+                    await self.session.commit()
         
         except Exception as e:
             await self.session.rollback()
             raise e
 
 
+    @profiled('Connection.getQueue')
     async def getQueue(self) -> List[Order]:
         '''
         This function returns a list of order objects and their respective drinks. Will only fetch
@@ -112,6 +174,20 @@ class Connection:
         return queue
     
 
+    @profiled('Connection.getOrder')
+    async def getOrder(self, orderID: str) -> Optional[Order]:
+        '''Returns the order with orderID and its drinks, of any day, or None. A primary key lookup.'''
+        query = (
+            select(Orders)
+            .where(Orders.orderID == orderID)
+            .options(selectinload(Orders.drinks))
+        )
+        result = await self.session.execute(query)
+        order = result.scalar_one_or_none()
+        return PydanticORM.readOrdersORM(order) if order else None
+    
+
+    @profiled('Connection.clearOldRecords')
     async def clearOldRecords(self) -> None:
         '''Clears all records from previous day from local storage'''
         current_date = date.today()
@@ -130,6 +206,7 @@ class Connection:
             await self.session.rollback()
             raise e
         
+    @profiled('Connection.clearQueue')
     async def clearQueue(self) -> None:
         try:
             await self.session.execute(text("DELETE FROM drinks"))
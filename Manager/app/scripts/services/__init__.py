@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field, RootModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple, Union
 from fastapi import WebSocket
 from Manager.app.models import Order
 from Manager.app.models.db import Drinks, Orders
+from Manager.app.scripts.metrics import BROADCAST_SECONDS
+from Manager.app.scripts.services.frames import FrameEncoder, JSON
 import json, socket
 
 class JSONList(RootModel):
@@ -35,7 +37,8 @@ class FormData(BaseModel):
 class PydanticORM:
     @staticmethod
     def readDrinksORM(drinks: Drinks) -> dict:
-        out = drinks.__dict__
+        # A copy, the session may hand back the same object to a later query
+        out = dict(drinks.__dict__)
         if out['options']:
             out['options'] = out['options'].split(',')
         else:
@@ -55,19 +58,63 @@ class PydanticORM:
         })
 
 class ConnectionManager:
+    '''
+    A store's WebSocket clients, each with the station whose view it shows and the frame encoding it asked for.
+
+    Attributes:
+    - frames: FrameEncoder - Encodes the queue for every client, see Manager.app.scripts.services.frames
+    '''
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.stations: Dict[WebSocket, Optional[str]] = {}
+        self.encodings: Dict[WebSocket, str] = {}
+        self.codesSent: Dict[WebSocket, Dict[str, int]] = {}
+        self.frames = FrameEncoder()
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, station: Optional[str] = None, encoding: str = JSON):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.stations[websocket] = station
+        self.encodings[websocket] = encoding
+        self.codesSent[websocket] = {}
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
+        self.stations.pop(websocket, None)
+        self.encodings.pop(websocket, None)
+        self.codesSent.pop(websocket, None)
+
+    def subscribedStations(self) -> Set[str]:
+        return set(station for station in self.stations.values() if station)
+
+    def subscribedEncodings(self) -> Set[str]:
+        return set(self.encodings.values())
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        with BROADCAST_SECONDS.time():
+            for connection in self.active_connections:
+                await connection.send_text(message)
+
+    async def broadcastViews(self, messages: Dict[Tuple[Optional[str], str], Union[str, bytes]]):
+        '''
+        Sends each connection the frame for its station and encoding, messages[(station, encoding)], where
+        connections without a station get the station None's. msgpack connections are first sent the codes
+        they haven't seen.
+        '''
+        with BROADCAST_SECONDS.time():
+            for connection in self.active_connections:
+                encoding = self.encodings.get(connection, JSON)
+                message = messages.get((self.stations.get(connection), encoding))
+                if message is None:
+                    continue
+                if encoding == JSON:
+                    await connection.send_text(message)
+                    continue
+                codes = self.frames.codesFrame(self.codesSent[connection])
+                if codes is not None:
+                    await connection.send_bytes(codes)
+                    self.codesSent[connection] = self.frames.codes.sizes()
+                await connection.send_bytes(message)
 
 class Utils:
     @staticmethod
@@ -0,0 +1,105 @@
+'''
+Admission control for /receive, so a burst of orders is turned away at the door rather than piling up
+behind the store's QueueActor and its database commits.
+
+An order is refused before it reaches the actor when:
+    - its source has sent more than source_rate orders a second, beyond a burst of source_burst    429
+    - max_pending admitted orders are still waiting to be planned and persisted                  503
+    - the bar is max_queue_drinks drinks behind, counting the drinks of the orders still waiting   503
+Every refusal says when to try again in Retry-After: when the source's next token is due, after
+retry_after_seconds while the ingest buffer is full, or once the bar has made enough drinks at
+PRIORITY.seconds_per_drink to take the order. An admitted order is never dropped.
+
+Sources are named by the client's address. Only a request from one of trusted_proxies may name its source
+in the X-Order-Source header, anyone else could dodge the limit, and crowd out other sources' buckets, by
+sending a new name each time. Limits are per store and per process, with several workers each one admits
+up to max_pending on its own. Admission is off by default, see ADMISSION in config.json.
+'''
+from Manager.app.scripts.config import AdmissionConfig
+
+from collections import OrderedDict
+from typing import Callable, Optional
+import math, time
+
+SOURCE_HEADER = 'x-order-source'
+MAX_SOURCES = 4096
+
+RATE_LIMITED = 'rate_limited'
+BUFFER_FULL = 'buffer_full'
+QUEUE_FULL = 'queue_full'
+
+def sourceOf(client: Optional[str], header: Optional[str], config: AdmissionConfig) -> str:
+    'The rate limited source of a request from address client, with X-Order-Source header'
+    if header and client in config.trusted_proxies:
+        return header
+    return client or ''
+
+
+class Refusal:
+    '''
+    Attributes:
+    - status_code: int - 429 for a source over its rate, 503 when the store is overloaded
+    - reason: str - RATE_LIMITED, BUFFER_FULL or QUEUE_FULL, the label of the shed orders metric
+    - retry_after: int - Whole seconds for the Retry-After header, at least 1
+    - detail: str - Explanation for the response body
+    '''
+    def __init__(self, status_code: int, reason: str, retry_after: float, detail: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class Admission:
+    '''
+    One store's ingest buffer and source rate limits.
+
+    Attributes:
+    - pending: int - Orders admitted and not yet planned and persisted
+    - pendingDrinks: int - Drinks of those orders
+    - clock: Callable - Monotonic seconds, for the token buckets
+    '''
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.pending = 0
+        self.pendingDrinks = 0
+        self.clock = clock
+        # source -> (tokens, time they were counted), least recently seen first
+        self._buckets: OrderedDict = OrderedDict()
+
+    def limit(self, source: str, config: AdmissionConfig) -> Optional[Refusal]:
+        'Takes a token from the source, a 429 Refusal if it has none left'
+        if config.source_rate is None:
+            return None
+        now = self.clock()
+        tokens, since = self._buckets.pop(source, (config.source_burst, now))
+        tokens = min(config.source_burst, tokens + (now - since) * config.source_rate)
+        if tokens < 1:
+            self._buckets[source] = (tokens, now)
+            return Refusal(429, RATE_LIMITED, (1 - tokens) / config.source_rate,
+                           f'More than {config.source_rate:g} orders a second from {source}')
+        self._buckets[source] = (tokens - 1, now)
+        if len(self._buckets) > MAX_SOURCES:
+            # The longest idle source, its bucket would have refilled long ago
+            self._buckets.popitem(last = False)
+        return None
+
+    def admit(self, drinks: int, queueDrinks: int, config: AdmissionConfig, secondsPerDrink: float) -> Optional[Refusal]:
+        '''
+        Admits an order of drinks to a store whose queue holds queueDrinks, or a 503 Refusal. An admitted order
+        must be released once the actor is done with it, whether or not it succeeded.
+        '''
+        if self.pending >= config.max_pending:
+            return Refusal(503, BUFFER_FULL, config.retry_after_seconds,
+                           f'{self.pending} orders are already waiting to be queued')
+        if config.max_queue_drinks is not None:
+            behind = queueDrinks + self.pendingDrinks + drinks - config.max_queue_drinks
+            if behind > 0:
+                return Refusal(503, QUEUE_FULL, behind * secondsPerDrink,
+                               f'The queue is full, {config.max_queue_drinks} drinks')
+        self.pending += 1
+        self.pendingDrinks += drinks
+        return None
+
+    def release(self, drinks: int) -> None:
+        self.pending -= 1
+        self.pendingDrinks -= drinks
@@ -0,0 +1,134 @@
+'''
+WebSocket frames of the queue, in the encoding each client asked for on /newOrder?encoding=...
+
+json        The default, a text frame: {"orders": [item, ...], "versions": [int, ...], "totalOrders": int, ...}.
+            Every item is serialised to JSON by pydantic once per broadcast, and the items are spliced into
+            each view's frame as they are, so nothing is encoded twice.
+msgpack     A binary MessagePack frame with the same keys, where each item is an array in a fixed field order
+            and the categorical fields are small integers: indexes into code tables that only grow. A client
+            is sent the values it hasn't seen yet in a {"codes": {field: [value, ...]}} frame of their own,
+            before the first frame that uses them, and appends them to its tables.
+
+Every frame has the version of each of its items, parallel to "orders". An item is identified by its orderID,
+or a batch by its batchID, and its version changes whenever its card would, so a client can keep its cards by
+ID and only rebuild those whose version changed.
+
+msgpack item layouts, times as seconds since midnight and datetimes as epoch seconds:
+    order   [0, orderID, customer, timeReceived, drinks]
+    batch   [1, milk, texture, volume, heldUntil, drinks, batchID]
+    drink   [identifier, orderID, customer, drink, milk, texture, temperature, shots, milk_volume, options,
+             timeReceived]
+where milk, texture, drink and temperature are codes, and options a list of codes.
+'''
+from Manager.app.models import Drink, Order
+
+from datetime import datetime, time
+from typing import Dict, Iterable, List, Optional, Set, Union
+import json, msgpack, zlib
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+ENCODINGS = (JSON, MSGPACK)
+CODED = ('drink', 'milk', 'texture', 'temperature', 'options')
+
+def _seconds(moment: Optional[time]) -> Optional[float]:
+    if moment is None:
+        return None
+    return moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1e6
+
+def itemID(item) -> str:
+    'orderID of an order, batchID of a batch'
+    return item.orderID if isinstance(item, Order) else item.batchID
+
+def itemVersion(item) -> int:
+    '''
+    Checksum of what a client shows of the item that can change: the drinks it holds and whether it is held.
+    Drinks themselves never change while they are in the queue.
+    '''
+    held = getattr(item, 'heldUntil', None) is not None
+    return zlib.crc32(' '.join(drink.identifier for drink in item.drinks).encode()) << 1 | held
+
+
+class CodeTable:
+    '''
+    Attributes:
+    - values: Dict[str, List] - Values behind the codes of each categorical field, in the order they were first seen
+    '''
+    def __init__(self):
+        self.values: Dict[str, List] = {field: [] for field in CODED}
+        self._codes: Dict[str, dict] = {field: {} for field in CODED}
+
+    def code(self, field: str, value) -> int:
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[field])
+            self.values[field].append(value)
+        return code
+
+    def sizes(self) -> Dict[str, int]:
+        return {field: len(values) for field, values in self.values.items()}
+
+    def since(self, sizes: Dict[str, int]) -> Dict[str, list]:
+        'Values added after the tables had sizes, by field, only fields that grew'
+        return {field: values[sizes.get(field, 0):] for field, values in self.values.items()
+                if len(values) > sizes.get(field, 0)}
+
+
+class FrameEncoder:
+    '''
+    Encodes a store's queue for its WebSocket clients.
+
+    Attributes:
+    - codes: CodeTable - The codes of msgpack frames, shared by every connection of the store
+    '''
+    def __init__(self):
+        self.codes = CodeTable()
+
+    def items(self, items: Iterable, encodings: Set[str]) -> Dict[str, list]:
+        'Every item encoded once for each encoding in use, ready to be spliced into frames'
+        items = list(items)
+        encoded = {}
+        if JSON in encodings:
+            encoded[JSON] = [item.model_dump_json() for item in items]
+        if MSGPACK in encodings:
+            encoded[MSGPACK] = [self._row(item) for item in items]
+        return encoded
+
+    def frame(self, encoding: str, items: list, fields: dict) -> Union[str, bytes]:
+        'A frame of items from items(), with the other top level fields'
+        if encoding == JSON:
+            rest = json.dumps(fields)[1:]
+            return '{"orders": [' + ', '.join(items) + (']}' if rest == '}' else '], ' + rest)
+        return msgpack.packb({'orders': items, **fields})
+
+    def codesFrame(self, sizes: Dict[str, int]) -> Optional[bytes]:
+        'The codes frame a msgpack client that has seen tables of sizes needs, None if it is up to date'
+        added = self.codes.since(sizes)
+        if not added:
+            return None
+        return msgpack.packb({'codes': added})
+
+    def _row(self, item) -> list:
+        drinks = [self._drinkRow(drink) for drink in item.drinks]
+        if isinstance(item, Order):
+            return [0, item.orderID, item.customer, _seconds(item.timeReceived), drinks]
+        held = item.heldUntil.timestamp() if isinstance(item.heldUntil, datetime) else None
+        return [1, self.codes.code('milk', item.milk), self.codes.code('texture', item.texture), item.volume, held, drinks,
+                item.batchID]
+
+    def _drinkRow(self, drink: Drink) -> list:
+        code = self.codes.code
+        return [
+            drink.identifier,
+            drink.orderID,
+            drink.customer,
+            code('drink', drink.drink),
+            code('milk', drink.milk),
+            code('texture', drink.texture),
+            code('temperature', drink.temperature),
+            drink.shots,
+            drink.milk_volume,
+            [code('options', option) for option in drink.options],
+            _seconds(drink.timeReceived)
+        ]
@@ -0,0 +1,131 @@
+'''
+Streamed, fragment-cached rendering of index.html and history.html.
+
+Each card of the queue and the history is rendered by a macro of cards.html on its own, and the HTML is kept
+in a FragmentCache under the item's key: what it is, its orderID, the drinks it holds and whether it is held.
+Drinks never change while they are shown, only leave their item, so the key changes exactly when the card
+does, and a page only renders the cards that are new or changed since it was last served. The position of a
+card is rendered by the page around it, so cards are reused as items move up the queue.
+
+Pages are rendered by an async Jinja environment with generate_async and sent as they are generated, in
+chunks of at least chunk_size characters, so the first cards are on screen before the last ones are rendered.
+'''
+from Manager.app.models import Order
+from Manager.app.scripts import metrics
+from Manager.app.scripts.services.frames import itemID, itemVersion
+
+from collections import OrderedDict
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup
+from typing import AsyncIterator, Hashable, Optional
+import time
+
+CARDS = 'cards.html'
+
+def cardKey(macro: str, item) -> Hashable:
+    'Everything a card of item renders from, see the module docstring'
+    return (
+        macro,
+        item.orderID if isinstance(item, Order) else None,
+        tuple(drink.identifier for drink in item.drinks),
+        getattr(item, 'heldUntil', None) is not None
+    )
+
+
+class FragmentCache:
+    '''
+    Least recently used cards, keyed by cardKey.
+
+    Attributes:
+    - maxsize: int - Cards kept, a few times the longest queue plus the day's history
+    - hits: int - Cards served from the cache
+    - misses: int - Cards rendered
+    '''
+    def __init__(self, maxsize: int = 8192):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fragments: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+    def get(self, key: Hashable) -> Optional[Markup]:
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            metrics.FRAGMENT_HITS.inc()
+        return fragment
+
+    def put(self, key: Hashable, fragment: Markup) -> Markup:
+        self._fragments[key] = fragment
+        self.misses += 1
+        metrics.FRAGMENT_RENDERS.inc()
+        while len(self._fragments) > self.maxsize:
+            self._fragments.popitem(last = False)
+        return fragment
+
+    def clear(self) -> None:
+        self._fragments.clear()
+
+
+class Pages:
+    '''
+    The HTML pages, built on the first page request rather than at import.
+
+    Attributes:
+    - cache: FragmentCache - Rendered cards, shared by every store, the keys hold orderIDs and drink identifiers
+    - chunk_size: int - Characters collected before a chunk of a page is sent
+    '''
+    def __init__(self, directory: str, cache_size: int = 8192, chunk_size: int = 16384):
+        loader = FileSystemLoader(directory)
+        # Cards are rendered synchronously from inside the page, the pages themselves asynchronously
+        self._cards = Environment(loader = loader, autoescape = True).get_template(CARDS).module
+        self._pages = Environment(loader = loader, autoescape = True, enable_async = True)
+        self.cache = FragmentCache(cache_size)
+        self.chunk_size = chunk_size
+
+    def card(self, item) -> Markup:
+        'The inside of a queue card'
+        return self._render('itemCard', item)
+
+    def historyCard(self, order: Order) -> Markup:
+        'The inside of a history card'
+        return self._render('historyCard', order)
+
+    def _render(self, macro: str, item) -> Markup:
+        key = cardKey(macro, item)
+        fragment = self.cache.get(key)
+        if fragment is None:
+            fragment = self.cache.put(key, Markup(getattr(self._cards, macro)(item)))
+        return fragment
+
+    async def stream(self, name: str, context: dict, timer = None) -> AsyncIterator[str]:
+        '''
+        The page rendered in chunks. timer is a metrics histogram child, observed with the time spent
+        rendering, not the time spent waiting on the client.
+        '''
+        context = {
+            'card': self.card, 'historyCard': self.historyCard, 'itemID': itemID, 'itemVersion': itemVersion, **context
+        }
+        template = self._pages.get_template(name)
+        buffer, size, elapsed = [], 0, 0.0
+        start = time.perf_counter()
+        async for text in template.generate_async(context):
+            buffer.append(text)
+            size += len(text)
+            if size >= self.chunk_size:
+                elapsed += time.perf_counter() - start
+                yield ''.join(buffer)
+                buffer, size = [], 0
+                start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+        if timer is not None:
+            timer.observe(elapsed)
+        if buffer:
+            yield ''.join(buffer)
+
+    async def render(self, name: str, context: dict) -> str:
+        'The whole page at once'
+        return ''.join([chunk async for chunk in self.stream(name, context)])
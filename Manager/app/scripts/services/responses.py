@@ -0,0 +1,151 @@
+'''
+Response compression and conditional GETs.
+
+CompressionMiddleware compresses responses of at least minimum_size bytes with brotli or gzip, whichever the
+client prefers of those it accepts, brotli on a tie. Streamed responses are compressed chunk by chunk and
+flushed after each, so nothing waits in the compressor, and Server-Sent Events are never compressed, a
+proxy could still buffer them. A compressed response is a different representation, so its strong ETag
+gets the coding appended ("abc" -> "abc-br"), and etagMatches strips it again when the client sends it back.
+notModified answers with the ETag as the client sent it, so a 304 carries the same ETag as the 200 it stands for.
+'''
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from typing import Optional
+import brotli, zlib
+
+CODINGS = ('br', 'gzip')
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    'The coding to use for an Accept-Encoding header, None to send the response as it is'
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    for coding in CODINGS:
+        weights.setdefault(coding, weights.get('*', 0.0))
+    best = max(CODINGS, key = lambda coding: weights[coding])
+    return best if weights[best] > 0 else None
+
+def matchingETag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    'The tag of an If-None-Match header that names etag, as it is or as a compressed response carried it'
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == '*':
+        return etag
+    for sent in if_none_match.split(','):
+        sent = sent.strip()
+        tag = sent.removeprefix('W/')
+        for coding in CODINGS:
+            if tag.endswith(f'-{coding}"'):
+                tag = tag[:-len(coding) - 2] + '"'
+        if tag == etag:
+            return sent
+    return None
+
+def etagMatches(if_none_match: Optional[str], etag: str) -> bool:
+    'Whether an If-None-Match header names etag, as it is or as a compressed response carried it'
+    return matchingETag(if_none_match, etag) is not None
+
+def notModified(request: Request, etag: str) -> Optional[Response]:
+    '''
+    A 304 response if the request's If-None-Match names etag, else None. Its ETag is the tag the client
+    sent, with the coding suffix of the compressed 200 it holds, the middleware passes 304s through as they are.
+    '''
+    tag = matchingETag(request.headers.get('if-none-match'), etag)
+    if tag is None:
+        return None
+    return Response(status_code = 304, headers = {'ETag': tag, 'Cache-Control': 'no-cache'})
+
+
+class _Compressor:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        if coding == 'br':
+            self._brotli = brotli.Compressor(quality = brotli_quality)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._brotli:
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    '''
+    Attributes:
+    - minimum_size: int - Smaller responses are sent uncompressed, streamed responses are always compressed
+    - gzip_level: int - zlib compression level, 1-9
+    - brotli_quality: int - brotli quality, 0-11
+    '''
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        coding = negotiate(Headers(scope = scope).get('accept-encoding', '')) if scope['type'] == 'http' else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(self, coding, send).send)
+
+
+class _Responder:
+    'Compresses one response on its way to send'
+    def __init__(self, middleware: CompressionMiddleware, coding: str, send: Send):
+        self.middleware = middleware
+        self.coding = coding
+        self._send = send
+        self._start: Optional[Message] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message['type'] == 'http.response.start':
+            self._start = message
+            return
+        if message['type'] != 'http.response.body' or self._passthrough:
+            await self._send(message)
+            return
+
+        body, more = message.get('body', b''), message.get('more_body', False)
+        if self._compressor is not None:
+            await self._send({'type': 'http.response.body', 'body': self._compressor.compress(body, not more), 'more_body': more})
+            return
+
+        start, self._start = self._start, None
+        headers = MutableHeaders(raw = start['headers'])
+        if ('content-encoding' in headers
+                or headers.get('content-type', '').startswith('text/event-stream')
+                or start['status'] in (204, 304)
+                or not more and len(body) < self.middleware.minimum_size):
+            self._passthrough = True
+            await self._send(start)
+            await self._send(message)
+            return
+
+        self._compressor = _Compressor(self.coding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        data = self._compressor.compress(body, not more)
+        headers['Content-Encoding'] = self.coding
+        headers.add_vary_header('Accept-Encoding')
+        etag = headers.get('etag')
+        if etag and etag.endswith('"') and not etag.startswith('W/'):
+            headers['ETag'] = f'{etag[:-1]}-{self.coding}"'
+        if more:
+            del headers['Content-Length']
+        else:
+            headers['Content-Length'] = str(len(data))
+        await self._send(start)
+        await self._send({'type': 'http.response.body', 'body': data, 'more_body': more})
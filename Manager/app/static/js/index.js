@@ -1,4 +1,6 @@
-const socket = new WebSocket(`ws://${window.location.host}/newOrder`)
+const station = new URLSearchParams(window.location.search).get('station');
+const socketQuery = station ? `?station=${encodeURIComponent(station)}` : '';
+const socket = new WebSocket(`ws://${window.location.host}${basePath}/newOrder${socketQuery}`)
 
 socket.onopen = function() {
     console.log("WebSocket Open");
@@ -7,11 +9,14 @@ socket.onopen = function() {
 socket.onmessage = function(event) {
     const data = JSON.parse(event.data);
 
-    const queue = data.orders.map(order => JSON.parse(order));
+    const queue = data.orders;
     const totalOrders = data.totalOrders;
     const totalDrinks = data.totalDrinks;
 
-    updateOrderList(queue, totalOrders, totalDrinks);
+    updateOrderList(queue, data.versions, totalOrders, totalDrinks, data.indexes);
+    if (data.plan) {
+        updatePlan(data.plan);
+    }
 }
 
 socket.onerror = function(error) {
@@ -22,7 +27,43 @@ socket.onclose = function() {
     console.log("WebSocket closed");
 };
 
-function updateOrderList(queue, totalOrders, totalDrinks) {
+// Cards by item ID (orderID, or batchID for a batch). An item's version changes whenever its card would,
+// so an update only rebuilds the cards of new and changed items, and moves the rest into place.
+// Cards away from the visible part of the list are left empty, and built when they are scrolled near.
+const cards = new Map();
+const cardObserver = new IntersectionObserver(entries => {
+    entries.forEach(entry => {
+        const card = cards.get(entry.target.dataset.key);
+        if (!card) {
+            return;
+        }
+        card.visible = entry.isIntersecting;
+        if (card.visible && !card.built) {
+            buildCard(card);
+        } else if (!card.visible && card.built && card.item) {
+            clearCard(card);
+        }
+    });
+}, {root: document.getElementById('orderList'), rootMargin: '0px 100%'});
+
+// Cards rendered by the server are kept until their item changes
+document.querySelectorAll('#orderList .order-batch-card[data-key]').forEach(element => {
+    const card = {element: element, item: null, version: Number(element.dataset.version), built: true, visible: false};
+    cards.set(element.dataset.key, card);
+    cardObserver.observe(element);
+});
+
+function itemID(item) {
+    return item.orderID || item.batchID;
+}
+
+function escapeHTML(text) {
+    const replacements = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+    return String(text).replace(/[&<>"']/g, character => replacements[character]);
+}
+
+// indexes holds each item's position in the full queue when showing a station's view
+function updateOrderList(queue, versions, totalOrders, totalDrinks, indexes) {
     const totalOrdersElement = document.querySelector('.order-count');
     totalOrdersElement.textContent = "Orders: " + totalOrders;
 
@@ -30,72 +71,166 @@ function updateOrderList(queue, totalOrders, totalDrinks) {
     totalDrinksElement.textContent = "Drinks: " + totalDrinks;
 
     const orderList = document.getElementById('orderList');
-    orderList.innerHTML = '';
-
-    queue.forEach((order, orderIndex) => {
-        const orderCard = document.createElement('div');
-        orderCard.classList.add('order-batch-card');
-        orderCard.id = `order-${orderIndex}`;
-        orderCard.setAttribute('onclick', `selectOrder(${orderIndex}, event)`);
-
-        let orderHeaderHTML = '';
-        if (order.volume >= 0) {
-            const milkType = order.milk.replace('Milk', '');
-            orderHeaderHTML = `
-                <div class="order-batch-card-header">
-                    <h2>${milkType} Milk Batch</h2>
-                </div>`;
-        } else {
-            orderHeaderHTML = `
-                <div class="order-batch-card-header">
-                    <h2>Order</h2>
-                    <h3>${order.customer}</h3>
-                    <h6>${order.timeReceived}</h6>
-                </div>`;
-        };
-
-        let orderBodyHTML = '<div class="order-batch-card-body"><ul>';
-
-        order.drinks.forEach(drink => {
-            let drinkOptionsHTML = '';
-            drink.options.forEach(option => {
-                drinkOptionsHTML += `<p>${option}</p>`;
-            });
-
-            let drinkCustomerHTML = '';
-            if (order.volume) {
-                // If it's a Batch, display the customer's name on the drink card
-                drinkCustomerHTML = `<span class="customer-name">${drink.customer}</span>`;
-            }
+    const selectedKey = selectedItemIndex !== null ? selectedCardKey() : null;
+    const keys = new Set(queue.map(itemID));
+    cards.forEach((card, key) => {
+        if (!keys.has(key)) {
+            cardObserver.unobserve(card.element);
+            card.element.remove();
+            cards.delete(key);
+        }
+    });
 
-            const drinkHTML = `
-                <li>
-                    <div class="drink-card" id="drink-${drink.identifier}" onclick="selectDrink('${drink.identifier}', event)">
-                        <div class="drink-card-header ${drink.milk}">
-                            <span class="drink-name">${drink.drink}</span>
-                            ${drinkCustomerHTML}
-                        </div>
-                        <div class="drink-card-body">
-                            <ul>
-                                <li class="drink-card-text-info">
-                                    <p>${drink.milk.replace('Milk', '')} Milk</p>
-                                    ${drinkOptionsHTML}
-                                </li>
-                            </ul>
-                        </div>
-                    </div>
-                </li>`;
-            
-            orderBodyHTML += drinkHTML;
-        });
+    let next = orderList.firstElementChild;
+    queue.forEach((item, position) => {
+        const key = itemID(item);
+        const version = versions ? versions[position] : null;
+        let card = cards.get(key);
+        if (!card) {
+            const element = document.createElement('div');
+            element.classList.add('order-batch-card');
+            element.dataset.key = key;
+            card = {element: element, item: item, version: version, built: false, visible: false};
+            cards.set(key, card);
+            cardObserver.observe(element);
+        } else if (version === null || card.version !== version) {
+            card.item = item;
+            card.version = version;
+            card.built = false;
+            if (card.visible) {
+                buildCard(card);
+            }
+        }
+        placeCard(card, indexes ? indexes[position] : position);
 
-        orderBodyHTML += '</ul></div>';
+        if (card.element === next) {
+            next = next.nextElementSibling;
+        } else {
+            orderList.insertBefore(card.element, next);
+        }
+    });
 
-        orderCard.innerHTML = orderHeaderHTML + orderBodyHTML;
-        orderList.appendChild(orderCard);
+    // Drinks that were selected when their card was last built, but aren't any more
+    orderList.querySelectorAll('.drink-card.selected').forEach(drinkElement => {
+        if (!selectedDrinkIDs.includes(drinkElement.id.slice('drink-'.length))) {
+            drinkElement.classList.remove('selected');
+        }
     });
+
+    // The selected item keeps its selection as it moves up the queue
+    selectedItemIndex = null;
+    if (selectedKey !== null && cards.has(selectedKey)) {
+        const element = cards.get(selectedKey).element;
+        element.classList.add('selected');
+        selectedItemIndex = Number(element.dataset.index);
+    }
 };
 
+function selectedCardKey() {
+    const element = document.getElementById(`order-${selectedItemIndex}`);
+    return element ? element.dataset.key : null;
+}
+
+// Position and state of the card, which change without rebuilding it
+function placeCard(card, orderIndex) {
+    const element = card.element;
+    if (element.dataset.index !== String(orderIndex)) {
+        element.dataset.index = orderIndex;
+        element.id = `order-${orderIndex}`;
+        element.setAttribute('onclick', `selectOrder(${orderIndex}, event)`);
+    }
+    if (card.item) {
+        // Batch is still collecting drinks, see Queue hold window
+        element.classList.toggle('held', Boolean(card.item.heldUntil));
+    }
+}
+
+function clearCard(card) {
+    // Keep the height, so the list doesn't jump when the card is built again
+    card.element.style.minHeight = `${card.element.offsetHeight}px`;
+    card.element.innerHTML = '';
+    card.built = false;
+}
+
+function buildCard(card) {
+    card.element.innerHTML = cardHTML(card.item);
+    card.element.style.minHeight = '';
+    card.built = true;
+    selectedDrinkIDs.forEach(identifier => {
+        const drinkElement = card.element.querySelector(`#drink-${CSS.escape(identifier)}`);
+        if (drinkElement) {
+            drinkElement.classList.add('selected');
+        }
+    });
+}
+
+function cardHTML(order) {
+    const batched = Boolean(order.batchID);
+    let orderHeaderHTML = '';
+    if (batched) {
+        const milkType = escapeHTML(order.milk.replace('Milk', ''));
+        orderHeaderHTML = `
+            <div class="order-batch-card-header">
+                <h2>${milkType} Milk Batch</h2>
+                ${order.heldUntil ? '<h6>Collecting</h6>' : ''}
+            </div>`;
+    } else {
+        orderHeaderHTML = `
+            <div class="order-batch-card-header">
+                <h2>Order</h2>
+                <h3>${escapeHTML(order.customer)}</h3>
+                <h6>${escapeHTML(order.timeReceived)}</h6>
+            </div>`;
+    };
+
+    let orderBodyHTML = '<div class="order-batch-card-body"><ul>';
+
+    order.drinks.forEach(drink => {
+        let drinkOptionsHTML = '';
+        drink.options.forEach(option => {
+            drinkOptionsHTML += `<p>${escapeHTML(option)}</p>`;
+        });
+
+        let drinkCustomerHTML = '';
+        if (batched) {
+            // If it's a Batch, display the customer's name on the drink card
+            drinkCustomerHTML = `<span class="customer-name">${escapeHTML(drink.customer)}</span>`;
+        }
+
+        const identifier = escapeHTML(drink.identifier);
+        orderBodyHTML += `
+            <li>
+                <div class="drink-card" id="drink-${identifier}" onclick="selectDrink('${identifier}', event)">
+                    <div class="drink-card-header ${escapeHTML(drink.milk)}">
+                        <span class="drink-name">${escapeHTML(drink.drink)}</span>
+                        ${drinkCustomerHTML}
+                    </div>
+                    <div class="drink-card-body">
+                        <ul>
+                            <li class="drink-card-text-info">
+                                <p>${escapeHTML(drink.milk.replace('Milk', ''))} Milk</p>
+                                ${drinkOptionsHTML}
+                            </li>
+                        </ul>
+                    </div>
+                </div>
+            </li>`;
+    });
+
+    return orderHeaderHTML + orderBodyHTML + '</ul></div>';
+}
+
+// Shot pulls and jugs for the station's next items, in the order to make them
+function updatePlan(plan) {
+    const planElement = document.getElementById('stationPlan');
+    if (!planElement) {
+        return;
+    }
+    const shots = plan.shots.map(group => `${group.drinkIDs.length} x ${group.shots} ${group.grinder}`);
+    const jugs = plan.jugs.map(jug => `${jug.volume} ${jug.texture} ${jug.milk}`);
+    planElement.textContent = `Shots: ${shots.join(', ')} | Jugs: ${jugs.join(', ')}`;
+}
+
 let selectedItemIndex = null
 let selectedDrinkIDs = []
 
@@ -156,23 +291,28 @@ submitButton.addEventListener('click', function(event) {
         return;
     }
 
-    fetch('/complete', {
+    fetch(`${basePath}/complete`, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/x-www-form-urlencoded'
         },
         body: new URLSearchParams({
             'selectedDrinkIDs': JSON.stringify(selectedDrinkIDs),
-            'selectedItemIndex': selectedItemIndex !== null ? selectedItemIndex : ''
+            'selectedItemIndex': selectedItemIndex !== null ? selectedItemIndex : '',
+            'station': station || ''
         })
     })
     .then(response => response.json())
     .then(data => {
+        // A station view is refreshed by the WebSocket broadcast that follows every completion
+        if (station) {
+            return;
+        }
         const queue = data.updatedOrderList.map(order => JSON.parse(order));
         const totalOrders = data.updatedTotalOrders;
         const totalDrinks = data.updatedTotalDrinks;
 
-        updateOrderList(queue, totalOrders, totalDrinks);
+        updateOrderList(queue, data.updatedVersions, totalOrders, totalDrinks);
     })
     .then(
         selectedDrinkIDs = [],
@@ -1,84 +1,261 @@
-from fastapi import FastAPI, Request, Form, WebSocket, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, Form, WebSocket, HTTPException, Depends, Query
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 
 from Manager.app.scripts.queueManager import Queue
-from Manager.app.scripts.services import ConnectionManager, FormData, Utils
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.ipc import RemoteQueue
+from Manager.app.scripts.queueManager.stores import DEFAULT_STORE, Store, Stores, openQueue
+from Manager.app.scripts.queueManager.scheduler import StationScheduler
+from Manager.app.scripts.queueManager.status import orderStatus
+from Manager.app.scripts.services import FormData
+from Manager.app.scripts.services.frames import ENCODINGS, JSON, itemVersion
+from Manager.app.scripts.services.responses import CompressionMiddleware, notModified
+from Manager.app.scripts.services.admission import SOURCE_HEADER, Refusal, sourceOf
+from Manager.app.scripts import metrics
+from Manager.app.scripts.profiling import PROFILER
+from Manager.app.scripts.config import CONFIG, Config
 
-from typing import Optional
+from pydantic import ValidationError
+from typing import Dict, List, Optional, Tuple, Union
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import quote
 from Manager.app.models import Order
-import os, json, uuid, logging
+from Manager.app.models.catalog import CATALOG
+import asyncio, os, json, uuid, logging
 
 
 ################################################### PATH VARIABLES AND DATA ##################################################
 
-RELATIVE_PATH = "./config/config.json"
-CONFIG_FILE_PATH = os.path.join(os.path.dirname(__file__), RELATIVE_PATH)
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "app/static")
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "app/templates")
 DATABASE_URI = "sqlite+aiosqlite:///" + os.path.join(os.path.dirname(__file__), "app/data/", "database.db")
+# Set by Manager/serve.py in worker processes, the Queue is then owned by the process listening on it
+QUEUE_SOCKET = os.environ.get('MANAGER_QUEUE_SOCKET')
 
-with open(CONFIG_FILE_PATH, 'r') as f:
-    data = json.load(f)
-    MILK_COLORS = data.get('MILK_COLORS')
-    PORT = data.get('PORT')
-    ENDPOINT = data.get('ENDPOINT')
-    LOGGING_CONFIG = data.get('LOGGING')
-
-ADDRESS = Utils.getAddress()
+config = CONFIG.get()
+PORT = config.PORT
+ENDPOINT = config.ENDPOINT
+LOGGING_CONFIG = config.LOGGING
 
 if not ENDPOINT:
     ENDPOINT = uuid.uuid4().hex
 
+def configure(config: Config) -> None:
+    '''Applies the settings that can change without a restart, everything but PORT, ENDPOINT and LOGGING'''
+    global scheduler
+    scheduler = StationScheduler.fromConfig(config)
+    metrics.REGISTRY.enabled = config.METRICS
+    PROFILER.enabled = config.PROFILING.enabled
+    PROFILER.threshold_ms = config.PROFILING.slow_ms
+
+async def reloadConfig(config: Config) -> None:
+    configure(config)
+    if stores:
+        await stores.reconfigure(config)
+
+configure(config)
+CONFIG.subscribe(reloadConfig)
+stores: Optional[Stores] = None
+# The default store's, kept for the single-shop routes and the benchmarks
+queue: Optional[Union[Queue, RemoteQueue]] = None
+actor: Optional[Union[QueueActor, RemoteQueue]] = None
+
+def queueView(store: Store, station: Optional[str] = None) -> List[Tuple[int, object]]:
+    '''(queue index, item) pairs for the items of the store's queue assigned to station, or the whole queue'''
+    queue = store.queue
+    if station is None:
+        return list(enumerate(queue.orders))
+    return [(i, queue.orders[i]) for i in stationViews(store).get(station, [])]
+
+def stationViews(store: Store) -> Dict[str, List[int]]:
+    '''Queue indexes of the items on each station, as assigned by the queue's actor in the owner process after its last
+    change, without any the queue has lost since'''
+    count = len(store.queue.orders)
+    return {name: [i for i in indexes if i < count] for name, indexes in store.actor.views.items()}
+
+def storeBase(store: Store) -> str:
+    '''URL prefix of the store's routes, empty for the default store'''
+    return '' if store.storeID == DEFAULT_STORE else f'/stores/{store.storeID}'
+
+async def broadcastQueue(store: Store) -> None:
+    queue, connectionManager = store.queue, store.connections
+    store.statuses.update(queue.orders)
+    frames = connectionManager.frames
+    # Each item is encoded once per encoding in use, and spliced into every view's frame
+    encoded = frames.items(queue.orders, connectionManager.subscribedEncodings())
+    versions = [itemVersion(item) for item in queue.orders]
+    totals = {"totalOrders": queue.totalOrders, "totalDrinks": queue.totalDrinks}
+    messages = {
+        (None, encoding): frames.frame(encoding, items, {"versions": versions, **totals})
+        for encoding, items in encoded.items()
+    }
+
+    stations = connectionManager.subscribedStations()
+    if stations:
+        views = stationViews(store)
+        plans = scheduler.plans(queue.orders, views)
+        for station in stations:
+            indexes = views.get(station, [])
+            fields = {
+                "station": station,
+                "indexes": indexes,
+                "versions": [versions[i] for i in indexes],
+                "plan": plans[station].model_dump() if station in plans else None,
+                **totals
+            }
+            for encoding, items in encoded.items():
+                messages[(station, encoding)] = frames.frame(encoding, [items[i] for i in indexes], fields)
+    await connectionManager.broadcastViews(messages)
+
+def lookupTableSizes() -> dict:
+    sizes = {}
+    for store in list(stores.stores.values()):
+        if isinstance(store.queue, Queue):
+            for key, indexes in store.queue.lookupTable.items():
+                name = CATALOG.names[key]
+                sizes[name] = sizes.get(name, 0) + len(indexes)
+    return sizes
+
+async def startQueue(URI: str) -> None:
+    '''
+    Opens the default store, loading its queue from the database at URI and starting the actor that owns it.
+    Other stores are opened on their first request, from their own partition of URI. In a worker process
+    each store connects to the process that owns its queue instead, which stands in for both.
+    '''
+    global stores, queue, actor
+
+    async def open(store: Store) -> None:
+        if QUEUE_SOCKET:
+            store.queue = store.actor = await RemoteQueue.connect(
+                QUEUE_SOCKET, store.storeID, onChange = lambda: broadcastQueue(store)
+            )
+        else:
+            await openQueue(store, URI, onChange = lambda: broadcastQueue(store))
+        store.statuses.update(store.queue.orders)
+
+    stores = Stores(open, CONFIG.get().STORES)
+    default = await stores.get()
+    queue, actor = default.queue, default.actor
+
+    # Totals over every open store
+    metrics.LOOKUP_TABLE_SIZE.set_function(lookupTableSizes)
+    metrics.QUEUE_ITEMS.set_function(lambda: sum(len(s.queue.orders) for s in list(stores.stores.values())))
+    metrics.QUEUE_DRINKS.set_function(lambda: sum(s.queue.totalDrinks for s in list(stores.stores.values())))
+    metrics.INGEST_PENDING.set_function(lambda: sum(s.admission.pending for s in list(stores.stores.values())))
+    metrics.WEBSOCKET_CLIENTS.set_function(
+        lambda: sum(len(s.connections.active_connections) for s in list(stores.stores.values()))
+    )
+
+async def stopQueue() -> None:
+    await stores.close()
+
+async def getStore(storeID: str = DEFAULT_STORE) -> Store:
+    '''The store named in the path, the default store on the single-shop routes'''
+    try:
+        return await stores.get(storeID)
+    except KeyError:
+        raise HTTPException(status_code = 404, detail = f'Unknown store: {storeID}')
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global queue
-    queue = await Queue.create(DATABASE_URI)
-    await queue._load_from_db()
+    await startQueue(DATABASE_URI)
+    watcher = asyncio.create_task(CONFIG.watch())
     yield
-    if queue and queue.connection:
-        await queue.connection.close()
+    watcher.cancel()
+    await stopQueue()
 
 app = FastAPI(lifespan = lifespan)
-connectionManager = ConnectionManager()
+if config.COMPRESSION.enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size = config.COMPRESSION.minimum_size,
+        gzip_level = config.COMPRESSION.gzip_level,
+        brotli_quality = config.COMPRESSION.brotli_quality
+    )
+
+def refuse(refusal: Optional[Refusal]) -> None:
+    '''Raises the HTTPException of a refused order, if it was'''
+    if refusal is None:
+        return
+    metrics.ORDERS_SHED.labels(refusal.reason).inc()
+    raise HTTPException(
+        status_code = refusal.status_code,
+        detail = refusal.detail,
+        headers = {'Retry-After': str(refusal.retry_after)}
+    )
+
+@lru_cache(maxsize = None)
+def getPages():
+    '''Jinja2 environments and the card cache, built on the first page request rather than at import'''
+    from Manager.app.scripts.services.rendering import Pages
+    return Pages(TEMPLATE_DIR)
+
 app.mount("/static", StaticFiles(directory = STATIC_DIR), name = "static")
-templates = Jinja2Templates(directory = TEMPLATE_DIR)
+INDEX_RENDER = metrics.RENDER_SECONDS.labels('index.html')
+HISTORY_RENDER = metrics.RENDER_SECONDS.labels('history.html')
 
 
 ################################################## MAIN ######################################################
+# Every store route is served twice: at the root for the default store, and under /stores/{storeID}
 
 @app.get("/", response_class = HTMLResponse)
-async def index(request: Request):
-    return templates.TemplateResponse(
-        "index.html", 
-        context = {
-            "request": request, 
-            "queue": queue,
-            "colors": MILK_COLORS
-            }
-        )
+@app.get("/stores/{storeID}/", response_class = HTMLResponse)
+async def index(request: Request, station: Optional[str] = None, store: Store = Depends(getStore)):
+    queue = store.queue
+    context = {
+        "request": request,
+        "queue": queue,
+        "items": queueView(store, station),
+        "station": station,
+        "plan": scheduler.plans(queue.orders, stationViews(store)).get(station) if station else None,
+        "colors": CONFIG.get().MILK_COLORS,
+        "base": storeBase(store)
+    }
+    return StreamingResponse(getPages().stream("index.html", context, INDEX_RENDER), media_type = "text/html")
+
+@app.get("/stations")
+@app.get("/stores/{storeID}/stations")
+async def stations(store: Store = Depends(getStore)):
+    items = store.queue.orders
+    views = stationViews(store)
+    plans = scheduler.plans(items, views)
+    return JSONResponse(content = {
+        station.name: {
+            **station.model_dump(),
+            'indexes': views.get(station.name, []),
+            'estimatedSeconds': sum(scheduler.estimate(items[i], station) for i in views.get(station.name, [])),
+            'plan': plans[station.name].model_dump()
+        }
+        for station in scheduler.stations
+    })
  
 @app.post("/complete")
+@app.post("/stores/{storeID}/complete")
 async def complete(
     selectedDrinkIDs: Optional[str] = Form(default = '[]'),
     selectedItemIndex: Optional[str] = Form(default = None),
+    station: Optional[str] = Form(default = None),
+    store: Store = Depends(getStore)
 ):
+    queue, actor = store.queue, store.actor
     try:
         form_data = FormData(
             selectedDrinkIDs = json.loads(selectedDrinkIDs),
             selectedItemIndex = selectedItemIndex
         )
 
-        if form_data.selectedDrinkIDs:
-            await queue.completeDrinks(form_data.selectedDrinkIDs.root)
-
-        if form_data.selectedItemIndex is not None:
-            await queue.completeItem(form_data.selectedItemIndex)
+        if form_data.selectedDrinkIDs or form_data.selectedItemIndex is not None:
+            await actor.complete(
+                form_data.selectedDrinkIDs.root if form_data.selectedDrinkIDs else [],
+                form_data.selectedItemIndex,
+                station or None
+            )
 
         return JSONResponse(content = {
             'updatedOrderList': [order.model_dump_json() for order in queue.orders],
+            'updatedVersions': [itemVersion(order) for order in queue.orders],
             'updatedTotalOrders': queue.totalOrders,
             'updatedTotalDrinks': queue.totalDrinks
         })
@@ -91,21 +268,154 @@ async def complete(
         raise HTTPException(status_code = 400, detail = str(e))
         
 @app.get("/history", response_class = HTMLResponse)
-async def history(request: Request):
-    return templates.TemplateResponse(
-        "history.html",
-        context = {
-            "request": request,
+@app.get("/stores/{storeID}/history", response_class = HTMLResponse)
+async def history(request: Request, store: Store = Depends(getStore)):
+    queue = store.queue
+    etag = f'"history-{queue.etag}"'
+    if (response := notModified(request, etag)) is not None:
+        return response
+    if isinstance(queue, RemoteQueue):
+        completed = await queue.history()
+    else:
+        completed = {
             "history": queue.getCompletedItems(),
-            "colors": MILK_COLORS,
             "totalOrders": queue.countCompletedOrders(),
             "totalDrinks": queue.DrinksComplete
         }
+    context = {
+        "request": request,
+        "colors": CONFIG.get().MILK_COLORS,
+        "base": storeBase(store),
+        **completed
+    }
+    return StreamingResponse(
+        getPages().stream("history.html", context, HISTORY_RENDER),
+        media_type = "text/html",
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    )
+
+@app.get("/queue")
+@app.get("/stores/{storeID}/queue")
+async def getQueue(request: Request, station: Optional[str] = None, store: Store = Depends(getStore)):
+    '''
+    The queue, or a station's view of it, as the WebSocket's JSON frames hold it. Polling clients revalidate
+    with the ETag, which changes with every change to the queue.
+    '''
+    queue = store.queue
+    # A station's view is a different representation of the same queue
+    etag = f'"queue-{queue.etag}"' if station is None else f'"queue-{quote(station, safe = "")}-{queue.etag}"'
+    if (response := notModified(request, etag)) is not None:
+        return response
+    items = queueView(store, station)
+    fields = {
+        "versions": [itemVersion(item) for _, item in items],
+        "totalOrders": queue.totalOrders,
+        "totalDrinks": queue.totalDrinks
+    }
+    if station is not None:
+        fields = {"station": station, "indexes": [i for i, _ in items], **fields}
+    body = store.connections.frames.frame(JSON, [item.model_dump_json() for _, item in items], fields)
+    return Response(body, media_type = "application/json", headers = {'ETag': etag, 'Cache-Control': 'no-cache'})
+
+@app.get("/history/drinks")
+@app.get("/stores/{storeID}/history/drinks")
+async def drinkHistory(
+    milk: Optional[str] = None,
+    texture: Optional[str] = None,
+    drink: Optional[str] = None,
+    station: Optional[str] = None,
+    option: List[str] = Query(default = []),
+    store: Store = Depends(getStore)
+):
+    '''Count, wait times and milk and station breakdown of the drinks completed today, from the drink log'''
+    filters = {name: value for name, value in
+               {'milk': milk, 'texture': texture, 'drink': drink, 'station': station}.items() if value is not None}
+    if option:
+        filters['options'] = option
+    queue = store.queue
+    if isinstance(queue, RemoteQueue):
+        return JSONResponse(content = await queue.drinks(filters))
+    if queue.drinkLog is None:
+        raise HTTPException(status_code = 404, detail = 'The drink log is off, see DRINK_LOG in config.json')
+    return JSONResponse(content = queue.drinkLog.summary(**filters))
+
+@app.get("/orders/events")
+@app.get("/stores/{storeID}/orders/events")
+async def orderEvents(orderID: List[str] = Query(default = []), store: Store = Depends(getStore)):
+    '''
+    Server-Sent Events of order status changes (queued, batched, completed) for pickup screens, optionally
+    only for the orderIDs given, see Manager.app.scripts.queueManager.status
+    '''
+    return StreamingResponse(
+        store.statuses.stream(orderID),
+        media_type = "text/event-stream",
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@app.get("/orders/{orderID}")
+@app.get("/stores/{storeID}/orders/{orderID}")
+async def getOrderStatus(orderID: str, store: Store = Depends(getStore)):
+    '''Status of one order, from the pending orders' status index, or its completion once it has left the queue'''
+    status = store.statuses.get(orderID)
+    if status is None:
+        order = await store.queue.getOrder(orderID)
+        if order is None:
+            raise HTTPException(status_code = 404, detail = f'Unknown order: {orderID}')
+        status = orderStatus(order)
+    return JSONResponse(content = status)
+
+@app.get("/metrics", response_class = PlainTextResponse)
+async def metricsExport():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type = "text/plain; version=0.0.4")
+
+@app.get("/metrics/summary")
+@app.get("/stores/{storeID}/metrics/summary")
+async def metricsSummary(store: Store = Depends(getStore)):
+    queue = store.queue
+    if isinstance(queue, RemoteQueue):
+        return JSONResponse(content = await queue.summary())
+    return JSONResponse(content = queue.analytics.summary())
+
+def requireAdmin() -> None:
+    '''The /admin routes are not found unless PROFILING.admin_routes is on, they have no authentication'''
+    if not CONFIG.get().PROFILING.admin_routes:
+        raise HTTPException(status_code = 404, detail = 'Not Found')
+
+@app.get("/admin/slow", dependencies = [Depends(requireAdmin)])
+async def slowOperations():
+    return JSONResponse(content = list(PROFILER.slowOperations))
+
+@app.post("/admin/profile", dependencies = [Depends(requireAdmin)])
+async def armProfiler(calls: int = 20):
+    '''Profiles the next `calls` Queue/Connection operations with cProfile. Turns profiling on if it is off.'''
+    PROFILER.enabled = True
+    PROFILER.arm(calls)
+    return JSONResponse(content = {'pendingSamples': PROFILER.pendingSamples})
+
+@app.get("/admin/profile", response_class = PlainTextResponse, dependencies = [Depends(requireAdmin)])
+async def dumpProfile(sort: str = 'cumulative', limit: int = 40):
+    try:
+        return PlainTextResponse(PROFILER.dump(sort, limit))
+    except KeyError:
+        raise HTTPException(status_code = 400, detail = f'Unknown sort key: {sort}')
+
 @app.websocket("/newOrder")
-async def newOrder(websocket: WebSocket):
-    await connectionManager.connect(websocket)
+@app.websocket("/stores/{storeID}/newOrder")
+async def newOrder(websocket: WebSocket,
+                   station: Optional[str] = None,
+                   encoding: str = JSON,
+                   storeID: str = DEFAULT_STORE):
+    '''Queue updates, as JSON text frames or MessagePack binary frames, see Manager.app.scripts.services.frames'''
+    if encoding not in ENCODINGS:
+        await websocket.close(code = 1008, reason = f'Unknown encoding: {encoding}')
+        return
+    try:
+        store = await stores.get(storeID)
+    except KeyError:
+        await websocket.close(code = 1008, reason = f'Unknown store: {storeID}')
+        return
+    connectionManager = store.connections
+    await connectionManager.connect(websocket, station, encoding)
     try:
         while True:
             await websocket.receive_text()
@@ -115,25 +425,47 @@ async def newOrder(websocket: WebSocket):
         connectionManager.disconnect(websocket)
 
 @app.post(f"/receive")
-async def receiveData(request: Request):
-    data = await request.json()
+@app.post("/stores/{storeID}/receive")
+async def receiveData(request: Request, store: Store = Depends(getStore)):
+    '''
+    Queues an order, once it has been planned and persisted. Under overload the order is refused with a 429 or
+    503 and Retry-After instead, see Manager.app.scripts.services.admission.
+    '''
+    config = CONFIG.get()
+    admission = store.admission
+    if config.ADMISSION.enabled:
+        client = request.client.host if request.client else None
+        source = sourceOf(client, request.headers.get(SOURCE_HEADER), config.ADMISSION)
+        refuse(admission.limit(source, config.ADMISSION))
+
     try:
-        order = Order(**data)
-    except:
-        return None 
+        order = Order.model_validate(await request.json())
+    except json.JSONDecodeError:
+        metrics.ORDERS_INVALID.inc()
+        raise HTTPException(status_code = 400, detail = 'Body is not JSON')
+    except ValidationError as e:
+        metrics.ORDERS_INVALID.inc()
+        raise HTTPException(status_code = 422, detail = json.loads(e.json()))
 
-    await queue.addOrder(order, update_db=True)
-    queue_data = {
-        "orders": [order.model_dump_json() for order in queue.orders],
-        "totalOrders": queue.totalOrders,
-        "totalDrinks": queue.totalDrinks,
-    }
-    await connectionManager.broadcast(json.dumps(queue_data))
+    drinks = len(order.drinks)
+    if not config.ADMISSION.enabled:
+        await store.actor.addOrder(order)
+    else:
+        refuse(admission.admit(drinks, store.queue.totalDrinks, config.ADMISSION, config.PRIORITY.seconds_per_drink))
+        try:
+            await store.actor.addOrder(order)
+        finally:
+            admission.release(drinks)
+    metrics.ORDERS_ADMITTED.inc()
+    return JSONResponse(content = {'orderID': order.orderID})
 
 
 if __name__ == "__main__":
+    # Development server, see Manager/serve.py to run in production
     import uvicorn
+    from Manager.app.scripts.services import Utils
 
+    ADDRESS = Utils.getAddress()
     log_config = LOGGING_CONFIG
     logging.basicConfig(level=logging.INFO)
     logging.getLogger("sqlalchemy.engine").setLevel(logging.DEBUG)
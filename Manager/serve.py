@@ -0,0 +1,101 @@
+'''
+Production entry point for the Manager.
+
+    python -m Manager.serve --host 0.0.0.0 --port 8080
+
+Unlike running Manager/main.py directly this never reloads on file changes, doesn't probe the network for
+an address to bind to (pass --host), and leaves SQLAlchemy statement logging off. The app is imported
+only once the arguments have been parsed, and uvicorn runs on uvloop and httptools when they are installed,
+falling back to asyncio and h11.
+
+With --workers N above 1, a separate owner process loads the Queue and serves it on a Unix domain socket,
+and N uvicorn workers forward every command to it and fan its state out to their own WebSocket clients,
+see Manager.app.scripts.queueManager.ipc. Metrics are per worker process.
+
+    python -m Manager.serve --host 0.0.0.0 --port 8080 --workers 4
+'''
+from importlib.util import find_spec
+import argparse, asyncio, copy, multiprocessing, os, signal, tempfile, time
+
+OWNER_START_SECONDS = 30
+
+def eventLoop() -> str:
+    return 'uvloop' if find_spec('uvloop') else 'asyncio'
+
+def httpProtocol() -> str:
+    return 'httptools' if find_spec('httptools') else 'h11'
+
+def logConfig(config: dict, level: str) -> dict:
+    'config.json LOGGING with its root logger at level'
+    config = copy.deepcopy(config)
+    config.setdefault('loggers', {}).setdefault('', {})['level'] = level.upper()
+    return config
+
+def runOwner(URI: str, path: str) -> None:
+    'Owner process: serves the Queue on path until it is terminated'
+    from Manager.app.scripts.queueManager.ipc import serveQueue
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        await serveQueue(URI, path, stop)
+    asyncio.run(run())
+
+def startOwner(URI: str, path: str) -> multiprocessing.Process:
+    'Starts the owner process and waits until it is listening on path'
+    owner = multiprocessing.get_context('spawn').Process(target = runOwner, args = (URI, path), name = 'queue-owner')
+    owner.start()
+    deadline = time.monotonic() + OWNER_START_SECONDS
+    while not os.path.exists(path):
+        if not owner.is_alive():
+            raise RuntimeError(f'Queue owner exited with {owner.exitcode}')
+        if time.monotonic() > deadline:
+            owner.terminate()
+            raise TimeoutError(f'Queue owner did not listen on {path} within {OWNER_START_SECONDS}s')
+        time.sleep(0.05)
+    return owner
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = None, help = 'default config.json PORT')
+    parser.add_argument('--database', default = None, help = 'SQLAlchemy URI, default Manager/app/data/database.db')
+    parser.add_argument('--log-level', default = 'info')
+    parser.add_argument('--access-log', action = 'store_true')
+    parser.add_argument('--workers', type = int, default = 1, help = 'HTTP/WebSocket worker processes')
+    args = parser.parse_args()
+
+    import uvicorn
+    from Manager import main as manager
+
+    if args.database:
+        manager.DATABASE_URI = args.database
+    log_config = logConfig(manager.LOGGING_CONFIG, args.log_level) if manager.LOGGING_CONFIG else None
+
+    options = dict(
+        host = args.host,
+        port = args.port or manager.PORT,
+        loop = eventLoop(),
+        http = httpProtocol(),
+        log_config = log_config,
+        log_level = args.log_level,
+        access_log = args.access_log
+    )
+    if args.workers <= 1:
+        uvicorn.run(manager.app, **options)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(prefix = 'brewflow-'), 'queue.sock')
+    owner = startOwner(manager.DATABASE_URI, path)
+    # Workers are spawned by uvicorn and import Manager.main afresh, the socket reaches them through the environment
+    os.environ['MANAGER_QUEUE_SOCKET'] = path
+    try:
+        uvicorn.run('Manager.main:app', workers = args.workers, **options)
+    finally:
+        owner.terminate()
+        owner.join()
+
+if __name__ == "__main__":
+    main()
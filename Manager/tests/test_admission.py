@@ -0,0 +1,73 @@
+import pytest
+from pydantic import ValidationError
+
+from Manager.app.scripts.config import AdmissionConfig
+from Manager.app.models import Order
+from Manager.app.scripts.services.admission import Admission, BUFFER_FULL, QUEUE_FULL, RATE_LIMITED, sourceOf
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+class TestAdmission:
+    def test_sources_are_rate_limited(self, clock):
+        admission = Admission(clock)
+        config = AdmissionConfig(source_rate = 2, source_burst = 3)
+        assert [admission.limit('till', config) for _ in range(3)] == [None] * 3
+
+        refusal = admission.limit('till', config)
+        assert (refusal.status_code, refusal.reason, refusal.retry_after) == (429, RATE_LIMITED, 1)
+        # Other sources have their own bucket
+        assert admission.limit('app', config) is None
+
+        clock.now += 0.5
+        assert admission.limit('till', config) is None
+        assert admission.limit('till', config) is not None
+        assert admission.limit('till', AdmissionConfig(source_rate = None)) is None
+
+    def test_pending_orders_are_bounded(self):
+        admission = Admission()
+        config = AdmissionConfig(max_pending = 2, max_queue_drinks = None, retry_after_seconds = 2)
+        assert admission.admit(1, 0, config, 24) is None
+        assert admission.admit(3, 0, config, 24) is None
+        refusal = admission.admit(1, 0, config, 24)
+        assert (refusal.status_code, refusal.reason, refusal.retry_after) == (503, BUFFER_FULL, 2)
+
+        admission.release(1)
+        assert (admission.pending, admission.pendingDrinks) == (1, 3)
+        assert admission.admit(1, 0, config, 24) is None
+
+    def test_queue_depth(self):
+        admission = Admission()
+        config = AdmissionConfig(max_queue_drinks = 10)
+        assert admission.admit(2, 6, config, 24) is None
+        # The drinks still waiting count towards the queue
+        refusal = admission.admit(3, 6, config, 24)
+        assert (refusal.status_code, refusal.reason) == (503, QUEUE_FULL)
+        # Until the bar has made the one drink too many
+        assert refusal.retry_after == 24
+        admission.release(2)
+        assert admission.admit(3, 6, config, 24) is None
+
+    def test_only_trusted_proxies_name_sources(self):
+        config = AdmissionConfig(trusted_proxies = ['10.0.0.1'])
+        assert sourceOf('10.0.0.1', 'till-2', config) == 'till-2'
+        assert sourceOf('10.0.0.1', None, config) == '10.0.0.1'
+        assert sourceOf('192.168.1.5', 'till-2', config) == '192.168.1.5'
+        assert AdmissionConfig().enabled is False
+
+
+class TestOrderInput:
+    @pytest.mark.parametrize('body', [[], 'x', 1, None, {'drinks': ['a']}, {'drinks': 'abc'}, {'drinks': [1, {}]}])
+    def test_malformed_orders_fail_validation(self, body):
+        # /receive answers a ValidationError with a 422, anything else would be a 500
+        with pytest.raises(ValidationError):
+            Order.model_validate(body)
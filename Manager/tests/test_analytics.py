@@ -0,0 +1,98 @@
+import pytest
+from datetime import datetime, time, timedelta
+import uuid
+
+from Manager.app.scripts.analytics import QuantileSketch, Rollups
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.models import Order
+
+def make_order(customer: str, milks: list, received: time) -> Order:
+    orderID = uuid.uuid4().hex
+    drinks = [
+        {
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }
+        for milk in milks
+    ]
+    return Order.model_validate({
+        'orderID': orderID,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': received,
+        'drinks': drinks,
+        'timeComplete': None
+    })
+
+
+class TestQuantileSketch:
+    def test_empty(self):
+        sketch = QuantileSketch()
+        assert sketch.quantile(0.5) is None
+        assert sketch.mean() is None
+
+    def test_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy = 0.01)
+        for value in range(1, 1001):
+            sketch.add(value)
+
+        assert sketch.count == 1000
+        assert sketch.mean() == pytest.approx(500.5)
+        assert sketch.quantile(0.5) == pytest.approx(500, rel = 0.02)
+        assert sketch.quantile(0.95) == pytest.approx(950, rel = 0.02)
+        assert sketch.quantile(0) == pytest.approx(1, rel = 0.02)
+
+
+class TestRollups:
+    def test_wait_time_across_midnight(self):
+        assert Rollups._seconds_between(time(23, 59, 0), time(0, 1, 0)) == 120
+
+    @pytest.mark.asyncio
+    async def test_queue_updates_rollups(self):
+        queue = Queue()
+        received = datetime.now().time().replace(microsecond = 0)
+        await queue.addOrder(make_order('Hannah', ['Oat', 'Oat', 'Soy'], received), update_db = False)
+        await queue.addOrder(make_order('Adam', ['Whole'], received), update_db = False)
+
+        summary = queue.analytics.summary()
+        assert summary['ordersReceived'] == 2
+        assert summary['drinksReceived'] == 4
+        assert summary['drinksComplete'] == 0
+
+        await queue.completeItem(0)
+
+        summary = queue.analytics.summary()
+        assert summary['drinksComplete'] == 2
+        assert summary['drinksByMilk'] == {'Oat': 2}
+        assert summary['batchSizes'] == {'2': 1}
+        assert summary['waitSeconds']['p50'] is not None
+
+    @pytest.mark.asyncio
+    async def test_rollups_reset_on_a_new_day(self):
+        queue = Queue()
+        yesterday = datetime.now() - timedelta(days = 1)
+        queue.now = lambda: yesterday
+        order = make_order('Hannah', ['Oat', 'Soy'], yesterday.time())
+        order.dateReceived = yesterday.date()
+        await queue.addOrder(order, update_db = False)
+        await queue.completeDrinks([order.drinks[0].identifier], update_db = False)
+        assert queue.analytics.summary()['day'] == yesterday.date().isoformat()
+
+        # Yesterday's last drink is the first event of today
+        queue.now = datetime.now
+        await queue.completeItem(0, update_db = False)
+        summary = queue.analytics.summary()
+        assert summary['day'] == datetime.now().date().isoformat()
+        assert (summary['ordersReceived'], summary['drinksComplete']) == (0, 1)
+
+        # Events of the day before are not counted
+        queue.analytics.recordOrder(order)
+        queue.analytics.recordDrinksReceived(1, order.timeReceived, order.dateReceived)
+        assert (queue.analytics.summary()['ordersReceived'], queue.analytics.summary()['drinksReceived']) == (0, 0)
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime
+import uuid
+
+from Manager.app.models import Drink, Order
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.models.catalog import Catalog, CATALOG
+
+def make_drink(milk: str, texture: str, options: list) -> Drink:
+    return Drink.model_validate({
+        'orderID': None,
+        'drink': 'Latte',
+        'milk': milk,
+        'milk_volume': 1,
+        'shots': 2,
+        'temperature': None,
+        'texture': texture,
+        'options': options,
+        'customer': None,
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None
+    })
+
+
+class TestCatalog:
+    def test_codes_are_stable(self):
+        catalog = Catalog()
+        keys = catalog.load(['Oat', 'Soy'], ['Wet', 'Dry'], ['Decaf', 'Honey'])
+
+        assert keys == [0, 1, 2, 3]
+        assert catalog.names[catalog.key('Soy', 'Dry')] == 'Soy_Dry'
+        [whole] = catalog.load(['Whole', 'Oat'], ['Wet'], ['Honey'])[:1]
+        assert catalog.load(['Whole', 'Oat'], ['Wet'], ['Honey']) == [whole, 0]
+        assert catalog.key('Whole', 'Wet') == whole
+        assert catalog.optionBits(['Honey', 'Decaf']) == 0b11
+
+    def test_only_configured_values_are_interned(self):
+        catalog = Catalog()
+        catalog.load(['Oat'], ['Wet'], ['Decaf'])
+        size = (len(catalog.keys), len(catalog.bits))
+
+        other = [catalog.key(f'Milk {i}', 'Wet') for i in range(100)] + [catalog.key('Oat', 'Foam')]
+        assert set(other) == {catalog.otherKey}
+        assert catalog.optionBits([f'Option {i}' for i in range(100)]) == catalog.bit('Anything')
+        assert catalog.optionBits(['Decaf', 'Anything']) == catalog.bit('Decaf') | catalog.bit('Anything')
+        assert (len(catalog.keys), len(catalog.bits)) == size
+
+    def test_drinks_are_stamped(self):
+        oat = make_drink('Oat', 'Wet', ['Decaf'])
+        other_oat = make_drink('Oat', 'Wet', [])
+        soy = make_drink('Soy', 'Wet', ['Decaf', 'Honey'])
+
+        assert oat.batchKey == other_oat.batchKey == CATALOG.key('Oat', 'Wet')
+        assert soy.batchKey != oat.batchKey
+        assert oat.optionBits == CATALOG.bit('Decaf')
+        assert soy.optionBits == CATALOG.bit('Decaf') | CATALOG.bit('Honey')
+
+        dumped = oat.model_dump()
+        assert 'batchKey' not in dumped and 'optionBits' not in dumped
+        assert Drink.model_validate_json(oat.model_dump_json()).batchKey == oat.batchKey
+
+    @pytest.mark.asyncio
+    async def test_unknown_milks_are_queued_unbatched(self):
+        queue = Queue()
+        drinks = [make_drink(milk, 'Wet', ['Sprinkles']).model_dump() for milk in ['Hemp', 'Almond', 'Hemp', 'Oat']]
+        order = Order.model_validate({
+            'orderID': uuid.uuid4().hex,
+            'customer': 'Adam',
+            'dateReceived': datetime.now().date(),
+            'timeReceived': datetime.now().time(),
+            'timeComplete': None,
+            'drinks': drinks
+        })
+        await queue.addOrder(order, update_db = False)
+        await queue.addOrder(Order.model_validate({**order.model_dump(), 'orderID': uuid.uuid4().hex}), update_db = False)
+
+        assert queue.totalDrinks == 8
+        assert not any(isinstance(item, Batch) and item.batchKey == CATALOG.otherKey for item in queue.orders)
+        assert CATALOG.otherKey not in queue.lookupTable
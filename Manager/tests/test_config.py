@@ -0,0 +1,116 @@
+import pytest
+import json
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.config import Config, ConfigLoader
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.models import Order
+from Manager.app.models.catalog import CATALOG
+
+def make_order(customer: str, milk: str) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }]
+    })
+
+def lookup_names(queue: Queue) -> dict:
+    return {CATALOG.names[key]: indexes for key, indexes in queue.lookupTable.items()}
+
+def write_config(path, **data) -> None:
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+class TestConfigLoader:
+    def test_get_is_cached(self, tmp_path):
+        path = tmp_path / 'config.json'
+        write_config(path, milks = ['Oat'], textures = ['Wet'], SEARCH_DEPTH = 3)
+        loader = ConfigLoader(str(path))
+
+        config = loader.get()
+        path.unlink()
+        assert loader.get() is config
+        assert config.SEARCH_DEPTH == 3
+        assert config.BATCH_VOLUME == 5
+
+    @pytest.mark.asyncio
+    async def test_reload_notifies_subscribers(self, tmp_path):
+        path = tmp_path / 'config.json'
+        write_config(path, milks = ['Oat'], textures = ['Wet'])
+        loader = ConfigLoader(str(path))
+        loader.get()
+        received = []
+        loader.subscribe(received.append)
+
+        write_config(path, milks = ['Oat', 'Soy'], textures = ['Wet'])
+        config = await loader.reload()
+
+        assert received == [config]
+        assert loader.get().milks == ['Oat', 'Soy']
+
+    @pytest.mark.asyncio
+    async def test_invalid_file_keeps_last_config(self, tmp_path):
+        path = tmp_path / 'config.json'
+        write_config(path, SEARCH_DEPTH = 2)
+        loader = ConfigLoader(str(path))
+        loader.get()
+
+        path.write_text('{"SEARCH_DEPTH": ')
+        assert await loader.reload() is None
+        write_config(path, SEARCH_DEPTH = 'deep')
+        assert await loader.reload() is None
+        assert loader.get().SEARCH_DEPTH == 2
+
+
+class TestQueueConfig:
+    def test_queue_uses_given_config(self):
+        queue = Queue(Config(milks = ['Oat'], textures = ['Wet', 'Dry'], SEARCH_DEPTH = 4, BATCH_VOLUME = 3))
+
+        assert set(lookup_names(queue)) == {'Oat_Wet', 'Oat_Dry'}
+        assert queue.searchDepth == 4
+        assert queue.batchVolume == 3
+
+    @pytest.mark.asyncio
+    async def test_apply_config_keeps_queued_indexes(self):
+        queue = Queue(Config(milks = ['Oat', 'Soy'], textures = ['Wet']))
+        await queue.addOrder(make_order('Adam', 'Oat'), update_db = False)
+        await queue.addOrder(make_order('Ben', 'Soy'), update_db = False)
+
+        queue.applyConfig(Config(milks = ['Whole'], textures = ['Wet'], BATCH_VOLUME = 4))
+
+        assert lookup_names(queue) == {'Whole_Wet': set(), 'Oat_Wet': {0}, 'Soy_Wet': {1}}
+        assert queue.batchVolume == 4
+
+        await queue.completeDrinks([queue.orders[0].drinks[0].identifier], update_db = False)
+        queue.applyConfig(Config(milks = ['Whole'], textures = ['Wet']))
+        assert lookup_names(queue) == {'Whole_Wet': set(), 'Soy_Wet': {0}}
+
+    @pytest.mark.asyncio
+    async def test_actor_reconfigures_between_commands(self):
+        queue = Queue(Config(milks = ['Oat'], textures = ['Wet'], SEARCH_DEPTH = 1))
+        actor = QueueActor(queue)
+        actor.start()
+        try:
+            await actor.reconfigure(Config(milks = ['Oat', 'Soy'], textures = ['Wet'], SEARCH_DEPTH = 2))
+            await actor.addOrder(make_order('Adam', 'Soy'))
+
+            assert queue.searchDepth == 2
+            assert queue.lookupTable[CATALOG.key('Soy', 'Wet')] == {0}
+        finally:
+            await actor.stop()
@@ -0,0 +1,145 @@
+import pytest
+from datetime import date, datetime, timedelta
+import os
+import uuid
+
+from Manager.app.scripts.analytics.drinklog import DrinkLog, MAX_CODES, MAX_OPTIONS, OTHER
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.models import Drink, Order
+
+OPENING = datetime(2024, 5, 1, 8, 0)
+
+def make_drink(milk: str, texture: str = 'Wet', options: list = [], drink: str = 'Latte') -> Drink:
+    return Drink.model_validate({
+        'orderID': 'order',
+        'drink': drink,
+        'milk': milk,
+        'milk_volume': 1,
+        'shots': 2,
+        'temperature': None,
+        'texture': texture,
+        'options': options,
+        'customer': 'Adam',
+        'timeReceived': None,
+        'timeComplete': None
+    })
+
+@pytest.fixture
+def log(tmp_path):
+    log = DrinkLog(str(tmp_path / 'history'), OPENING.date())
+    rows = [
+        (make_drink('Oat'), 60, 'Bar'),
+        (make_drink('Oat', options = ['Decaf']), 120, 'Bar'),
+        (make_drink('Soy'), 30, None),
+        (make_drink('Oat', 'Dry'), 90, 'Window'),
+        (make_drink(None, None, drink = 'Espresso'), 10, 'Bar'),
+    ]
+    for minute, (drink, wait, station) in enumerate(rows):
+        completed = OPENING + timedelta(minutes = minute)
+        log.append(completed - timedelta(seconds = wait), completed, drink, station)
+    log.flush()
+    yield log
+    log.close()
+
+
+class TestDrinkLog:
+    def test_counts_and_filters(self, log):
+        assert log.count() == 5
+        assert log.count(milk = 'Oat') == 3
+        assert log.count(milk = 'Oat', texture = 'Wet') == 2
+        assert log.count(milk = 'Oat', station = 'Bar') == 2
+        assert log.count(options = ['Decaf']) == 1
+        assert log.count(milk = 'Almond') == 0
+        assert log.count(drink = 'Espresso', milk = None) == 1
+
+    def test_time_range(self, log):
+        assert log.count(since = OPENING + timedelta(minutes = 1)) == 4
+        assert log.count(since = OPENING + timedelta(minutes = 1), until = OPENING + timedelta(minutes = 3)) == 2
+        assert log.count(until = OPENING) == 0
+
+    def test_summary(self, log):
+        summary = log.summary(milk = 'Oat')
+        assert summary['drinks'] == 3
+        assert summary['waitSeconds']['mean'] == 90
+        assert summary['waitSeconds']['p50'] == 90
+        assert summary['drinksByMilk'] == {'Oat': 3}
+        assert summary['drinksByStation'] == {'Bar': 2, 'Window': 1}
+        assert log.summary()['drinksByMilk'] == {'Oat': 3, 'Soy': 1, None: 1}
+
+    def test_reopens_and_drops_torn_rows(self, log):
+        with open(os.path.join(log.dayDirectory, 'wait.col'), 'ab') as f:
+            f.write(b'\x00' * 8)
+        log.close()
+
+        reopened = DrinkLog(log.directory, OPENING.date())
+        try:
+            assert reopened.rows == 5
+            assert reopened.count(milk = 'Oat', station = 'Bar') == 2
+            assert sum(reopened.column('wait')) == 310
+        finally:
+            reopened.close()
+
+    def test_values_past_the_limit_are_other(self, log):
+        completed = OPENING + timedelta(hours = 1)
+        for i in range(MAX_CODES + 10):
+            log.append(completed, completed, make_drink('Oat', drink = f'Drink {i}', options = [f'Option {i}']), 'Bar')
+        assert len(log.codes['drink']) == MAX_CODES
+        assert len(log.codes['options']) == MAX_OPTIONS
+        assert log.codes['drink'][-1] == OTHER
+        assert log.count(drink = OTHER) == MAX_CODES + 10 - (MAX_CODES - 1 - 3)
+        assert log.count(options = [OTHER]) == MAX_CODES + 10 - (MAX_OPTIONS - 1 - 1)
+
+    def test_options_in_any_byte(self, log):
+        completed = OPENING + timedelta(hours = 1)
+        drinks = [[f'Option {j}' for j in range(20) if j % (i + 1) == 0] for i in range(12)]
+        for options in drinks:
+            log.append(completed, completed, make_drink('Oat', options = options), 'Bar')
+
+        for wanted in (['Option 0'], ['Option 9', 'Option 18'], ['Decaf', 'Option 0'], ['Option 4', 'Option 8', 'Option 12']):
+            expected = sum(1 for options in drinks if set(wanted) <= set(options))
+            assert log.count(options = wanted) == expected
+            assert log.count(since = completed, options = wanted) == expected
+        assert log.count(options = []) == log.rows
+
+    def test_codes_are_written_with_the_rows(self, log):
+        codes_path = os.path.join(log.dayDirectory, 'codes.json')
+        log.append(OPENING, OPENING, make_drink('Oat', drink = 'Mocha'), 'Bar')
+        with open(codes_path) as f:
+            assert 'Mocha' not in f.read()
+        log.flush()
+        with open(codes_path) as f:
+            assert 'Mocha' in f.read()
+        assert os.listdir(log.dayDirectory).count('codes.json.tmp') == 0
+
+    def test_new_day(self, log):
+        tomorrow = OPENING + timedelta(days = 1)
+        log.append(tomorrow - timedelta(seconds = 40), tomorrow, make_drink('Soy'), 'Bar')
+        assert log.day == tomorrow.date()
+        assert log.count() == 1
+        assert os.path.isdir(os.path.join(log.directory, OPENING.date().isoformat()))
+
+    @pytest.mark.asyncio
+    async def test_queue_logs_completions(self, tmp_path):
+        queue = Queue()
+        queue.drinkLog = DrinkLog(str(tmp_path / 'history'), date.today())
+        make_order = lambda: Order.model_validate({
+            'orderID': uuid.uuid4().hex,
+            'customer': 'Adam',
+            'dateReceived': datetime.now().date(),
+            'timeReceived': datetime.now().time(),
+            'timeComplete': None,
+            'drinks': [{**make_drink(milk).model_dump(), 'orderID': None} for milk in ['Oat', 'Soy']]
+        })
+        await queue.addOrder(make_order(), update_db = False)
+        await queue.completeItem(0, station = 'Bar')
+        try:
+            assert queue.drinkLog.count(station = 'Bar') == len(queue.getCompletedItems()[0].drinks)
+
+            # Completions the caller commits itself are logged once it says they are committed
+            await queue.addOrder(make_order(), update_db = False)
+            await queue.completeItem(0, update_db = False, station = 'Window')
+            assert queue.drinkLog.count(station = 'Window') == 0
+            queue.logCompletions()
+            assert queue.drinkLog.count(station = 'Window') > 0
+        finally:
+            queue.drinkLog.close()
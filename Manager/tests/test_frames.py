@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime
+import json, msgpack, uuid
+
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.scripts.services.frames import FrameEncoder, JSON, MSGPACK, itemID, itemVersion
+from Manager.app.models import Order
+
+def make_order(customer: str, milks: list, options: list = []) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': options,
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+@pytest.fixture
+def queue():
+    return Queue()
+
+
+class TestFrames:
+    @pytest.mark.asyncio
+    async def test_json_is_encoded_once(self, queue):
+        await queue.addOrders([make_order('Adam', ['Oat', 'Oat']), make_order('Ben', ['Soy'])], update_db = False)
+        frames = FrameEncoder()
+        items = frames.items(queue.orders, {JSON})[JSON]
+
+        frame = json.loads(frames.frame(JSON, items, {'totalOrders': 2, 'totalDrinks': 3}))
+        assert frame['orders'] == [item.model_dump(mode = 'json') for item in queue.orders]
+        assert frame['totalDrinks'] == 3
+        assert json.loads(frames.frame(JSON, [], {})) == {'orders': []}
+
+    @pytest.mark.asyncio
+    async def test_msgpack_codes(self, queue):
+        await queue.addOrders([make_order('Adam', ['Oat', 'Oat'], ['Decaf']), make_order('Ben', ['Soy'])], update_db = False)
+        frames = FrameEncoder()
+        items = frames.items(queue.orders, {MSGPACK})[MSGPACK]
+        frame = msgpack.unpackb(frames.frame(MSGPACK, items, {'totalDrinks': 3}))
+        codes = msgpack.unpackb(frames.codesFrame({}))['codes']
+
+        batch, order = frame['orders']
+        assert isinstance(queue.orders[0], Batch)
+        assert (batch[0], codes['milk'][batch[1]], batch[3], batch[6]) == (1, 'Oat', 2.0, queue.orders[0].batchID)
+        drink = batch[5][0]
+        assert (drink[2], codes['drink'][drink[3]], [codes['options'][o] for o in drink[9]]) == ('Adam', 'Latte', ['Decaf'])
+        assert (order[0], order[2], codes['milk'][order[4][0][4]]) == (0, 'Ben', 'Soy')
+
+        # A client that has every code gets none, one that is behind only gets what it hasn't seen
+        sizes = frames.codes.sizes()
+        assert frames.codesFrame(sizes) is None
+        await queue.addOrder(make_order('Cat', ['Whole']), update_db = False)
+        frames.items(queue.orders, {MSGPACK})
+        assert msgpack.unpackb(frames.codesFrame(sizes)) == {'codes': {'milk': ['Whole']}}
+
+    @pytest.mark.asyncio
+    async def test_item_versions(self, queue):
+        queue.holdSeconds = 60
+        await queue.addOrders([make_order('Adam', ['Oat', 'Oat', 'Soy']), make_order('Ben', ['Whole'])], update_db = False)
+        batch, order = queue.orders[0], queue.orders[-1]
+        assert (itemID(batch), itemID(order)) == (batch.batchID, order.orderID)
+        ids = [itemID(item) for item in queue.orders]
+        versions = [itemVersion(item) for item in queue.orders]
+        assert len(set(ids)) == len(ids)
+
+        # Only the item that lost a drink changes version, the others keep their IDs and versions
+        await queue.completeDrinks([batch.drinks[0].identifier], update_db = False)
+        assert [itemID(item) for item in queue.orders] == ids
+        changed = [i for i, item in enumerate(queue.orders) if itemVersion(item) != versions[i]]
+        assert changed == [0]
+
+        # As does a batch whose hold window closes
+        held = [i for i, item in enumerate(queue.orders) if isinstance(item, Batch) and item.heldUntil is not None]
+        assert held
+        before = [itemVersion(queue.orders[i]) for i in held]
+        for i in held:
+            queue.orders[i].heldUntil = None
+        assert all(itemVersion(queue.orders[i]) != version for i, version in zip(held, before))
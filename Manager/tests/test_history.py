@@ -0,0 +1,102 @@
+import pytest
+from datetime import datetime, timedelta
+import uuid
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.history import OrderHistory
+from Manager.app.scripts.config import CONFIG, HistoryConfig
+from Manager.app.models import Order
+
+OPENING = datetime(2024, 5, 1, 8, 0)
+
+def make_order(received: datetime, milks: list = ['Oat']) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': 'Adam',
+        'dateReceived': received.date(),
+        'timeReceived': received.time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': 'Adam',
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+def bounded(max_orders: int, max_age_seconds = None):
+    return CONFIG.get().model_copy(update = {'HISTORY': HistoryConfig(max_orders = max_orders, max_age_seconds = max_age_seconds)})
+
+
+class TestOrderHistory:
+    def test_evicts_oldest_completed_orders(self):
+        history = OrderHistory(maxOrders = 2)
+        orders = [history.add(make_order(OPENING + timedelta(minutes = i))) for i in range(4)]
+        for order in orders[1:]:
+            order.timeComplete = order.timeReceived
+
+        # The oldest order is still pending, it stays however far over the bound
+        assert history.trim(OPENING) == 2
+        assert [o.orderID for o in history] == [orders[3].orderID, orders[0].orderID]
+        assert orders[1].orderID not in history
+        assert history.evicted == 2
+
+    def test_evicts_by_age(self):
+        history = OrderHistory(maxOrders = 10, maxAgeSeconds = 3600)
+        orders = [history.add(make_order(OPENING + timedelta(minutes = 40 * i))) for i in range(3)]
+        for order in orders:
+            order.timeComplete = order.timeReceived
+
+        assert history.trim(OPENING + timedelta(minutes = 90)) == 1
+        assert [o.orderID for o in history] == [orders[2].orderID, orders[1].orderID]
+
+
+class TestQueueHistory:
+    @pytest.mark.asyncio
+    async def test_evicted_orders_are_read_from_the_database(self):
+        queue = await Queue.create('sqlite+aiosqlite:///:memory:', bounded(3))
+        try:
+            orders = []
+            for i in range(10):
+                order = make_order(datetime.now(), ['Oat', 'Soy'])
+                orders.append(order.orderID)
+                await queue.addOrder(order, update_db = True)
+                while queue.orders:
+                    await queue.completeItem(0)
+
+            assert len(queue.orderHistory) == 3
+            assert queue.countCompletedOrders() == 10
+            assert [o.orderID for o in queue.getCompletedItems()] == orders[:-4:-1]
+
+            oldest = await queue.getOrder(orders[0])
+            assert orders[0] not in queue.orderHistory
+            assert oldest.timeComplete is not None
+            assert sorted(d.milk for d in oldest.drinks) == ['Oat', 'Soy']
+            assert await queue.getOrder(uuid.uuid4().hex) is None
+        finally:
+            await queue.connection.close()
+
+    @pytest.mark.asyncio
+    async def test_week_of_orders_stays_bounded(self):
+        queue = Queue(bounded(500, 86400))
+        clock = OPENING
+        queue.now = lambda: clock
+        largest = 0
+        # A week of orders every two minutes, the front item completed after each one
+        for _ in range(7 * 24 * 30):
+            clock += timedelta(minutes = 2)
+            await queue.addOrder(make_order(clock, ['Oat', 'Soy']), update_db = False)
+            while len(queue.orders) > 3:
+                await queue.completeItem(0, update_db = False)
+            largest = max(largest, len(queue.orderHistory))
+
+        assert largest <= 500 + len(queue.orders)
+        assert queue.orderHistory.evicted > 4000
+        assert queue.countCompletedOrders() == queue.orderHistory.evicted + sum(
+            1 for order in queue.orderHistory if order.timeComplete
+        )
@@ -0,0 +1,262 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+import copy, os, subprocess, sys
+import uuid
+
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.journal import Journal, readRecords
+from Manager.app.scripts.services.CRUD import Connection
+from Manager.app.scripts.config import CONFIG
+from Manager.app.models import Order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Adds two orders through a journaled actor, the process dies in the second one's commit, after the journal sync
+KILLED_BEFORE_COMMIT = '''
+import asyncio, os, sys
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.journal import Journal
+from Manager.app.models import Order
+
+async def main(URI, directory, first, second):
+    queue = await Queue.create(URI)
+    journal = Journal(directory)
+    await journal.snapshot(queue)
+    actor = QueueActor(queue, journal = journal)
+    actor.start()
+    await actor.addOrder(Order.model_validate_json(first))
+
+    async def killed(**kwargs):
+        os._exit(9)
+    queue.connection.saveChanges = killed
+    await actor.addOrder(Order.model_validate_json(second))
+
+asyncio.run(main(*sys.argv[1:]))
+'''
+
+def make_order(customer: str, milks: list) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+def state(queue: Queue) -> dict:
+    return {
+        'items': [(type(item), [d.identifier for d in item.drinks]) for item in queue.orders],
+        'history': [(o.orderID, o.timeComplete, [d.timeComplete for d in o.drinks]) for o in queue.orderHistory],
+        'lookupTable': {k: v for k, v in queue.lookupTable.items() if v},
+        'totals': (queue.totalOrders, queue.totalDrinks, queue.OrdersComplete, queue.DrinksComplete),
+        'summary': queue.analytics.summary()
+    }
+
+async def run_orders(journal: Journal) -> Queue:
+    queue = Queue()
+    actor = QueueActor(queue, journal = journal)
+    actor.start()
+    try:
+        for i, milks in enumerate([['Oat', 'Oat'], ['Soy'], ['Oat', 'Whole'], ['Soy', 'Soy']]):
+            await actor.addOrder(make_order(f'Customer {i}', milks))
+        await actor.complete(item_index = 0, station = 'Bar')
+        await actor.complete([queue.orders[-1].drinks[0].identifier])
+    finally:
+        await actor.stop()
+    return queue
+
+
+class TestJournal:
+    @pytest.mark.asyncio
+    async def test_events_are_written_before_acknowledgement(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        queue = Queue()
+        actor = QueueActor(queue, journal = journal)
+        actor.start()
+        try:
+            order = make_order('Adam', ['Oat', 'Soy'])
+            await actor.addOrder(order)
+            [(seq, _, event)] = list(readRecords(journal.logPath))
+            assert (seq, event['kind'], event['orders'][0]['orderID']) == (1, 'add', order.orderID)
+
+            drinks = [d.identifier for d in queue.orderHistory.get(order.orderID).drinks]
+            await asyncio.gather(actor.complete([drinks[0]]), actor.complete([drinks[1]], station = 'Bar'))
+            events = [event for _, _, event in readRecords(journal.logPath)][1:]
+            assert [(e['kind'], e['drinks'], e['station']) for e in events] == [
+                ('complete', [drinks[0]], None), ('complete', [drinks[1]], 'Bar')
+            ]
+        finally:
+            await actor.stop()
+            journal.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_commit_is_rolled_back(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        queue = await Queue.create('sqlite+aiosqlite:///:memory:')
+        await journal.snapshot(queue)
+        actor = QueueActor(queue, journal = journal)
+        actor.start()
+        try:
+            await actor.addOrder(make_order('Adam', ['Oat']))
+            # The lookupTable's sets are changed in place
+            before = copy.deepcopy(state(queue))
+            save_changes = queue.connection.saveChanges
+
+            async def failing_save_changes(**kwargs):
+                raise ConnectionError('database is gone')
+            queue.connection.saveChanges = failing_save_changes
+            results = await asyncio.gather(
+                actor.addOrder(make_order('Ben', ['Oat'])), actor.complete(item_index = 0), return_exceptions = True
+            )
+            assert all(isinstance(result, ConnectionError) for result in results)
+            assert state(queue) == before
+            assert [event['kind'] for _, _, event in readRecords(journal.logPath)] == ['add']
+
+            queue.connection.saveChanges = save_changes
+            await actor.addOrder(make_order('Cat', ['Soy']))
+            assert [seq for seq, _, _ in readRecords(journal.logPath)] == [1, 2]
+        finally:
+            await actor.stop()
+            journal.close()
+            await queue.connection.close()
+
+    @pytest.mark.asyncio
+    async def test_crash_before_commit_is_recovered(self, tmp_path):
+        URI = f"sqlite+aiosqlite:///{tmp_path / 'database.db'}"
+        directory = str(tmp_path / 'database.journal')
+        first, second = make_order('Adam', ['Oat']), make_order('Ben', ['Soy'])
+        killed = subprocess.run(
+            [sys.executable, '-c', KILLED_BEFORE_COMMIT, URI, directory, first.model_dump_json(), second.model_dump_json()],
+            cwd = ROOT
+        )
+        assert killed.returncode == 9
+
+        connection = await Connection.new(URI)
+        try:
+            assert await connection.getOrder(first.orderID) is not None
+            assert await connection.getOrder(second.orderID) is None
+
+            # The second order was synced to the journal, recovery replays it and commits it
+            for _ in range(2):
+                queue = await Queue.create(URI)
+                journal = Journal(directory)
+                try:
+                    assert await journal.recover(queue) == 2
+                    assert {order.orderID for order in queue.orderHistory} == {first.orderID, second.orderID}
+                finally:
+                    journal.close()
+                    await queue.connection.close()
+            assert await connection.getOrder(second.orderID) is not None
+        finally:
+            await connection.close()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_and_tail(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'), snapshotEvery = 4)
+        await journal.snapshot(Queue())
+        queue = await run_orders(journal)
+        journal.close()
+
+        # One snapshot after the fourth event, the last two are in the log
+        assert [seq for seq, _, _ in readRecords(journal.logPath)] == [5, 6]
+
+        recovered = Queue()
+        assert await Journal(journal.directory).recover(recovered) == 2
+        assert any(isinstance(item, Batch) for item in recovered.orders)
+        assert state(recovered) == state(queue)
+
+    @pytest.mark.asyncio
+    async def test_replays_the_whole_log(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        await journal.snapshot(Queue())
+        queue = await run_orders(journal)
+        journal.close()
+
+        recovered = Queue()
+        assert await Journal(journal.directory).recover(recovered) == 6
+        assert state(recovered) == state(queue)
+
+    @pytest.mark.asyncio
+    async def test_torn_record_is_dropped(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        await journal.snapshot(Queue())
+        queue = await run_orders(journal)
+        journal.close()
+        size = os.path.getsize(journal.logPath)
+        with open(journal.logPath, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00half a record')
+
+        reopened = Journal(journal.directory)
+        recovered = Queue()
+        assert await reopened.recover(recovered) == 6
+        assert os.path.getsize(journal.logPath) == size
+        assert state(recovered) == state(queue)
+
+        # Appends continue the sequence after the dropped record
+        assert reopened.append({'kind': 'complete', 'at': datetime.now().isoformat(), 'drinks': [], 'station': None}) == 7
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_config_reload_takes_a_snapshot(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        queue = Queue()
+        actor = QueueActor(queue, journal = journal)
+        actor.start()
+        try:
+            await actor.addOrder(make_order('Adam', ['Oat']))
+            assert not journal.exists()
+            await actor.reconfigure(CONFIG.get().model_copy(update = {'BATCH_VOLUME': 3}))
+            assert journal.exists()
+            assert list(readRecords(journal.logPath)) == []
+        finally:
+            await actor.stop()
+            journal.close()
+
+    @pytest.mark.asyncio
+    async def test_snapshot_from_another_day_is_not_recovered(self, tmp_path):
+        journal = Journal(str(tmp_path / 'journal'))
+        queue = Queue()
+        await queue.addOrder(make_order('Adam', ['Oat']), update_db = False)
+        with queue.clockAt(datetime.now() - timedelta(days = 1)):
+            await journal.snapshot(queue)
+        journal.close()
+
+        recovered = Queue()
+        assert await Journal(journal.directory).recover(recovered) is None
+        assert recovered.orders == []
+
+
+class TestLoadFromDB:
+    @pytest.mark.asyncio
+    async def test_pending_orders_are_in_history_once(self):
+        queue = await Queue.create('sqlite+aiosqlite:///:memory:')
+        try:
+            order = make_order('Adam', ['Oat', 'Soy', 'Oat'])
+            drinks = [d.identifier for d in order.drinks]
+            await queue.addOrder(order, update_db = True)
+            await queue.completeDrinks([drinks[1]])
+
+            loaded = Queue()
+            loaded.connection = queue.connection
+            await loaded._load_from_db()
+            assert [o.orderID for o in loaded.orderHistory] == [order.orderID]
+            assert len(loaded.orderHistory.get(order.orderID).drinks) == 3
+            assert (loaded.totalDrinks, loaded.DrinksComplete) == (2, 1)
+            assert loaded.getCompletedItems()[0].drinks[0].identifier == drinks[1]
+            assert loaded.analytics.summary()['drinksReceived'] == queue.analytics.summary()['drinksReceived'] == 3
+        finally:
+            await queue.connection.close()
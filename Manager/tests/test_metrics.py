@@ -0,0 +1,58 @@
+import pytest
+
+from Manager.app.scripts.metrics import Registry, Counter, Gauge, Histogram
+
+@pytest.fixture
+def registry() -> Registry:
+    return Registry()
+
+
+class TestMetrics:
+    def test_counter(self, registry):
+        counter = Counter('test_total', 'A counter', registry = registry)
+        counter.inc()
+        counter.inc(2)
+        assert 'test_total 3' in registry.render()
+
+    def test_labelled_counter(self, registry):
+        counter = Counter('shed_total', 'A counter', labelname = 'reason', registry = registry)
+        counter.labels('queue_full').inc()
+        counter.labels('rate_limited').inc(2)
+        output = registry.render()
+        assert 'shed_total{reason="queue_full"} 1' in output
+        assert 'shed_total{reason="rate_limited"} 2' in output
+
+    def test_histogram_buckets(self, registry):
+        histogram = Histogram('test_seconds', 'A histogram', buckets = (0.1, 1.0), registry = registry)
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        output = registry.render()
+
+        assert '# TYPE test_seconds histogram' in output
+        assert 'test_seconds_bucket{le="0.1"} 1' in output
+        assert 'test_seconds_bucket{le="1.0"} 2' in output
+        assert 'test_seconds_bucket{le="+Inf"} 3' in output
+        assert 'test_seconds_count 3' in output
+
+    def test_labelled_histogram_timer(self, registry):
+        histogram = Histogram('db_seconds', 'A histogram', labelname = 'operation', registry = registry)
+        with histogram.labels('addOrder').time():
+            pass
+        assert 'db_seconds_count{operation="addOrder"} 1' in registry.render()
+
+    def test_gauge_callback(self, registry):
+        gauge = Gauge('table_size', 'A gauge', labelname = 'key', registry = registry)
+        gauge.set_function(lambda: {'Oat_Wet': 2})
+        assert 'table_size{key="Oat_Wet"} 2' in registry.render()
+
+    def test_disabled_registry_records_nothing(self, registry):
+        registry.enabled = False
+        counter = Counter('test_total', 'A counter', registry = registry)
+        histogram = Histogram('test_seconds', 'A histogram', registry = registry)
+        counter.inc()
+        with histogram.time():
+            pass
+
+        assert counter.value == 0
+        assert 'test_seconds_count 0' in registry.render()
@@ -0,0 +1,74 @@
+import pytest
+import asyncio
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.status import OrderStatuses, orderStatus, BATCHED, COMPLETED, QUEUED
+from Manager.app.models import Order
+
+def make_order(customer: str, milks: list) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+async def next_event(stream) -> str:
+    return await asyncio.wait_for(stream.__anext__(), timeout = 2)
+
+
+class TestOrderStatuses:
+    @pytest.mark.asyncio
+    async def test_changes(self):
+        queue, statuses = Queue(), OrderStatuses()
+        adam, ben = make_order('Adam', ['Oat', 'Oat']), make_order('Ben', ['Soy'])
+        await queue.addOrders([adam, ben], update_db = False)
+
+        changes = statuses.update(queue.orders)
+        assert sorted((c['customer'], c['status']) for c in changes) == [('Adam', BATCHED), ('Ben', QUEUED)]
+        assert statuses.update(queue.orders) == []
+        assert statuses.get(ben.orderID)['status'] == QUEUED
+
+        await queue.completeItem(len(queue.orders) - 1)
+        assert statuses.update(queue.orders) == [{'orderID': ben.orderID, 'customer': 'Ben', 'status': COMPLETED}]
+        assert statuses.get(ben.orderID) is None
+        assert orderStatus(await queue.getOrder(ben.orderID))['status'] == COMPLETED
+
+    @pytest.mark.asyncio
+    async def test_stream(self):
+        queue, statuses = Queue(), OrderStatuses()
+        adam, ben = make_order('Adam', ['Oat']), make_order('Ben', ['Soy'])
+        await queue.addOrder(adam, update_db = False)
+        statuses.update(queue.orders)
+
+        everything = statuses.stream()
+        only_ben = statuses.stream([ben.orderID], keepalive = 0.05)
+        try:
+            assert f'"orderID": "{adam.orderID}"' in await next_event(everything)
+            # Nothing for Ben yet, the stream keeps the connection alive
+            assert await next_event(only_ben) == ': keepalive\n\n'
+
+            await queue.addOrder(ben, update_db = False)
+            statuses.update(queue.orders)
+            event = await next_event(only_ben)
+            assert event.startswith('event: status\ndata: ')
+            assert f'"orderID": "{ben.orderID}", "customer": "Ben", "status": "queued"' in event
+            assert ben.orderID in await next_event(everything)
+        finally:
+            await everything.aclose()
+            await only_ben.aclose()
+        assert not statuses.subscribers
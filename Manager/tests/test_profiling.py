@@ -0,0 +1,59 @@
+import pytest
+import asyncio
+
+from Manager.app.scripts.profiling import Profiler
+
+def make_worker(profiler: Profiler):
+    class Worker:
+        calls = 0
+
+        @profiler.profiled('Worker.work', context = lambda worker, *args, **kwargs: {'calls': worker.calls})
+        async def work(self, delay: float) -> float:
+            self.calls += 1
+            await asyncio.sleep(delay)
+            return delay
+
+    return Worker()
+
+
+class TestProfiler:
+    @pytest.mark.asyncio
+    async def test_disabled_records_nothing(self):
+        profiler = Profiler(threshold_ms = 0)
+        worker = make_worker(profiler)
+        profiler.arm(1)
+
+        assert await worker.work(0) == 0
+        assert not profiler.slowOperations
+        assert profiler.pendingSamples == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_operation_logged_with_inputs(self):
+        profiler = Profiler(threshold_ms = 5)
+        profiler.enabled = True
+        worker = make_worker(profiler)
+
+        await worker.work(0)
+        await worker.work(0.01)
+
+        assert len(profiler.slowOperations) == 1
+        record = profiler.slowOperations[0]
+        assert record['operation'] == 'Worker.work'
+        assert record['ms'] >= 5
+        assert record['calls'] == 2
+        assert '0.01' in record['inputs']
+
+    @pytest.mark.asyncio
+    async def test_armed_calls_are_profiled(self):
+        profiler = Profiler()
+        profiler.enabled = True
+        worker = make_worker(profiler)
+        profiler.arm(2)
+
+        for _ in range(3):
+            await worker.work(0)
+
+        assert profiler.pendingSamples == 0
+        output = profiler.dump()
+        assert output.startswith('2 profiled calls')
+        assert 'No profiled calls' in profiler.dump()
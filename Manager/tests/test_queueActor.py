@@ -0,0 +1,184 @@
+import pytest
+import asyncio
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import ActorStopped, QueueActor
+from Manager.app.models import Order
+
+TEST_DATABASE_URI = "sqlite+aiosqlite:///:memory:"
+
+def make_order(customer: str, milk: str) -> Order:
+    orderID = uuid.uuid4().hex
+    return Order.model_validate({
+        'orderID': orderID,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }]
+    })
+
+
+class TestQueueActor:
+    @pytest.mark.asyncio
+    async def test_burst_is_applied_as_one_group(self):
+        queue = await Queue.create(TEST_DATABASE_URI)
+        commits = []
+        save_changes = queue.connection.saveChanges
+
+        async def counting_save_changes(**kwargs):
+            commits.append(kwargs)
+            await save_changes(**kwargs)
+        queue.connection.saveChanges = counting_save_changes
+
+        notifications = []
+        async def on_change():
+            notifications.append(len(queue.orders))
+
+        actor = QueueActor(queue, onChange = on_change)
+        actor.start()
+        try:
+            orders = [make_order(f'Customer {i}', milk) for i, milk in enumerate(['Oat', 'Soy', 'Whole', 'Oat'])]
+            await asyncio.gather(*(actor.addOrder(order) for order in orders))
+
+            assert len(commits) == 1
+            assert len(commits[0]['orders']) == 4
+            assert len(notifications) == 1
+            assert queue.totalDrinks == 4
+
+            stored = await queue.connection.getQueue()
+            assert set(o.orderID for o in stored) == set(o.orderID for o in orders)
+
+            first_drink = orders[0].drinks[0].identifier
+            await asyncio.gather(actor.complete([first_drink]), actor.complete(item_index = 0))
+
+            assert len(commits) == 2
+            assert queue.totalDrinks == 2
+            stored = {o.orderID: o for o in await queue.connection.getQueue()}
+            assert stored[orders[0].orderID].timeComplete is not None
+        finally:
+            await actor.stop()
+            await queue.connection.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_command_does_not_fail_group(self):
+        queue = Queue()
+        actor = QueueActor(queue)
+        actor.start()
+        try:
+            order = make_order('Adam', 'Oat')
+            results = await asyncio.gather(
+                actor.addOrder(order),
+                actor.complete(item_index = 5),
+                return_exceptions = True
+            )
+
+            assert results[0] is None
+            assert isinstance(results[1], IndexError)
+            assert queue.totalDrinks == 1
+        finally:
+            await actor.stop()
+
+    @pytest.mark.asyncio
+    async def test_invalid_commands_fail_alone(self):
+        queue = await Queue.create(TEST_DATABASE_URI)
+        actor = QueueActor(queue)
+        actor.start()
+        try:
+            queued = make_order('Adam', 'Oat')
+            await actor.addOrder(queued)
+            order = make_order('Ben', 'Soy')
+            results = await asyncio.gather(
+                actor.addOrder(order),
+                actor.addOrder(order.model_copy()),
+                actor.addOrder(queued.model_copy()),
+                actor.addOrder(make_order('Cat', 'Whole')),
+                return_exceptions = True
+            )
+            assert results[0] is None and results[3] is None
+            assert all(isinstance(result, ValueError) for result in results[1:3])
+            assert queue.totalDrinks == 3
+            assert len(await queue.connection.getQueue()) == 3
+
+            # Valid drinks with an item index past the end complete nothing
+            drink = queued.drinks[0].identifier
+            results = await asyncio.gather(
+                actor.complete([drink], item_index = 2),
+                actor.complete([uuid.uuid4().hex]),
+                return_exceptions = True
+            )
+            assert isinstance(results[0], IndexError)
+            assert isinstance(results[1], ValueError)
+            assert queue.totalDrinks == 3
+            assert (await queue.connection.getOrder(queued.orderID)).drinks[0].timeComplete is None
+        finally:
+            await actor.stop()
+            await queue.connection.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_commit_is_retried_per_command(self):
+        queue = await Queue.create(TEST_DATABASE_URI)
+        save_changes = queue.connection.saveChanges
+        bad = make_order('Ben', 'Soy')
+
+        async def failing_save_changes(orders = (), completions = ()):
+            if any(order.orderID == bad.orderID for order in orders):
+                raise ConnectionError('constraint failed')
+            await save_changes(orders = orders, completions = completions)
+        queue.connection.saveChanges = failing_save_changes
+
+        actor = QueueActor(queue)
+        actor.start()
+        try:
+            orders = [make_order('Adam', 'Oat'), bad, make_order('Cat', 'Whole')]
+            results = await asyncio.gather(*(actor.addOrder(order) for order in orders), return_exceptions = True)
+
+            assert results[0] is None and results[2] is None
+            assert isinstance(results[1], ConnectionError)
+            stored = {o.orderID for o in await queue.connection.getQueue()}
+            assert stored == {orders[0].orderID, orders[2].orderID}
+            assert queue.totalDrinks == 2
+        finally:
+            await actor.stop()
+            await queue.connection.close()
+
+    @pytest.mark.asyncio
+    async def test_hold_window_release_notifies(self):
+        queue = Queue()
+        queue.holdSeconds = 0.05
+        queue.maxHoldSeconds = 0.05
+        released = asyncio.Event()
+
+        async def on_change():
+            if queue.orders and queue.orders[0].heldUntil is None:
+                released.set()
+
+        actor = QueueActor(queue, onChange = on_change)
+        actor.start()
+        try:
+            await actor.addOrder(make_order('Adam', 'Oat'))
+            assert queue.orders[0].heldUntil is not None
+            await asyncio.wait_for(released.wait(), timeout = 2)
+        finally:
+            await actor.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_fails_pending_commands(self):
+        actor = QueueActor(Queue())
+        pending = asyncio.create_task(actor.addOrder(make_order('Adam', 'Oat')))
+        await asyncio.sleep(0)
+        await actor.stop()
+        with pytest.raises(ActorStopped):
+            await asyncio.wait_for(pending, timeout = 1)
@@ -0,0 +1,128 @@
+import pytest
+from datetime import datetime, timedelta
+import uuid
+
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.models import Order
+
+OPENED = datetime(2024, 1, 1, 9, 0)
+
+def make_order(customer: str, milk: str, milk_volume: float, received: datetime) -> Order:
+    orderID = uuid.uuid4().hex
+    return Order.model_validate({
+        'orderID': orderID,
+        'customer': customer,
+        'dateReceived': received.date(),
+        'timeReceived': received.time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': milk_volume,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }]
+    })
+
+class Clock:
+    def __init__(self):
+        self.time = OPENED
+
+    def __call__(self) -> datetime:
+        return self.time
+
+    def advance(self, seconds: float) -> datetime:
+        self.time += timedelta(seconds = seconds)
+        return self.time
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+@pytest.fixture
+def queue(clock) -> Queue:
+    queue = Queue()
+    queue.now = clock
+    queue.agingSeconds = None
+    queue.maxWaitSeconds = None
+    queue.holdSeconds = 30
+    queue.maxHoldSeconds = 60
+    queue.secondsPerDrink = 5
+    return queue
+
+
+class TestHoldWindow:
+    @pytest.mark.asyncio
+    async def test_without_hold_front_drinks_are_not_batched(self, queue, clock):
+        queue.holdSeconds = None
+        await queue.addOrder(make_order('Adam', 'Oat', 2, clock()), update_db = False)
+        await queue.addOrder(make_order('Hannah', 'Oat', 2, clock.advance(3)), update_db = False)
+
+        assert not any(isinstance(item, Batch) for item in queue.orders)
+        assert queue.nextRelease() is None
+
+    @pytest.mark.asyncio
+    async def test_drinks_within_window_share_a_jug(self, queue, clock):
+        await queue.addOrder(make_order('Adam', 'Oat', 2, clock()), update_db = False)
+        await queue.addOrder(make_order('Hannah', 'Oat', 2, clock.advance(3)), update_db = False)
+        await queue.addOrder(make_order('Jeff', 'Soy', 2, clock.advance(3)), update_db = False)
+
+        oat, soy = queue.orders
+        assert [d.customer for d in oat.drinks] == ['Adam', 'Hannah']
+        assert oat.heldUntil == OPENED + timedelta(seconds = 33)
+        assert soy.heldUntil == OPENED + timedelta(seconds = 36)
+        assert queue.nextRelease() == OPENED + timedelta(seconds = 33)
+
+        clock.advance(27)
+        assert queue.releaseHeld() == 1
+        assert oat.heldUntil is None
+        assert queue.nextRelease() == OPENED + timedelta(seconds = 36)
+
+        # Released batches are only joined through the normal search, which skips the front of the queue
+        await queue.addOrder(make_order('Tom', 'Oat', 1, clock.advance(1)), update_db = False)
+        assert len(oat.drinks) == 2
+
+    @pytest.mark.asyncio
+    async def test_window_is_capped_at_max_delay(self, queue, clock):
+        for customer in ['Adam', 'Hannah', 'Jeff']:
+            await queue.addOrder(make_order(customer, 'Oat', 1, clock()), update_db = False)
+            clock.advance(25)
+
+        batch, = queue.orders
+        assert len(batch.drinks) == 3
+        assert batch.heldUntil == OPENED + timedelta(seconds = 60)
+
+    @pytest.mark.asyncio
+    async def test_held_batch_ahead_of_aged_item_is_not_joined(self, queue, clock):
+        queue.agingSeconds = 20
+        await queue.addOrder(make_order('Adam', 'Oat', 2, clock()), update_db = False)
+        await queue.addOrder(make_order('Hannah', 'Soy', 2, clock.advance(1)), update_db = False)
+        # Hannah's Soy has aged, Adam's held Oat batch is in front of it
+        await queue.addOrder(make_order('Jeff', 'Oat', 2, clock.advance(24)), update_db = False)
+
+        assert [[d.customer for d in item.drinks] for item in queue.orders] == [['Adam'], ['Hannah'], ['Jeff']]
+
+    @pytest.mark.asyncio
+    async def test_full_jug_is_released(self, queue, clock):
+        await queue.addOrder(make_order('Adam', 'Oat', 2, clock()), update_db = False)
+        await queue.addOrder(make_order('Hannah', 'Oat', 2, clock.advance(3)), update_db = False)
+        await queue.addOrder(make_order('Jeff', 'Oat', 1, clock.advance(3)), update_db = False)
+
+        batch, = queue.orders
+        assert batch.volume == 5
+        assert batch.heldUntil is None
+        assert queue.nextRelease() is None
+
+    @pytest.mark.asyncio
+    async def test_drinks_started_after_window_are_not_held(self, queue, clock):
+        queue.secondsPerDrink = 24
+        await queue.addOrder(make_order('Adam', 'Oat', 2, clock()), update_db = False)
+        await queue.addOrder(make_order('Jeff', 'Soy', 2, clock.advance(3)), update_db = False)
+        await queue.addOrder(make_order('Hannah', 'Whole', 2, clock.advance(3)), update_db = False)
+
+        # 24 seconds ahead of Jeff's latte is within the window, 48 ahead of Hannah's is not
+        assert [isinstance(item, Batch) for item in queue.orders] == [True, True, False]
@@ -0,0 +1,170 @@
+import pytest
+import pytest_asyncio
+import asyncio
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.ipc import OwnerDisconnected, QueueServer, RemoteQueue, RemoteQueueError
+from Manager.app.scripts.queueManager.stores import Stores
+from Manager.app.models import Order
+
+def make_order(customer: str, milks: list) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+@pytest_asyncio.fixture
+async def owner(tmp_path):
+    async def open(store):
+        store.queue = Queue()
+        store.actor = QueueActor(store.queue, onChange = lambda: server.publish(store))
+        store.actor.start()
+
+    server = QueueServer(Stores(open, ['north']), str(tmp_path / 'queue.sock'))
+    server.queue = (await server.stores.get()).queue
+    await server.start()
+    yield server
+    await server.stop()
+    for store in server.stores.stores.values():
+        await store.actor.stop()
+
+
+class TestQueueIPC:
+    @pytest.mark.asyncio
+    async def test_workers_share_one_queue(self, owner):
+        changes = asyncio.Queue()
+        async def on_change():
+            await changes.put(None)
+
+        first = await RemoteQueue.connect(owner.path)
+        second = await RemoteQueue.connect(owner.path, onChange = on_change)
+        try:
+            await asyncio.gather(
+                first.addOrder(make_order('Adam', ['Oat', 'Oat'])),
+                second.addOrder(make_order('Ben', ['Soy']))
+            )
+            assert owner.queue.totalDrinks == 3
+
+            await asyncio.wait_for(changes.get(), timeout = 2)
+            while not changes.empty():
+                changes.get_nowait()
+            assert second.totalDrinks == 3
+            assert [type(item) for item in second.orders] == [type(item) for item in owner.queue.orders]
+            assert any(isinstance(item, Batch) for item in second.orders)
+
+            drink = owner.queue.orders[-1].drinks[0].identifier
+            await second.complete([drink])
+            await asyncio.wait_for(changes.get(), timeout = 2)
+            assert owner.queue.totalDrinks == second.totalDrinks == 2
+            assert second.etag == owner.queue.etag
+
+            history = await first.history()
+            assert [d.identifier for order in history['history'] for d in order.drinks] == [drink]
+
+            completed = history['history'][0]
+            assert (await first.getOrder(completed.orderID)).timeComplete == completed.timeComplete
+            assert await first.getOrder(uuid.uuid4().hex) is None
+        finally:
+            await first.close()
+            await second.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_the_worker(self, owner):
+        worker = await RemoteQueue.connect(owner.path)
+        try:
+            with pytest.raises(RemoteQueueError, match = 'index'):
+                await worker.complete(item_index = 5)
+            assert (await worker.summary()) == owner.queue.analytics.summary()
+        finally:
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_connections_are_bound_to_one_store(self, owner):
+        default = await RemoteQueue.connect(owner.path)
+        north = await RemoteQueue.connect(owner.path, store = 'north')
+        try:
+            await north.addOrder(make_order('Adam', ['Oat']))
+            assert north.totalDrinks == 1
+            assert owner.queue.totalDrinks == default.totalDrinks == 0
+
+            with pytest.raises(RemoteQueueError, match = 'Unknown store'):
+                await RemoteQueue.connect(owner.path, store = 'south')
+        finally:
+            await default.close()
+            await north.close()
+
+    @pytest.mark.asyncio
+    async def test_submits_fail_once_the_owner_is_gone(self, owner):
+        worker = await RemoteQueue.connect(owner.path)
+        try:
+            await owner.stop()
+            await asyncio.wait_for(worker._task, timeout = 2)
+            with pytest.raises(OwnerDisconnected):
+                await asyncio.wait_for(worker.addOrder(make_order('Adam', ['Oat'])), timeout = 2)
+        finally:
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_malformed_hello_is_refused(self, owner):
+        for hello in [b'not json\n', b'["north"]\n', b'{"store": 1}\n']:
+            reader, writer = await asyncio.open_unix_connection(owner.path)
+            writer.write(hello)
+            reply = await asyncio.wait_for(reader.readline(), timeout = 2)
+            assert b'Malformed hello' in reply
+            writer.close()
+
+    @pytest.mark.asyncio
+    async def test_first_state_does_not_notify(self, owner):
+        notified = []
+        changed = asyncio.Event()
+        async def on_change():
+            notified.append(worker)
+            changed.set()
+
+        worker = None
+        worker = await RemoteQueue.connect(owner.path, onChange = on_change)
+        try:
+            assert notified == []
+            await worker.addOrder(make_order('Adam', ['Oat']))
+            await asyncio.wait_for(changed.wait(), timeout = 2)
+            assert notified[0] is worker
+        finally:
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_workers_render_the_owners_stations(self, owner):
+        changes = asyncio.Queue()
+        async def on_change():
+            await changes.put(None)
+
+        first = await RemoteQueue.connect(owner.path, onChange = on_change)
+        second = await RemoteQueue.connect(owner.path)
+        try:
+            for customer in ('Adam', 'Ben', 'Cal', 'Dan'):
+                await first.addOrder(make_order(customer, ['Whole']))
+                await asyncio.wait_for(changes.get(), timeout = 2)
+            await second.history()
+
+            actor = (await owner.stores.get()).actor
+            assert sorted(i for indexes in actor.views.values() for i in indexes) == list(range(len(owner.queue.orders)))
+            assert first.views == second.views == actor.views
+        finally:
+            await first.close()
+            await second.close()
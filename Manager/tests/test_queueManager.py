@@ -4,7 +4,9 @@ import logging, sys, uuid
 from tqdm import trange
 
 from Manager.app.scripts.queueManager import Queue, Batch, fetchOrder
+from Manager.app.scripts.queueManager.history import OrderHistory
 from Manager.app.models import Order, Drink
+from Manager.app.models.catalog import CATALOG
 
 @pytest.fixture(scope='module')
 def orders():
@@ -162,8 +164,7 @@ class TestQueueInitialization:
         assert hasattr(queue, 'totalDrinks')
         assert hasattr(queue, 'totalOrders')
         assert isinstance(queue.orders, list)
-        assert isinstance(queue.orderHistory, list)
-        assert isinstance(queue.orderHistoryIndex, dict)
+        assert isinstance(queue.orderHistory, OrderHistory)
         assert isinstance(queue.totalOrders, int)
         assert isinstance(queue.totalDrinks, int)
         assert isinstance(queue.lookupTable, dict)
@@ -173,7 +174,7 @@ class TestQueueOperations:
     @pytest.mark.asyncio
     async def test_add_order(self, queue, orders):
         order = next(o for o in orders if o.drinks[0].milk != "No Milk" and len(o.drinks) == 1)
-        milk_type = f"{order.drinks[0].milk}_{order.drinks[0].texture}"
+        milk_type = order.drinks[0].batchKey
         orderID = order.orderID
         
         await queue.addOrder(order, update_db=False)
@@ -183,14 +184,15 @@ class TestQueueOperations:
         assert 0 in queue.lookupTable[milk_type]
         assert queue.totalDrinks == 1
         assert queue.totalOrders == 1
-        assert orderID in queue.orderHistoryIndex.keys()
-        assert queue.orderHistoryIndex[orderID]['index'] == 0
+        assert orderID in queue.orderHistory
+        assert [o.orderID for o in queue.orderHistory] == [orderID]
 
     @pytest.mark.asyncio
     async def test_complete_item(self, queue):
-        assert queue.orderHistory[0].timeComplete is None
+        orderID = queue.orders[0].orderID
+        assert queue.orderHistory.get(orderID).timeComplete is None
         await queue.completeItem(0)
-        assert queue.orderHistory[0].timeComplete is not None
+        assert queue.orderHistory.get(orderID).timeComplete is not None
         assert len(queue.orders) == 0
         assert queue.totalOrders == 0
         assert queue.totalDrinks == 0
@@ -209,14 +211,11 @@ class TestOrderBatching:
                             soy_cappuccino):
         await queue.addOrder(jeff_order, update_db=False)
 
-        assert jeff_order.orderID in queue.orderHistoryIndex.keys()
-        assert queue.orderHistoryIndex[jeff_order.orderID]['index'] == 0
+        assert jeff_order.orderID in queue.orderHistory
 
         await queue.addOrder(hannah_order, update_db=False)
 
-        assert hannah_order.orderID in queue.orderHistoryIndex.keys()
-        assert queue.orderHistoryIndex[hannah_order.orderID]['index'] == 0
-        assert queue.orderHistoryIndex[jeff_order.orderID]['index'] == 1
+        assert [o.orderID for o in queue.orderHistory][:2] == [hannah_order.orderID, jeff_order.orderID]
 
         assert len(queue.orders) == 3
         assert queue.totalDrinks == 4
@@ -224,8 +223,8 @@ class TestOrderBatching:
         assert isinstance(queue.orders[1], Batch)
         assert all(drink in queue.orders[1].drinks for drink in oat_cappuccinos)
         assert soy_cappuccino in queue.orders[2].drinks
-        assert 1 in queue.lookupTable['Oat_Dry']
-        assert 2 in queue.lookupTable['Soy_Dry']
+        assert 1 in queue.lookupTable[CATALOG.key('Oat', 'Dry')]
+        assert 2 in queue.lookupTable[CATALOG.key('Soy', 'Dry')]
 
     @pytest.mark.asyncio
     async def test_cross_order_batching(self, 
@@ -242,7 +241,7 @@ class TestOrderBatching:
         assert queue.totalOrders == 4
         assert queue.totalDrinks == 6
         assert isinstance(queue.orders[-1], Batch)
-        assert 3 in queue.lookupTable['Whole_Wet']
+        assert 3 in queue.lookupTable[CATALOG.key('Whole', 'Wet')]
 
 
 class TestCompleteDrinks:
@@ -259,6 +258,6 @@ class TestCompleteDrinks:
         assert len(queue.orders) == 2
         assert isinstance(queue.orders[0], Batch)
         assert isinstance(queue.orders[1], Batch)
-        assert 1 in queue.lookupTable['Whole_Wet']
-        assert 0 in queue.lookupTable['Oat_Dry']
-        assert queue.lookupTable['Soy_Dry'] == set()
+        assert 1 in queue.lookupTable[CATALOG.key('Whole', 'Wet')]
+        assert 0 in queue.lookupTable[CATALOG.key('Oat', 'Dry')]
+        assert queue.lookupTable[CATALOG.key('Soy', 'Dry')] == set()
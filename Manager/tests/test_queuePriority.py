@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime, timedelta
+import uuid
+
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.models import Order
+
+OPENED = datetime(2024, 1, 1, 9, 0)
+
+def make_order(customer: str, milk: str, received: datetime) -> Order:
+    orderID = uuid.uuid4().hex
+    no_milk = milk == 'No Milk'
+    return Order.model_validate({
+        'orderID': orderID,
+        'customer': customer,
+        'dateReceived': received.date(),
+        'timeReceived': received.time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Espresso' if no_milk else 'Latte',
+            'milk': milk,
+            'milk_volume': 0 if no_milk else 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': None if no_milk else 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }]
+    })
+
+async def fill_queue(queue: Queue, waited: float) -> None:
+    'Two espressos at the front, an oat latte at index 2 and an espresso behind it, all received waited seconds ago'
+    received = OPENED - timedelta(seconds = waited)
+    for customer, milk in [('Jeff', 'No Milk'), ('Tom', 'No Milk'), ('Adam', 'Oat'), ('Hannah', 'No Milk')]:
+        await queue.addOrder(make_order(customer, milk, received), update_db = False)
+
+@pytest.fixture
+def queue() -> Queue:
+    queue = Queue()
+    queue.now = lambda: OPENED
+    queue.agingSeconds = None
+    queue.maxWaitSeconds = None
+    return queue
+
+
+class TestQueuePriority:
+    @pytest.mark.asyncio
+    async def test_batches_without_priority(self, queue):
+        await fill_queue(queue, waited = 400)
+        await queue.addOrder(make_order('Kayleigh', 'Oat', OPENED), update_db = False)
+
+        assert isinstance(queue.orders[2], Batch)
+        assert len(queue.orders) == 4
+
+    @pytest.mark.asyncio
+    async def test_aged_item_is_not_overtaken(self, queue):
+        queue.agingSeconds = 300
+        await fill_queue(queue, waited = 400)
+        await queue.addOrder(make_order('Kayleigh', 'Oat', OPENED), update_db = False)
+
+        assert not any(isinstance(item, Batch) for item in queue.orders)
+        assert queue.orders[-1].customer == 'Kayleigh'
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('waited, batched', [(300, True), (330, False)])
+    async def test_batching_respects_max_wait(self, queue, waited, batched):
+        # Hannah is projected to be finished 4 drinks (240 seconds) from now, so one more drink
+        # ahead of her misses the 600 second SLA once she has waited more than 300 seconds
+        queue.maxWaitSeconds = 600
+        queue.secondsPerDrink = 60
+        await fill_queue(queue, waited = waited)
+        await queue.addOrder(make_order('Kayleigh', 'Oat', OPENED), update_db = False)
+
+        assert isinstance(queue.orders[2], Batch) == batched
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('batch_volume, batched', [(1.5, False), (2, True)])
+    async def test_batching_respects_batch_volume(self, queue, batch_volume, batched):
+        queue.batchVolume = batch_volume
+        await fill_queue(queue, waited = 0)
+        await queue.addOrder(make_order('Kayleigh', 'Oat', OPENED), update_db = False)
+
+        assert isinstance(queue.orders[2], Batch) == batched
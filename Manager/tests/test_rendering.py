@@ -0,0 +1,101 @@
+import pytest
+from datetime import datetime
+import os, uuid
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.services.frames import itemVersion
+from Manager.app.scripts.services.rendering import FragmentCache, Pages
+from Manager.app.models import Order
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'app', 'templates')
+
+def make_order(customer: str, milks: list) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+def indexContext(queue: Queue) -> dict:
+    return {'queue': queue, 'items': list(enumerate(queue.orders)), 'station': None, 'plan': None, 'colors': {}, 'base': ''}
+
+@pytest.fixture
+def pages():
+    return Pages(TEMPLATE_DIR)
+
+
+class TestRendering:
+    @pytest.mark.asyncio
+    async def test_index_renders_every_card(self, pages):
+        queue = Queue()
+        await queue.addOrders([make_order('Adam', ['Oat', 'Oat']), make_order('<Ben>', ['Soy'])], update_db = False)
+        html = await pages.render('index.html', indexContext(queue))
+
+        assert 'Oat Milk Batch' in html
+        assert f'id="order-1" data-key="{queue.orders[1].orderID}" data-version="{itemVersion(queue.orders[1])}"' in html
+        assert all(f'id="drink-{d.identifier}"' in html for item in queue.orders for d in item.drinks)
+        assert '&lt;Ben&gt;' in html and '<Ben>' not in html
+        assert pages.cache.misses == 2
+
+    @pytest.mark.asyncio
+    async def test_only_changed_cards_are_rendered(self, pages):
+        queue = Queue()
+        await queue.addOrders([make_order('Adam', ['Soy']), make_order('Ben', ['Oat']), make_order('Cat', ['Whole'])], update_db = False)
+        first = await pages.render('index.html', indexContext(queue))
+        assert (pages.cache.hits, pages.cache.misses) == (0, 3)
+        assert await pages.render('index.html', indexContext(queue)) == first
+        assert (pages.cache.hits, pages.cache.misses) == (3, 3)
+
+        # The rest move up a place, and keep their cards
+        await queue.completeItem(0, update_db = False)
+        html = await pages.render('index.html', indexContext(queue))
+        assert (pages.cache.hits, pages.cache.misses) == (5, 3)
+        assert 'Ben' in html.split('id="order-0"')[1].split('id="order-1"')[0]
+
+        # A batch that gains a drink is a new card
+        await queue.addOrder(make_order('Dan', ['Oat']), update_db = False)
+        await pages.render('index.html', indexContext(queue))
+        assert pages.cache.misses == 4
+
+    @pytest.mark.asyncio
+    async def test_pages_are_streamed_in_chunks(self):
+        pages = Pages(TEMPLATE_DIR, chunk_size = 512)
+        queue = Queue()
+        await queue.addOrders([make_order(f'Customer {i}', ['Soy']) for i in range(20)], update_db = False)
+        chunks = [chunk async for chunk in pages.stream('index.html', indexContext(queue))]
+        assert len(chunks) > 5
+        assert all(len(chunk) >= 512 for chunk in chunks[:-1])
+        assert ''.join(chunks) == await pages.render('index.html', indexContext(queue))
+
+    @pytest.mark.asyncio
+    async def test_history(self, pages):
+        queue = Queue()
+        await queue.addOrders([make_order('Adam', ['Soy', 'Whole']), make_order('Ben', ['Oat'])], update_db = False)
+        drink = queue.orders[0].drinks[0].identifier
+        await queue.completeDrinks([drink], update_db = False)
+        context = {'history': queue.getCompletedItems(), 'totalOrders': 0, 'totalDrinks': 1, 'colors': {}, 'base': ''}
+        html = await pages.render('history.html', context)
+        assert f'id="drink-{drink}"' in html
+        assert html.count('class="drink-card"') == 1
+
+    def test_cache_is_bounded(self):
+        cache = FragmentCache(maxsize = 2)
+        for key in 'abc':
+            cache.put(key, key)
+        assert cache.get('a') is None
+        assert cache.get('b') == 'b'
+        cache.put('d', 'd')
+        assert (cache.get('c'), cache.get('b')) == (None, 'b')
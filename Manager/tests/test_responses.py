@@ -0,0 +1,145 @@
+import pytest
+import asyncio
+from datetime import datetime
+import brotli, uuid, zlib
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.services.responses import CompressionMiddleware, etagMatches, negotiate, notModified
+from Manager.app.models import Order
+
+BODY = 'coffee ' * 1000
+
+async def large(request):
+    return notModified(request, '"v1"') or PlainTextResponse(BODY, headers = {'ETag': '"v1"'})
+
+async def small(request):
+    return PlainTextResponse('coffee')
+
+async def chunks():
+    for _ in range(3):
+        yield BODY
+
+async def stream(request):
+    return StreamingResponse(chunks(), media_type = 'text/plain')
+
+async def events(request):
+    return StreamingResponse(chunks(), media_type = 'text/event-stream')
+
+@pytest.fixture
+def client():
+    app = Starlette(routes = [Route('/large', large), Route('/small', small), Route('/stream', stream), Route('/events', events)])
+    app.add_middleware(CompressionMiddleware, minimum_size = 100)
+    return TestClient(app)
+
+def make_order(customer: str) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': 'Oat',
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        }]
+    })
+
+
+class TestNegotiation:
+    def test_negotiate(self):
+        assert negotiate('gzip, deflate, br') == 'br'
+        assert negotiate('br;q=0.5, gzip') == 'gzip'
+        assert negotiate('gzip;q=0, br;q=0') is None
+        assert negotiate('*') == 'br'
+        assert negotiate('identity') is None
+        assert negotiate('') is None
+
+    def test_etag_matches(self):
+        assert etagMatches('"v1"', '"v1"')
+        assert etagMatches('"v0", "v1-br"', '"v1"')
+        assert etagMatches('W/"v1-gzip"', '"v1"')
+        assert etagMatches('*', '"v1"')
+        assert not etagMatches('"v2"', '"v1"')
+        assert not etagMatches(None, '"v1"')
+
+
+class TestCompressionMiddleware:
+    def test_compresses_large_responses(self, client):
+        response = client.get('/large', headers = {'Accept-Encoding': 'br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert response.headers['ETag'] == '"v1-br"'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert int(response.headers['Content-Length']) < len(BODY)
+        assert response.text == BODY
+
+        response = client.get('/large', headers = {'Accept-Encoding': 'gzip'})
+        assert (response.headers['Content-Encoding'], response.headers['ETag']) == ('gzip', '"v1-gzip"')
+        assert client.get('/large', headers = {'Accept-Encoding': 'identity'}).headers.get('Content-Encoding') is None
+
+    def test_not_modified_carries_the_etag_of_the_200(self, client):
+        for coding in ['br', 'gzip', 'identity']:
+            etag = client.get('/large', headers = {'Accept-Encoding': coding}).headers['ETag']
+            response = client.get('/large', headers = {'Accept-Encoding': coding, 'If-None-Match': etag})
+            assert (response.status_code, response.headers['ETag']) == (304, etag)
+            assert response.headers.get('Content-Encoding') is None
+
+    def test_small_responses_are_sent_as_they_are(self, client):
+        response = client.get('/small', headers = {'Accept-Encoding': 'br'})
+        assert response.headers.get('Content-Encoding') is None
+        assert response.text == 'coffee'
+
+    @pytest.mark.asyncio
+    async def test_streams_are_flushed_chunk_by_chunk(self, client):
+        sent = []
+        async def send(message):
+            sent.append(message)
+        disconnected = asyncio.Event()
+        async def receive():
+            # The request has no body, then the client stays connected
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+        scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': [(b'accept-encoding', b'gzip')]}
+        await CompressionMiddleware(StreamingResponse(chunks()), minimum_size = 100)(scope, receive, send)
+
+        headers = dict(sent[0]['headers'])
+        assert headers[b'content-encoding'] == b'gzip'
+        assert b'content-length' not in headers
+        # Each chunk decompresses on its own, without waiting for the end of the stream
+        decompressor = zlib.decompressobj(31)
+        bodies = [decompressor.decompress(message['body']) for message in sent[1:]]
+        assert bodies[:3] == [BODY.encode()] * 3
+
+        with client.stream('GET', '/stream', headers = {'Accept-Encoding': 'br'}) as response:
+            assert brotli.decompress(b''.join(response.iter_raw())) == 3 * BODY.encode()
+
+    def test_event_streams_are_not_compressed(self, client):
+        response = client.get('/events', headers = {'Accept-Encoding': 'br, gzip'})
+        assert response.headers.get('Content-Encoding') is None
+        assert response.text == 3 * BODY
+
+
+class TestQueueETag:
+    @pytest.mark.asyncio
+    async def test_etag_changes_with_the_queue(self):
+        queue = Queue()
+        etag = queue.etag
+        assert queue.etag == etag
+        await queue.addOrder(make_order('Adam'), update_db = False)
+        added = queue.etag
+        assert added != etag
+        await queue.completeItem(0, update_db = False)
+        assert queue.etag not in (etag, added)
+        # Another queue's versions never collide with this one's
+        assert Queue().etag != etag
@@ -0,0 +1,164 @@
+import pytest
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.queueManager import Batch
+from Manager.app.scripts.queueManager.scheduler import StationScheduler, grinder
+from Manager.app.models import Order, Station
+
+PREP_SECONDS = {'shot': 25, 'steam': 35, 'pour': 10}
+
+def make_order(drinks: list) -> Order:
+    orderID = uuid.uuid4().hex
+    return Order.model_validate({
+        'orderID': orderID,
+        'customer': 'Hannah',
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [
+            {
+                'drink': name,
+                'milk': milk,
+                'milk_volume': volume,
+                'shots': shots,
+                'temperature': None,
+                'texture': 'Wet' if volume else None,
+                'options': list(options),
+                'customer': 'Hannah',
+                'timeComplete': None
+            }
+            for name, milk, volume, shots, *options in drinks
+        ]
+    })
+
+@pytest.fixture
+def scheduler() -> StationScheduler:
+    return StationScheduler([
+        Station(name = 'Machine 1', groups = 2, steam_wands = 2, jug_size = 5),
+        Station(name = 'Machine 2', groups = 1, steam_wands = 1, jug_size = 3),
+    ], PREP_SECONDS)
+
+
+class TestStationScheduler:
+    def test_estimate(self, scheduler):
+        big, small = scheduler.stations
+        order = make_order([('Latte', 'Oat', 2, 2), ('Espresso', 'No Milk', 0, 2), ('Flat White', 'Oat', 1, 3)])
+
+        # 4 pulls over 2 groups = 50s, 3 milk in 1 jug = 35s, 3 pours = 30s
+        assert scheduler.estimate(order, big) == 80
+        # 4 pulls over 1 group = 100s, 3 milk in 1 jug = 35s, 3 pours = 30s
+        assert scheduler.estimate(order, small) == 130
+
+    def test_batch_jugs(self, scheduler):
+        big, small = scheduler.stations
+        batch = Batch()
+        for drink in make_order([('Latte', 'Oat', 2, 0)] * 2).drinks:
+            batch.add_drink(drink)
+
+        # 4 milk in one 5 jug, or two 3 jugs on one wand
+        assert scheduler.estimate(batch, big) == 35 + 20
+        assert scheduler.estimate(batch, small) == 70 + 20
+
+    def test_assign_balances_stations(self, scheduler):
+        items = [make_order([('Latte', 'Whole', 2, 2)]) for _ in range(6)]
+        assignment = scheduler.assign(items)
+
+        assert assignment[0] == 'Machine 1'
+        assert set(assignment) == {'Machine 1', 'Machine 2'}
+        assert scheduler.makespan(items) < sum(scheduler.estimate(i, scheduler.stations[0]) for i in items)
+
+        views = scheduler.views(items)
+        assert sorted(views['Machine 1'] + views['Machine 2']) == list(range(6))
+
+    def test_items_keep_their_station(self, scheduler):
+        items = [make_order([('Latte', 'Whole', 2, 2)]) for _ in range(6)]
+        assigned = {}
+        before = scheduler.views(items, assigned)
+        stations = {item.orderID: name for name, indexes in before.items() for item in (items[i] for i in indexes)}
+
+        # Completing the front item would have the greedy assignment swap every item after it
+        items = items[1:] + [make_order([('Latte', 'Whole', 2, 2)])]
+        after = scheduler.views(items, assigned)
+        assert all(assigned[item.orderID] == stations[item.orderID] for item in items[:-1])
+        assert sorted(after['Machine 1'] + after['Machine 2']) == list(range(6))
+        assert len(assigned) == 6
+
+    def test_overloaded_station_is_rebalanced(self, scheduler):
+        items = [make_order([('Latte', 'Whole', 2, 2)]) for _ in range(6)]
+        assigned = {item.orderID: 'Machine 2' for item in items}
+        # 6 * 45s on Machine 2
+        assert scheduler.views(items, dict(assigned))['Machine 1'] == []
+
+        # Work moves from the back until neither is rebalance_seconds behind, the front lookahead items never move
+        scheduler.rebalance_seconds = 60
+        views = scheduler.views(items, assigned)
+        assert views == {'Machine 1': [3, 4, 5], 'Machine 2': [0, 1, 2]}
+        assert scheduler.views(items, dict(assigned)) == views
+
+    def test_no_stations(self):
+        scheduler = StationScheduler([], PREP_SECONDS)
+        items = [make_order([('Latte', 'Whole', 2, 2)]) for _ in range(3)]
+        assigned = {items[0].orderID: 'Machine 1'}
+
+        assert scheduler.assign(items) == []
+        assert scheduler.makespan(items) == 0
+        assert scheduler.views(items) == scheduler.views(items, assigned) == {}
+        assert assigned == {}
+        assert scheduler.plans(items) == {}
+
+    def test_busy_station_is_skipped(self, scheduler):
+        items = [make_order([('Latte', 'Whole', 2, 2)])]
+        assert scheduler.assign(items, available_in = {'Machine 1': 600}) == ['Machine 2']
+
+
+class TestStationPlan:
+    def test_grinder(self):
+        regular, decaf, no_shots = make_order([
+            ('Latte', 'Oat', 2, 2), ('Latte', 'Oat', 2, 2, 'Decaf'), ('Chai Latte', 'Oat', 2, 0)
+        ]).drinks
+        assert (grinder(regular), grinder(decaf), grinder(no_shots)) == ('regular', 'decaf', None)
+
+    def test_shots_grouped_across_items(self, scheduler):
+        big, _ = scheduler.stations
+        items = [
+            make_order([('Latte', 'Oat', 2, 2), ('Flat White', 'Whole', 1, 2, 'Decaf')]),
+            make_order([('Espresso', 'No Milk', 0, 2, 'Decaf'), ('Latte', 'Oat', 2, 2), ('Cortado', 'Oat', 0.5, 3)]),
+            make_order([('Latte', 'Soy', 2, 2, 'Decaf')]),
+        ]
+        plan = scheduler.plan(items, big, indexes = [3, 5, 8])
+
+        # Two items of lookahead, queue order regular, decaf, decaf, regular, regular
+        assert plan.indexes == [3, 5]
+        assert [(g.grinder, g.shots, len(g.drinkIDs)) for g in plan.shots] == [
+            ('regular', 2, 2), ('regular', 3, 1), ('decaf', 2, 2)
+        ]
+        assert (plan.grinderSwitches, plan.queueOrderSwitches) == (1, 2)
+        assert [(j.milk, j.volume) for j in plan.jugs] == [('Oat', 2), ('Whole', 1), ('Oat', 2.5)]
+
+        # Set to decaf, the decaf shots go first
+        plan = scheduler.plan(items, big, current_grinder = 'decaf')
+        assert plan.shots[0].grinder == 'decaf'
+        assert (plan.grinderSwitches, plan.queueOrderSwitches) == (1, 3)
+
+    def test_jugs_split_at_jug_size(self, scheduler):
+        _, small = scheduler.stations
+        batch = Batch()
+        for drink in make_order([('Latte', 'Oat', 2, 2)] * 2).drinks:
+            batch.add_drink(drink)
+        assert [j.volume for j in scheduler.plan([batch], small).jugs] == [2, 2]
+
+    def test_switch_cost(self):
+        station = Station(name = 'Machine 1', groups = 2, steam_wands = 1, jug_size = 5)
+        scheduler = StationScheduler([station], {**PREP_SECONDS, 'switch': 20})
+        decaf = make_order([('Espresso', 'No Milk', 0, 2, 'Decaf')])
+
+        assert scheduler.estimate(decaf, station, 'regular') == scheduler.estimate(decaf, station, 'decaf') + 20
+        assert scheduler.estimate(decaf, station) == scheduler.estimate(decaf, station, 'decaf')
+
+    def test_assign_keeps_decaf_on_one_station(self):
+        stations = [Station(name = f'Machine {i}', groups = 2, steam_wands = 1, jug_size = 5) for i in (1, 2)]
+        scheduler = StationScheduler(stations, {**PREP_SECONDS, 'switch': 20})
+        decaf = make_order([('Espresso', 'No Milk', 0, 2, 'Decaf')])
+
+        assert scheduler.assign([decaf], grinders = {'Machine 1': 'regular', 'Machine 2': 'decaf'}) == ['Machine 2']
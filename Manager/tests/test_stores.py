@@ -0,0 +1,94 @@
+import pytest
+import pytest_asyncio
+import asyncio
+from datetime import datetime
+import uuid
+
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.stores import DEFAULT_STORE, Stores, openQueue, storeDatabaseURI
+from Manager.app.models import Order
+from Manager.app.models.catalog import CATALOG
+
+def make_order(customer: str, milks: list) -> Order:
+    return Order.model_validate({
+        'orderID': uuid.uuid4().hex,
+        'customer': customer,
+        'dateReceived': datetime.now().date(),
+        'timeReceived': datetime.now().time(),
+        'timeComplete': None,
+        'drinks': [{
+            'drink': 'Latte',
+            'milk': milk,
+            'milk_volume': 1,
+            'shots': 2,
+            'temperature': None,
+            'texture': 'Wet',
+            'options': [],
+            'customer': customer,
+            'timeComplete': None
+        } for milk in milks]
+    })
+
+@pytest_asyncio.fixture
+async def stores():
+    opened = []
+    async def open(store):
+        opened.append(store.storeID)
+        store.queue = Queue()
+        store.actor = QueueActor(store.queue)
+        store.actor.start()
+
+    stores = Stores(open, ['north', 'south'])
+    stores.opened = opened
+    yield stores
+    for store in stores.stores.values():
+        await store.actor.stop()
+
+
+class TestStores:
+    @pytest.mark.asyncio
+    async def test_queues_are_independent(self, stores):
+        north, south = await stores.get('north'), await stores.get('south')
+        await north.actor.addOrder(make_order('Adam', ['Oat', 'Oat']))
+        await south.actor.addOrder(make_order('Ben', ['Soy']))
+
+        assert north.queue.totalDrinks == 2
+        assert south.queue.totalDrinks == 1
+        assert north.queue.lookupTable[CATALOG.key('Soy', 'Wet')] == set()
+        assert north.connections is not south.connections
+
+    @pytest.mark.asyncio
+    async def test_only_configured_stores_open(self, stores):
+        assert (await stores.get()).storeID == DEFAULT_STORE
+        for storeID in ['east', '../north', '']:
+            with pytest.raises(KeyError):
+                await stores.get(storeID)
+        assert stores.opened == [DEFAULT_STORE]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_requests_open_once(self, stores):
+        first, second = await asyncio.gather(stores.get('north'), stores.get('north'))
+        assert first is second
+        assert stores.opened == ['north']
+
+    def test_database_partitions(self):
+        URI = 'sqlite+aiosqlite:////data/database.db'
+        assert storeDatabaseURI(URI, DEFAULT_STORE) == URI
+        assert storeDatabaseURI(URI, 'north') == 'sqlite+aiosqlite:////data/database-north.db'
+        assert storeDatabaseURI('sqlite+aiosqlite:///:memory:', 'north') == 'sqlite+aiosqlite:///:memory:'
+
+    @pytest.mark.asyncio
+    async def test_stores_persist_separately(self, tmp_path):
+        URI = 'sqlite+aiosqlite:///' + str(tmp_path / 'database.db')
+        stores = Stores(lambda store: openQueue(store, URI), ['north'])
+        await (await stores.get('north')).actor.addOrder(make_order('Adam', ['Oat']))
+        await stores.get()
+        await stores.close()
+
+        reopened = Stores(lambda store: openQueue(store, URI), ['north'])
+        try:
+            assert (await reopened.get('north')).queue.totalDrinks == 1
+            assert (await reopened.get()).queue.totalDrinks == 0
+        finally:
+            await reopened.close()
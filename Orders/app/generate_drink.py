@@ -1,39 +1,17 @@
-import random, json, os
+from Manager.app.scripts.config import CONFIG, MenuDrink
 from typing import List
+import random
 
-RELATIVE_PATH = "../../Manager/config/"
-CONFIG_FILE_PATH = os.path.join(
-    os.path.dirname(__file__), RELATIVE_PATH, "config.json"
-)
+NO_MILK_DRINKS = ('Espresso', 'Long Black', 'Short Black')
 
-with open(CONFIG_FILE_PATH, 'r') as f:
-    data = json.load(f)
-MILKS: List[str] = data.get('milks', [])
-TEXTURES: List[str] = data.get('textures', [])
-DRINKS: List[dict] = data.get('drinks', [])
-OPTIONS: List[str] = data.get('options', [])
-
-def generateDrink() -> dict:
-    '''
-    Random drink generator.
-    Generates an espresso based drink of certain type, with randomly chosen milk type, 
-    shot number, milk texture and temperature, and other options.
-    '''
-    #Choose drink and milk type
-    drink_choice = random.choice(DRINKS)
-    if drink_choice['drink'] in ['Espresso', 'Long Black', 'Short Black']:
-        milk_choice = "No Milk"
+def _buildDrink(drink: MenuDrink, milk: str, options: set) -> dict:
+    '''Fills in milk, options, shots and temperature on a copy of a menu entry.'''
+    drink_choice = drink.model_dump()
+    if drink_choice['drink'] in NO_MILK_DRINKS:
+        drink_choice['milk'] = "No Milk"
     else:
-        milk_choice = random.choice(MILKS)
-    drink_choice['milk'] = milk_choice
+        drink_choice['milk'] = milk
 
-    #Choose options
-    options = set()
-    n = random.randint(0, 2)
-    while n > 0:
-        option = random.choice(OPTIONS)
-        options.add(option)
-        n -= 1
     drink_choice['options'] = list(options)
 
     base_shots = drink_choice['shots'] 
@@ -61,3 +39,37 @@ def generateDrink() -> dict:
     drink_choice['timeReceived'] = None
 
     return drink_choice
+
+def generateDrink(rng: random.Random = random) -> dict:
+    '''
+    Random drink generator.
+    Generates an espresso based drink of certain type, with randomly chosen milk type, 
+    shot number, milk texture and temperature, and other options.
+
+    Pass a seeded random.Random as rng for a reproducible drink.
+    '''
+    menu = CONFIG.get()
+
+    #Choose drink and milk type
+    drink_choice = rng.choice(menu.drinks)
+    milk_choice = rng.choice(menu.milks)
+
+    #Choose options
+    options = set(rng.choice(menu.options) for _ in range(rng.randint(0, 2)))
+
+    return _buildDrink(drink_choice, milk_choice, options)
+
+def generateDrinks(n: int, rng: random.Random = random) -> List[dict]:
+    '''
+    Generates n random drinks, drawing every drink type, milk and option for the batch in one call each.
+    '''
+    menu = CONFIG.get()
+    drink_choices = rng.choices(menu.drinks, k = n)
+    milk_choices = rng.choices(menu.milks, k = n)
+    option_counts = rng.choices((0, 1, 2), k = n)
+    option_choices = iter(rng.choices(menu.options, k = sum(option_counts)))
+
+    return [
+        _buildDrink(drink, milk, set(next(option_choices) for _ in range(count)))
+        for drink, milk, count in zip(drink_choices, milk_choices, option_counts)
+    ]
@@ -1,49 +1,83 @@
 from Manager.app.models import Order
-from Orders.app.generate_drink import generateDrink
+from Orders.app.generate_drink import generateDrink, generateDrinks
+from Orders.config.names import NAMES
 from datetime import datetime
+from typing import List, Optional, Union
 import requests, random, uuid
 
 nameAPI_address = 'https://randomuser.me/api/?results=1&inc=name'
 
-def getCustomerName() -> str|None:
+def getCustomerName() -> str:
     '''
     Gets a random name from a random user generator API.
+    Falls back to the local name pool if the API can't be reached.
     '''
     try:
-        response = requests.get(url = nameAPI_address)
-    except requests.exceptions.ConnectionError:
-        return None
-    except requests.exceptions.TooManyRedirects:
-        return None
+        response = requests.get(url = nameAPI_address, timeout = 5)
     except requests.exceptions.RequestException:
-        return None
+        return random.choice(NAMES)
     
     if response.status_code == 200:
         try:
-            name = response.json()['results'][0]['name']['first']
-            return name
-        except requests.exceptions.JSONDecodeError:
-            return None
+            return response.json()['results'][0]['name']['first']
+        except (requests.exceptions.JSONDecodeError, KeyError, IndexError):
+            pass
+    return random.choice(NAMES)
 
-def generateOrder():
-    customer = getCustomerName()
-    now = datetime.now()
-    order_date = now.date()
-    order_time = now.time()
-    orderID = uuid.uuid4().hex
-    seed = random.randint(0, 100)
-    
-    if 15 < seed < 40:
-        drinks = [generateDrink() for _ in range(0, random.randint(1, 3))]
+def _orderSize(rng: random.Random) -> int:
+    seed = rng.randint(0, 100)
     if seed < 15:
-        drinks = [generateDrink() for _ in range(0, random.randint(3, 10))]
-    else:
-        drinks = [generateDrink()]
-
-    order = Order(orderID = orderID,
-                    customer = customer,
-                    dateReceived = order_date,
-                    timeReceived = order_time,
+        return rng.randint(3, 10)
+    elif seed < 40:
+        return rng.randint(1, 3)
+    return 1
+
+def _orderID(rng: random.Random) -> str:
+    return uuid.UUID(int = rng.getrandbits(128)).hex
+
+def generateOrder(rng: random.Random = random) -> Order:
+    '''
+    Generates a random order for a customer from the local name pool.
+    Pass a seeded random.Random as rng for a reproducible order; only the timestamps will differ.
+    '''
+    now = datetime.now()
+    order = Order(orderID = _orderID(rng),
+                    customer = rng.choice(NAMES),
+                    dateReceived = now.date(),
+                    timeReceived = now.time(),
                     timeComplete = None,
-                    drinks = drinks)
-    return order
\ No newline at end of file
+                    drinks = [generateDrink(rng) for _ in range(_orderSize(rng))])
+    return order
+
+def generateOrders(n: int, seed: Optional[int] = None, validate: bool = True) -> Union[List[Order], List[dict]]:
+    '''
+    Generates n random orders in one call, for load testing and benchmarks.
+
+    Random draws are made for the whole batch at once, and with a seed the output is identical
+    between runs apart from the timestamps. With validate = False the orders are returned as plain
+    dicts in Order's JSON shape, which skips pydantic validation and is several times faster.
+    '''
+    rng = random.Random(seed)
+    now = datetime.now()
+    order_date = now.date().isoformat()
+    order_time = now.time().isoformat()
+
+    sizes = [_orderSize(rng) for _ in range(n)]
+    customers = rng.choices(NAMES, k = n)
+    drinks = iter(generateDrinks(sum(sizes), rng))
+
+    orders = [
+        {
+            'orderID': _orderID(rng),
+            'customer': customer,
+            'dateReceived': order_date,
+            'timeReceived': order_time,
+            'timeComplete': None,
+            'drinks': [next(drinks) for _ in range(size)]
+        }
+        for size, customer in zip(sizes, customers)
+    ]
+
+    if validate:
+        return [Order.model_validate(order) for order in orders]
+    return orders
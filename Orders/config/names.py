@@ -0,0 +1,11 @@
+NAMES = [
+    'Adam', 'Aisha', 'Alex', 'Amara', 'Amelia', 'Ana', 'Arjun', 'Ava', 'Ben', 'Bilal',
+    'Callum', 'Carlos', 'Charlotte', 'Chen', 'Chloe', 'Daniel', 'Dev', 'Elena', 'Eli', 'Emma',
+    'Ethan', 'Fatima', 'Finn', 'Freya', 'Gabriel', 'Grace', 'Hannah', 'Harry', 'Hiro', 'Ibrahim',
+    'Imogen', 'Isla', 'Jack', 'Jade', 'Jamal', 'James', 'Jeff', 'Jia', 'Joe', 'Kai',
+    'Kayleigh', 'Keisha', 'Leah', 'Leo', 'Liam', 'Lily', 'Lucas', 'Lucy', 'Maria', 'Mason',
+    'Maya', 'Mei', 'Mia', 'Mohammed', 'Nadia', 'Naomi', 'Nathan', 'Nia', 'Noah', 'Olivia',
+    'Omar', 'Oscar', 'Priya', 'Rafael', 'Rhys', 'Riya', 'Rosa', 'Ruby', 'Sam', 'Sara',
+    'Sofia', 'Sophie', 'Tariq', 'Theo', 'Tom', 'Uma', 'Victor', 'Wei', 'Will', 'Yara',
+    'Yusuf', 'Zara', 'Zoe', 'Zain'
+]
@@ -2,10 +2,20 @@ from fastapi import FastAPI, Form
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from Orders.app.generate_order import generateOrder
 from Manager.app.models import Order
-import httpx, json, logging
+from Manager.app.scripts.config import CONFIG
+from contextlib import asynccontextmanager
+import asyncio, httpx, json, logging
 
 logging.basicConfig(level = logging.DEBUG)
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Menu changes in config.json apply to the next generated order
+    watcher = asyncio.create_task(CONFIG.watch())
+    yield
+    watcher.cancel()
+
+app = FastAPI(lifespan = lifespan)
 
 @app.get('/', response_class = HTMLResponse)
 def home():
@@ -33,11 +43,14 @@ async def sendOrder(url: str = Form(...)):
     logging.info(f"Sending Order: {data}")
 
     async with httpx.AsyncClient() as client:
-        await client.post(
+        response = await client.post(
             url,
             headers = {"Content-Type": "application/json"}, 
             json = data
         )
+        if response.status_code in (429, 503):
+            # The Manager is shedding load, see Manager.app.scripts.services.admission
+            logging.warning(f"Order refused ({response.status_code}), retry after {response.headers.get('Retry-After')}s")
         return RedirectResponse(url = "/", status_code = 303)
 
 @app.get('/random_order', response_model = Order)
@@ -3,10 +3,10 @@ from tqdm import trange
 from fastapi.testclient import TestClient
 from datetime import date, time
 from typing import List
-import json, os
+import json, os, random
 
-from Orders.app.generate_drink import generateDrink
-from Orders.app.generate_order import generateOrder, getCustomerName
+from Orders.app.generate_drink import generateDrink, generateDrinks
+from Orders.app.generate_order import generateOrder, generateOrders, getCustomerName
 from Manager.app.models import Order, Drink
 from Orders.main import app
 
@@ -66,6 +66,20 @@ def test_random_drink_generation(capsys):
         assert isinstance(drink.shots, int)
         assert isinstance(drink.milk_volume, float)
     
+def test_seeded_drink_generation():
+    first = [generateDrink(random.Random(7)) for _ in range(20)]
+    second = [generateDrink(random.Random(7)) for _ in range(20)]
+    assert first == second
+    assert generateDrinks(50, random.Random(7)) == generateDrinks(50, random.Random(7))
+
+def test_generateDrink_does_not_mutate_menu():
+    menu = json.dumps(DRINKS)
+    rng = random.Random(0)
+    for _ in range(200):
+        generateDrink(rng)
+    generateDrinks(200, rng)
+    assert json.dumps(DRINKS) == menu
+
 def test_getCustomerName():
     name = getCustomerName()
     assert isinstance(name, str)
@@ -107,6 +121,26 @@ def test_generateOrder():
         assert all(option in OPTIONS for option in drink.options)
         assert isinstance(drink.shots, int)
 
+def test_seeded_order_generation():
+    first = generateOrder(random.Random(3))
+    second = generateOrder(random.Random(3))
+    assert first.orderID == second.orderID
+    assert first.customer == second.customer
+    assert [d.drink for d in first.drinks] == [d.drink for d in second.drinks]
+
+def test_generateOrders_batch():
+    orders = generateOrders(200, seed = 11)
+    assert len(orders) == 200
+    assert len(set(order.orderID for order in orders)) == 200
+    assert all(isinstance(order, Order) and order.customer for order in orders)
+    assert all(drink.orderID == order.orderID for order in orders for drink in order.drinks)
+
+    strip_times = lambda orders: [{k: v for k, v in o.items() if k != 'timeReceived'} for o in orders]
+    first = generateOrders(50, seed = 11, validate = False)
+    second = generateOrders(50, seed = 11, validate = False)
+    assert strip_times(first) == strip_times(second)
+    assert all(Order.model_validate(order) for order in first)
+
 def test_random_order_generation(capsys):
     with capsys.disabled():
         orders = [generateOrder() for _ in trange(0, 50)]
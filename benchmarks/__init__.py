@@ -0,0 +1,3 @@
+"""
+Offline load generation and benchmarks for the Manager app. Nothing here is imported by the apps themselves.
+"""
@@ -0,0 +1,64 @@
+'''
+Microbenchmark of Queue.addOrder, the planning hot path, with no database and no HTTP.
+
+A seeded order stream is validated up front, then every order is added to an in-memory Queue and timed
+on its own. The front item is completed (untimed) whenever the queue holds more than --queue-items items,
+so every addOrder plans against a queue of realistic length instead of one that grows all day.
+
+    python -m benchmarks.addorder --orders 5000 --queue-items 20 --seed 1
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.queueManager import Queue
+from benchmarks.loadgen import generateOrderStream
+from benchmarks.throughput import percentile
+
+from typing import List
+import argparse, asyncio, json, logging, time
+
+async def run(orders: int = 5000, queue_items: int = 20, seed: int = 1, repeat: int = 3) -> dict:
+    '''
+    Parameters:
+        - orders: int orders added per repeat
+        - queue_items: int queue length kept by completing the front item
+        - seed: int seed of the order stream
+        - repeat: int times the stream is replayed, the fastest repeat is reported
+    '''
+    payloads = [payload for _, payload in generateOrderStream(seed, hours = orders / 500, arrival_rate = 1000)][:orders]
+    best: List[float] = []
+    for _ in range(repeat):
+        queue = Queue()
+        batch = [Order.model_validate(payload) for payload in payloads]
+        samples: List[float] = []
+        for order in batch:
+            start = time.perf_counter()
+            await queue.addOrder(order, update_db = False)
+            samples.append(time.perf_counter() - start)
+            while len(queue.orders) > queue_items:
+                await queue.completeItem(0, update_db = False)
+        if not best or sum(samples) < sum(best):
+            best = samples
+
+    return {
+        'orders': len(best),
+        'queueItems': queue_items,
+        'drinks': sum(len(payload['drinks']) for payload in payloads),
+        'microseconds': {
+            'mean': round(sum(best) / len(best) * 1e6, 1),
+            'p50': round(percentile(best, 0.5) * 1e6, 1),
+            'p99': round(percentile(best, 0.99) * 1e6, 1)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type = int, default = 5000)
+    parser.add_argument('--queue-items', type = int, default = 20)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(json.dumps(asyncio.run(run(args.orders, args.queue_items, args.seed, args.repeat)), indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+'''
+Bytes per /newOrder frame and CPU to encode it, for queues of --items items, in each encoding:
+    doubleJSON  - each item dumped to a JSON string, then the list of strings dumped again, as frames were
+    json        - each item dumped once and spliced into the frame, the default
+    msgpack     - items as arrays with integer-coded categoricals, see Manager.app.scripts.services.frames
+
+The queue is filled from a seeded order stream, nothing is completed. Encode times are the best of --repeat
+runs and include encoding every item. msgpack clients are also sent the code tables once, reported as
+msgpackCodesBytes.
+
+    python -m benchmarks.frames --items 50 200 1000
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.services.frames import FrameEncoder, JSON, MSGPACK
+from benchmarks.loadgen import generateOrderStream
+
+from typing import Callable, List
+import argparse, asyncio, json, time
+
+async def fill(items: int, seed: int) -> Queue:
+    queue = Queue()
+    stream = generateOrderStream(seed, hours = 24, arrival_rate = 100 * items)
+    while len(queue.orders) < items:
+        _, payload = next(stream)
+        await queue.addOrder(Order.model_validate(payload), update_db = False)
+    return queue
+
+def best(encode: Callable[[], object], repeat: int) -> float:
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds
+
+def run(items: int, seed: int, repeat: int) -> dict:
+    queue = asyncio.run(fill(items, seed))
+    totals = {'totalOrders': queue.totalOrders, 'totalDrinks': queue.totalDrinks}
+    frames = FrameEncoder()
+
+    encoders = {
+        'doubleJSON': lambda: json.dumps({'orders': [item.model_dump_json() for item in queue.orders], **totals}),
+        'json': lambda: frames.frame(JSON, frames.items(queue.orders, {JSON})[JSON], totals),
+        'msgpack': lambda: frames.frame(MSGPACK, frames.items(queue.orders, {MSGPACK})[MSGPACK], totals)
+    }
+    results = {'items': len(queue.orders), 'drinks': queue.totalDrinks, 'bytes': {}, 'encodeMs': {}}
+    for name, encode in encoders.items():
+        frame = encode()
+        results['bytes'][name] = len(frame.encode() if isinstance(frame, str) else frame)
+        results['encodeMs'][name] = round(best(encode, repeat) * 1000, 3)
+    results['msgpackCodesBytes'] = len(frames.codesFrame({}))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type = int, nargs = '+', default = [50, 200, 1000])
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--repeat', type = int, default = 20)
+    args = parser.parse_args()
+
+    results: List[dict] = [run(items, args.seed, args.repeat) for items in args.items]
+    print(json.dumps(results, indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+'''
+Filtered counts and wait-time statistics over a day of completed drinks: walking Queue.orderHistory's
+pydantic Orders against scanning the DrinkLog's memory-mapped columns.
+
+A seeded order stream is completed into both an orderHistory list (the orders as the Queue keeps them) and
+a DrinkLog in a temporary directory, each drink a minute after its order plus 30 seconds per drink before it. Each query then reports the
+number of matching drinks, their mean, p50 and p95 wait and their count per milk, timed over --repeat runs.
+
+    python -m benchmarks.history --orders 20000
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.analytics.drinklog import DrinkLog, _quantile
+from benchmarks.loadgen import generateOrderStream
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import argparse, json, tempfile, time
+
+QUERIES: Dict[str, dict] = {
+    'all': {},
+    'oat': {'milk': 'Oat'},
+    'oatWetAtBar': {'milk': 'Oat', 'texture': 'Wet', 'station': 'Bar'}
+}
+STATIONS = ['Bar', 'Window']
+
+def build(orders: int, seed: int, directory: str) -> tuple:
+    history: List[Order] = []
+    log = DrinkLog(directory, date(2024, 5, 1))
+    stream = generateOrderStream(seed, hours = 12, arrival_rate = orders / 12)
+    for n, (_, payload) in zip(range(orders), stream):
+        order = Order.model_validate(payload)
+        received = datetime.combine(log.day, order.timeReceived)
+        for i, drink in enumerate(order.drinks):
+            completed = received + timedelta(seconds = 60 + 30 * i)
+            drink.timeComplete = completed.time()
+            log.append(received, completed, drink, STATIONS[n % 2])
+        history.append(order)
+    log.flush()
+    # The station is not part of an Order, keep it alongside for the scan
+    stations = {order.orderID: STATIONS[n % 2] for n, order in enumerate(history)}
+    return history, stations, log
+
+def scanHistory(history: List[Order], stations: Dict[str, str], day: date, filters: dict) -> dict:
+    'What a query costs walking orderHistory'
+    waits, by_milk = [], Counter()
+    drink_filters = {name: value for name, value in filters.items() if name != 'station'}
+    for order in history:
+        if filters.get('station', stations[order.orderID]) != stations[order.orderID]:
+            continue
+        for drink in order.drinks:
+            if drink.timeComplete is None or any(getattr(drink, name) != value for name, value in drink_filters.items()):
+                continue
+            received = datetime.combine(day, drink.timeReceived)
+            waits.append((datetime.combine(day, drink.timeComplete) - received).total_seconds())
+            by_milk[drink.milk] += 1
+    waits.sort()
+    return {
+        'drinks': len(waits),
+        'mean': sum(waits) / len(waits) if waits else None,
+        'p50': _quantile(waits, 0.5),
+        'p95': _quantile(waits, 0.95),
+        'drinksByMilk': dict(by_milk)
+    }
+
+def best(run: Callable[[], object], repeat: int) -> float:
+    seconds: Optional[float] = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type = int, default = 20000)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        history, stations, log = build(args.orders, args.seed, directory)
+        results = {'orders': len(history), 'drinks': log.rows, 'queries': {}}
+        for name, filters in QUERIES.items():
+            scanned = scanHistory(history, stations, log.day, filters)
+            assert scanned['drinks'] == log.count(**filters)
+            results['queries'][name] = {
+                'drinks': scanned['drinks'],
+                'orderHistorySeconds': round(best(lambda: scanHistory(history, stations, log.day, filters), args.repeat), 5),
+                'drinkLogSeconds': round(best(lambda: log.summary(**filters), args.repeat), 5)
+            }
+        log.close()
+    print(json.dumps(results, indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+'''
+Seeded, offline order streams for benchmarking.
+
+Orders come from Orders.app.generate_order.generateOrders so the menu, option mix and order sizes match
+the Orders service, but nothing is fetched over the network and the same seed always produces the same stream.
+'''
+from Orders.app.generate_order import generateOrders
+
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Tuple
+import random
+
+def generateOrderStream(seed: int,
+                        hours: float = 12,
+                        arrival_rate: float = 60,
+                        opening: time = time(7, 0)) -> Iterator[Tuple[float, dict]]:
+    '''
+    Yields (seconds since opening, order JSON) for a Poisson arrival process.
+
+    Parameters:
+        - seed: int seed for every random draw in the stream
+        - hours: float length of the simulated day
+        - arrival_rate: float mean orders per hour
+        - opening: time timeReceived of the first instant of the day
+    '''
+    rng = random.Random(seed)
+    arrivals: List[float] = []
+    elapsed = rng.expovariate(arrival_rate / 3600)
+    while elapsed <= hours * 3600:
+        arrivals.append(elapsed)
+        elapsed += rng.expovariate(arrival_rate / 3600)
+
+    opened = datetime.combine(date.today(), opening)
+    for elapsed, order in zip(arrivals, generateOrders(len(arrivals), seed = seed, validate = False)):
+        received = opened + timedelta(seconds = elapsed)
+        order['dateReceived'] = received.date().isoformat()
+        order['timeReceived'] = received.time().isoformat()
+        yield elapsed, order
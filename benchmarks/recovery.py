@@ -0,0 +1,85 @@
+'''
+Recovery time of a Queue after a restart, against the length of its history.
+
+For each --events length, a seeded order stream is run through a QueueActor backed by a SQLite database and
+a journal, completing the front item whenever the queue holds more than --queue-items items, until the
+journal has that many events. The queue is then recovered three ways, each timed on its own:
+    database  - Queue._load_from_db, every order ever received re-planned through addOrder
+    replay    - the journal with no snapshot since it started, every event replayed
+    snapshot  - the journal with a snapshot every --snapshot-every events, only the tail replayed
+
+    python -m benchmarks.recovery --events 1000 4000 16000
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.queueManager import Queue
+from Manager.app.scripts.queueManager.actor import QueueActor
+from Manager.app.scripts.queueManager.journal import Journal
+from benchmarks.loadgen import generateOrderStream
+
+from typing import List
+import argparse, asyncio, json, logging, os, tempfile, time
+
+async def build(directory: str, events: int, snapshot_every: int, queue_items: int, seed: int) -> Journal:
+    '''Runs orders through an actor until its journal holds events events, returns the closed journal'''
+    URI = "sqlite+aiosqlite:///" + os.path.join(directory, "database.db")
+    queue = await Queue.create(URI)
+    journal = Journal(os.path.join(directory, "database.journal"), snapshot_every, fsync = False)
+    await journal.snapshot(queue)
+    actor = QueueActor(queue, journal = journal)
+    actor.start()
+    try:
+        stream = generateOrderStream(seed, hours = events / 500, arrival_rate = 1000)
+        while journal.seq < events:
+            _, payload = next(stream)
+            await actor.addOrder(Order.model_validate(payload))
+            while len(queue.orders) > queue_items and journal.seq < events:
+                await actor.complete(item_index = 0)
+    finally:
+        await actor.stop()
+        journal.close()
+        await queue.connection.close()
+    return journal
+
+async def timed(recover) -> float:
+    start = time.perf_counter()
+    await recover()
+    return time.perf_counter() - start
+
+async def run(events: int, snapshot_every: int = 1000, queue_items: int = 20, seed: int = 1) -> dict:
+    with tempfile.TemporaryDirectory() as full, tempfile.TemporaryDirectory() as snapshotted:
+        replay_journal = await build(full, events, 2 * events, queue_items, seed)
+        snapshot_journal = await build(snapshotted, events, snapshot_every, queue_items, seed)
+
+        from_database = await Queue.create("sqlite+aiosqlite:///" + os.path.join(full, "database.db"))
+        seconds = {'database': await timed(from_database._load_from_db)}
+        await from_database.connection.close()
+        seconds['replay'] = await timed(lambda: Journal(replay_journal.directory).recover(Queue()))
+        seconds['snapshot'] = await timed(lambda: Journal(snapshot_journal.directory).recover(Queue()))
+
+        return {
+            'events': events,
+            'queueItems': len(from_database.orders),
+            'bytes': {
+                'replayLog': os.path.getsize(replay_journal.logPath),
+                'snapshot': os.path.getsize(snapshot_journal.snapshotPath),
+                'snapshotTail': os.path.getsize(snapshot_journal.logPath)
+            },
+            'seconds': {name: round(value, 4) for name, value in seconds.items()}
+        }
+
+async def runAll(lengths: List[int], snapshot_every: int, queue_items: int, seed: int) -> List[dict]:
+    return [await run(events, snapshot_every, queue_items, seed) for events in lengths]
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type = int, nargs = '+', default = [1000, 4000, 16000])
+    parser.add_argument('--snapshot-every', type = int, default = 1000)
+    parser.add_argument('--queue-items', type = int, default = 20)
+    parser.add_argument('--seed', type = int, default = 1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(asyncio.run(runAll(args.events, args.snapshot_every, args.queue_items, args.seed)), indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+'''
+Render time of index.html and history.html with --items cards, see Manager.app.scripts.services.rendering:
+    uncached    - every card rendered on every load, as the pages were before the fragment cache
+    cached      - the load after the front item is completed, so every card has moved up a place
+    firstChunk  - time to the first chunk of a cached page, what the browser waits on before it can paint
+
+The cards are seeded orders from Orders.app.generate_order, put on the pages as they are rather than planned into a
+queue, planning thousands of orders takes far longer than rendering them. The history is the same orders
+with every drink completed. Times are the best of --repeat loads, in milliseconds.
+
+    python -m benchmarks.render --items 500 5000
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.services.rendering import Pages
+from Orders.app.generate_order import generateOrders
+
+from datetime import datetime
+from typing import List
+import argparse, asyncio, json, os, time
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'Manager', 'app', 'templates')
+
+class Totals:
+    totalOrders = 0
+
+def indexContext(items: List[Order]) -> dict:
+    return {'queue': Totals, 'items': list(enumerate(items)), 'station': None, 'plan': None, 'colors': {}, 'base': ''}
+
+def historyContext(items: List[Order]) -> dict:
+    return {'history': items, 'totalOrders': len(items), 'totalDrinks': 0, 'colors': {}, 'base': ''}
+
+async def load(pages: Pages, name: str, context: dict) -> tuple:
+    'Seconds to the first chunk and to the whole page'
+    start = time.perf_counter()
+    first = None
+    async for _ in pages.stream(name, context):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+async def measure(name: str, items: List[Order], context, repeat: int) -> dict:
+    uncached = Pages(TEMPLATE_DIR, cache_size = 0)
+    cached = Pages(TEMPLATE_DIR)
+    await cached.render(name, context(items))
+    times = {'uncached': [], 'cached': [], 'firstChunk': []}
+    for i in range(1, repeat + 1):
+        times['uncached'].append((await load(uncached, name, context(items[i:])))[1])
+        first, total = await load(cached, name, context(items[i:]))
+        times['cached'].append(total)
+        times['firstChunk'].append(first)
+    return {key: round(min(values) * 1000, 2) for key, values in times.items()}
+
+def orders(count: int, seed: int) -> List[Order]:
+    return [Order.model_validate(order) for order in generateOrders(count, seed = seed, validate = False)]
+
+async def run(items: int, seed: int, repeat: int) -> dict:
+    queued = orders(items + repeat, seed)
+    completed = orders(items + repeat, seed + 1)
+    now = datetime.now().time()
+    for order in completed:
+        for drink in order.drinks:
+            drink.timeComplete = now
+    return {
+        'items': items,
+        'drinks': sum(len(order.drinks) for order in queued[:items]),
+        'index': await measure('index.html', queued, indexContext, repeat),
+        'history': await measure('history.html', completed, historyContext, repeat)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type = int, nargs = '+', default = [500, 5000])
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    results: List[dict] = [asyncio.run(run(items, args.seed, args.repeat)) for items in args.items]
+    print(json.dumps(results, indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+'''
+Memory of a long-running Queue, a day at a time, with orderHistory bounded and unbounded.
+
+Each simulated day opens at 07:00 and runs a seeded 12 hour order stream through a Queue on a simulated
+clock, completing the front item whenever the queue holds more than --queue-items items. At the end of each
+day the Python heap still allocated (tracemalloc, after a collection) and the orders kept in orderHistory are
+reported. Nothing is written to a database, evicted orders would be read back from it.
+
+    python -m benchmarks.soak --days 7 --orders-per-day 2000
+'''
+from Manager.app.models import Order
+from Manager.app.scripts.config import CONFIG, HistoryConfig
+from Manager.app.scripts.queueManager import Queue
+from benchmarks.loadgen import generateOrderStream
+
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+import argparse, asyncio, gc, json, logging, tracemalloc
+
+async def soak(days: int, orders_per_day: int, queue_items: int, seed: int, history: HistoryConfig) -> List[dict]:
+    queue = Queue(CONFIG.get().model_copy(update = {'HISTORY': history}))
+    clock = datetime.combine(date(2024, 5, 1), datetime.min.time())
+    queue.now = lambda: clock
+    report = []
+
+    tracemalloc.start()
+    try:
+        for day in range(days):
+            opened = datetime.combine(date(2024, 5, 1) + timedelta(days = day), datetime.min.time())
+            for elapsed, payload in generateOrderStream(seed + day, hours = 12, arrival_rate = orders_per_day / 12):
+                clock = opened + timedelta(hours = 7, seconds = elapsed)
+                payload['dateReceived'], payload['timeReceived'] = clock.date(), clock.time()
+                await queue.addOrder(Order.model_validate(payload), update_db = False)
+                while len(queue.orders) > queue_items:
+                    await queue.completeItem(0, update_db = False)
+            gc.collect()
+            report.append({
+                'day': day + 1,
+                'ordersReceived': queue.orderHistory.evicted + len(queue.orderHistory),
+                'historyOrders': len(queue.orderHistory),
+                'heapMB': round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2)
+            })
+    finally:
+        tracemalloc.stop()
+    return report
+
+async def run(days: int, orders_per_day: int, queue_items: int, seed: int, max_orders: int, max_age: Optional[float]) -> dict:
+    return {
+        'bounded': await soak(days, orders_per_day, queue_items, seed, HistoryConfig(max_orders = max_orders, max_age_seconds = max_age)),
+        'unbounded': await soak(days, orders_per_day, queue_items, seed, HistoryConfig(max_orders = 2 ** 62, max_age_seconds = None))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type = int, default = 7)
+    parser.add_argument('--orders-per-day', type = int, default = 2000)
+    parser.add_argument('--queue-items', type = int, default = 20)
+    parser.add_argument('--max-orders', type = int, default = CONFIG.get().HISTORY.max_orders)
+    parser.add_argument('--max-age-seconds', type = float, default = CONFIG.get().HISTORY.max_age_seconds)
+    parser.add_argument('--seed', type = int, default = 1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(json.dumps(asyncio.run(run(
+        args.days, args.orders_per_day, args.queue_items, args.seed, args.max_orders, args.max_age_seconds
+    )), indent = 4))
+
+if __name__ == "__main__":
+    main()
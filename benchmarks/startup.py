@@ -0,0 +1,74 @@
+'''
+Startup time of the production launcher, from process start to the first /receive served.
+
+Each run starts `python -m Manager.serve` on a free port with a fresh SQLite database and posts one seeded
+order to /receive every few milliseconds until one is accepted. The time from spawning the process to that
+first successful response covers interpreter start, imports, the lifespan (database and Queue) and the
+first planned order.
+
+    python -m benchmarks.startup --runs 5
+'''
+from benchmarks.loadgen import generateOrderStream
+
+from statistics import median
+from typing import List
+import argparse, json, os, socket, subprocess, sys, tempfile, time
+import httpx
+
+POLL_SECONDS = 0.005
+
+def freePort() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def startOnce(order: dict, workers: int = 1, timeout: float = 60) -> float:
+    'Seconds from spawning the server to its first successful /receive'
+    port = freePort()
+    with tempfile.TemporaryDirectory() as directory:
+        database = "sqlite+aiosqlite:///" + os.path.join(directory, "database.db")
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'Manager.serve', '--port', str(port), '--database', database, '--log-level', 'warning',
+             '--workers', str(workers)],
+            stdout = subprocess.DEVNULL,
+            stderr = subprocess.DEVNULL
+        )
+        try:
+            with httpx.Client() as client:
+                while time.perf_counter() - start < timeout:
+                    try:
+                        response = client.post(f'http://127.0.0.1:{port}/receive', json = order)
+                        if response.status_code == 200:
+                            return time.perf_counter() - start
+                    except httpx.TransportError:
+                        pass
+                    if process.poll() is not None:
+                        raise RuntimeError(f'Manager.serve exited with {process.returncode}')
+                    time.sleep(POLL_SECONDS)
+            raise TimeoutError(f'No /receive served within {timeout}s')
+        finally:
+            process.terminate()
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type = int, default = 5)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--workers', type = int, default = 1, help = 'passed to Manager.serve')
+    args = parser.parse_args()
+
+    _, order = next(generateOrderStream(args.seed))
+    seconds: List[float] = [startOnce(order, args.workers) for _ in range(args.runs)]
+    print(json.dumps({
+        'runs': args.runs,
+        'workers': args.workers,
+        'secondsToFirstReceive': {
+            'min': round(min(seconds), 3),
+            'median': round(median(seconds), 3),
+            'max': round(max(seconds), 3)
+        }
+    }, indent = 4))
+
+if __name__ == "__main__":
+    main()
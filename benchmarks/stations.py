@@ -0,0 +1,176 @@
+'''
+Simulated day comparing the single-queue layout with the multi-station scheduler.
+
+The real Queue engine plans a seeded order stream; stations take work as the StationScheduler assigns it and
+hold it for the scheduler's own preparation time estimate. With one station this is today's layout, one
+linear list worked by one machine; with every configured station the scheduler spreads the same queue.
+
+Each station also keeps its grinder set to the last hopper (regular or decaf) it used. With the shot plan, items
+are assigned knowing every station's hopper and shots are pulled in the order of the scheduler's plan; without
+it, assignment ignores the grinder and shots are pulled drink by drink in queue order. Every hopper change
+costs PREP_SECONDS['switch'] either way.
+
+Preparation takes the scheduler's estimate, optionally scaled by seeded log-normal noise (--prep-noise, the
+coefficient of variation), so the estimate the scheduler plans with isn't exactly how long the work takes.
+
+    python -m benchmarks.stations --seed 1 --hours 12 --arrival-rate 120
+'''
+from Manager.app.models import Order, Station
+from Manager.app.scripts.queueManager import Queue, Batch
+from Manager.app.scripts.config import CONFIG
+from Manager.app.scripts.queueManager.scheduler import StationScheduler, grinder, countSwitches, hopperOrder
+from benchmarks.loadgen import generateOrderStream
+from benchmarks.throughput import percentile
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+import argparse, asyncio, json, logging, math, random
+
+async def simulate(stations: List[Station],
+                   prep_seconds: Optional[dict] = None,
+                   seed: int = 1,
+                   hours: float = 12,
+                   arrival_rate: float = 120,
+                   plan_shots: bool = True,
+                   prep_noise: float = 0.0,
+                   search_depth: Optional[int] = None,
+                   batch_volume: Optional[float] = None) -> dict:
+    '''
+    Parameters:
+        - stations: stations to simulate, the first one alone is today's single queue layout
+        - prep_seconds: PREP_SECONDS for the scheduler, default config.json's
+        - seed: int seed for arrivals and preparation time noise
+        - hours: float opening hours, the simulation runs until the queue is cleared
+        - arrival_rate: float mean orders per hour
+        - plan_shots: bool grinder-aware assignment and shots pulled in plan order
+        - prep_noise: float coefficient of variation of preparation times around the estimate
+        - search_depth, batch_volume: override the Queue's SEARCH_DEPTH and BATCH_VOLUME
+    '''
+    queue = Queue()
+    if search_depth is not None:
+        queue.searchDepth = search_depth
+    if batch_volume is not None:
+        queue.batchVolume = batch_volume
+    scheduler = StationScheduler(stations, prep_seconds)
+    # Log-normal with mean 1, so noise doesn't change the average preparation time
+    rng = random.Random(seed)
+    sigma = math.sqrt(math.log(1 + prep_noise ** 2))
+    arrivals = list(generateOrderStream(seed, hours, arrival_rate))
+    received_at: Dict[str, float] = {}
+
+    # station name -> (finish time, [(drink identifier, orderID)]) for the item it is making
+    working: Dict[str, Optional[Tuple[float, List[Tuple[str, str]]]]] = {s.name: None for s in stations}
+    in_progress: set = set()
+    # station name -> hopper its grinder is set to
+    grinders: Dict[str, Optional[str]] = {s.name: None for s in stations}
+    switches = 0
+    jugs = 0
+    jug_volume = 0.0
+    waits: List[float] = []
+    clock = 0.0
+    made = 0
+    opened = datetime.combine(date.today(), time(7, 0))
+    queue.now = lambda: opened + timedelta(seconds = clock)
+    next_arrival = 0
+
+    while next_arrival < len(arrivals) or queue.orders:
+        idle = [s for s in stations if working[s.name] is None]
+        if idle:
+            pending = [
+                item for item in queue.orders
+                if not any(d.identifier in in_progress for d in item.drinks)
+                and not (isinstance(item, Batch) and item.heldUntil is not None and item.heldUntil > queue.now())
+            ]
+            available_in = {name: job[0] - clock for name, job in working.items() if job}
+            assignment = scheduler.assign(pending, available_in, grinders if plan_shots else None)
+            for station in idle:
+                item = next((item for item, name in zip(pending, assignment) if name == station.name), None)
+                if item is None:
+                    continue
+                drinks = [(d.identifier, d.orderID) for d in item.drinks]
+                in_progress.update(identifier for identifier, _ in drinks)
+
+                current = grinders[station.name]
+                seconds = scheduler.estimate(item, station, current)
+                if plan_shots:
+                    hoppers = hopperOrder(item.drinks, current)
+                else:
+                    hoppers = [grinder(d) for d in item.drinks if grinder(d)]
+                    seconds += countSwitches(hoppers, current) * scheduler.prep_seconds['switch'] - \
+                        scheduler.switchSeconds(item, current)
+                switches += countSwitches(hoppers, current)
+                grinders[station.name] = hoppers[-1] if hoppers else current
+                if prep_noise:
+                    seconds *= rng.lognormvariate(-sigma ** 2 / 2, sigma)
+                working[station.name] = (clock + seconds, drinks)
+
+                for jug in scheduler.plan([item], station).jugs:
+                    jugs += 1
+                    jug_volume += jug.volume / station.jug_size
+
+        finishes = [(job[0], name) for name, job in working.items() if job]
+        arrival_time = arrivals[next_arrival][0] if next_arrival < len(arrivals) else float('inf')
+        next_release = queue.nextRelease()
+        release_time = (next_release - opened).total_seconds() if next_release else float('inf')
+        if release_time < arrival_time and release_time > clock and (not finishes or release_time < min(finishes)[0]):
+            # Held batches become ready to make
+            clock = release_time
+            queue.releaseHeld()
+        elif finishes and min(finishes)[0] <= arrival_time:
+            clock, name = min(finishes)
+            _, drinks = working[name]
+            working[name] = None
+            identifiers = [identifier for identifier, _ in drinks]
+            in_progress.difference_update(identifiers)
+            await queue.completeDrinks(identifiers, update_db = False, station = name)
+            waits.extend(clock - received_at[orderID] for _, orderID in drinks)
+            made += len(drinks)
+        elif next_arrival < len(arrivals):
+            clock, payload = arrivals[next_arrival]
+            next_arrival += 1
+            order = Order.model_validate(payload)
+            received_at[order.orderID] = clock
+            await queue.addOrder(order, update_db = False)
+        else:
+            break
+
+    return {
+        'stations': [s.name for s in stations],
+        'orders': len(arrivals),
+        'drinks': made,
+        'hoursToClear': round(clock / 3600, 2),
+        'drinksPerHour': round(made * 3600 / clock, 1) if clock else None,
+        'waitMinutes': {
+            'p50': round(percentile(waits, 0.5) / 60, 1) if waits else None,
+            'p99': round(percentile(waits, 0.99) / 60, 1) if waits else None
+        },
+        'drinksByStation': dict(queue.analytics.drinksByStation),
+        'grinderSwitches': switches,
+        'jugs': jugs,
+        'jugFill': round(jug_volume / jugs, 3) if jugs else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--hours', type = float, default = 12)
+    parser.add_argument('--arrival-rate', type = float, default = 120, help = 'orders per hour')
+    parser.add_argument('--prep-noise', type = float, default = 0.0, help = 'coefficient of variation of preparation times')
+    args = parser.parse_args()
+
+    config = CONFIG.get()
+    stations = config.STATIONS
+    prep_seconds = config.PREP_SECONDS
+
+    logging.disable(logging.WARNING)
+    results = {}
+    for label, layout, plan_shots in (('singleQueue', stations[:1], False),
+                                      ('scheduled', stations, False),
+                                      ('scheduledShotPlan', stations, True)):
+        results[label] = asyncio.run(simulate(
+            layout, prep_seconds, args.seed, args.hours, args.arrival_rate, plan_shots, args.prep_noise
+        ))
+    print(json.dumps(results, indent = 4))
+
+if __name__ == "__main__":
+    main()
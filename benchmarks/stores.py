@@ -0,0 +1,61 @@
+'''
+Memory held by an idle store, the cost of configuring one more shop on a Manager.
+
+Opens --stores stores through Stores and openQueue, each with its own SQLite file in a temporary directory,
+its own Queue, lookupTable and QueueActor task, and no orders. Python allocations are measured with
+tracemalloc and the process's resident set from /proc, each over its own batch of --stores stores, and divided
+by the number of stores. The first store is opened before measuring, so one-off costs (SQLAlchemy metadata, the catalog) aren't counted.
+
+    python -m benchmarks.stores --stores 200
+'''
+from Manager.app.scripts.queueManager.stores import DEFAULT_STORE, Stores, openQueue
+
+from typing import List
+import argparse, asyncio, gc, json, os, resource, tempfile, tracemalloc
+
+def residentBytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+async def openAll(stores: Stores, storeIDs: List[str]) -> None:
+    for storeID in storeIDs:
+        await stores.get(storeID)
+    gc.collect()
+
+async def run(count: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        URI = "sqlite+aiosqlite:///" + os.path.join(directory, "database.db")
+        resident = [f'resident-{i}' for i in range(count)]
+        traced = [f'traced-{i}' for i in range(count)]
+        stores = Stores(lambda store: openQueue(store, URI), resident + traced)
+        await stores.get(DEFAULT_STORE)
+        gc.collect()
+
+        # Resident set first, tracemalloc's own bookkeeping would inflate it
+        before = residentBytes()
+        await openAll(stores, resident)
+        resident_bytes = residentBytes() - before
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        await openAll(stores, traced)
+        python_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        await stores.close()
+    return {
+        'stores': count,
+        'bytesPerStore': {
+            'python': round(python_bytes / count),
+            'resident': round(resident_bytes / count)
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stores', type = int, default = 200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.stores)), indent = 4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+'''
+Parameter sweep of the Queue's SEARCH_DEPTH and BATCH_VOLUME over the station simulation.
+
+Every combination of search depth, batch volume and seed is one run of benchmarks.stations.simulate with
+every configured station, noisy preparation times and the shot plan. Runs are spread over a
+ProcessPoolExecutor, one simulated day per task, and the results are averaged over seeds into one row
+per configuration.
+
+    python -m benchmarks.sweep --search-depth 1 2 4 8 --batch-volume 3 4 5 6 --seeds 1 2 3
+'''
+from Manager.app.scripts.config import CONFIG
+from benchmarks.stations import simulate
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from statistics import mean
+from typing import Dict, List, Tuple
+import argparse, asyncio, json, logging, os
+
+COLUMNS = [
+    ('searchDepth', 'search depth'),
+    ('batchVolume', 'batch volume'),
+    ('drinksPerHour', 'drinks/h'),
+    ('p50', 'wait p50 min'),
+    ('p99', 'wait p99 min'),
+    ('jugs', 'jugs'),
+    ('jugFill', 'jug fill'),
+]
+
+def runConfig(task: Tuple[int, float, int, float, float, float]) -> dict:
+    'Runs one simulated day, in a worker process'
+    search_depth, batch_volume, seed, hours, arrival_rate, prep_noise = task
+    logging.disable(logging.WARNING)
+    config = CONFIG.get()
+
+    result = asyncio.run(simulate(
+        config.STATIONS, config.PREP_SECONDS, seed, hours, arrival_rate,
+        prep_noise = prep_noise,
+        search_depth = search_depth,
+        batch_volume = batch_volume
+    ))
+    return {
+        'searchDepth': search_depth,
+        'batchVolume': batch_volume,
+        'seed': seed,
+        'drinksPerHour': result['drinksPerHour'],
+        'p50': result['waitMinutes']['p50'],
+        'p99': result['waitMinutes']['p99'],
+        'jugs': result['jugs'],
+        'jugFill': result['jugFill'],
+    }
+
+def sweep(search_depths: List[int],
+          batch_volumes: List[float],
+          seeds: List[int],
+          hours: float = 12,
+          arrival_rate: float = 100,
+          prep_noise: float = 0.3,
+          workers: int = None) -> List[dict]:
+    '''
+    Returns one row per (search depth, batch volume), averaged over seeds, in sweep order.
+    '''
+    tasks = [
+        (depth, volume, seed, hours, arrival_rate, prep_noise)
+        for depth, volume, seed in product(search_depths, batch_volumes, seeds)
+    ]
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        runs = list(executor.map(runConfig, tasks))
+
+    grouped: Dict[tuple, List[dict]] = {}
+    for run in runs:
+        grouped.setdefault((run['searchDepth'], run['batchVolume']), []).append(run)
+
+    return [
+        {
+            'searchDepth': depth,
+            'batchVolume': volume,
+            **{
+                key: round(mean(run[key] for run in group), 3 if key == 'jugFill' else 1)
+                for key in ('drinksPerHour', 'p50', 'p99', 'jugs', 'jugFill')
+            }
+        }
+        for (depth, volume), group in grouped.items()
+    ]
+
+def formatTable(rows: List[dict]) -> str:
+    'Markdown table of sweep rows'
+    lines = [
+        '| ' + ' | '.join(title for _, title in COLUMNS) + ' |',
+        '|' + '|'.join('---:' for _ in COLUMNS) + '|',
+    ]
+    for row in rows:
+        lines.append('| ' + ' | '.join(str(row[key]) for key, _ in COLUMNS) + ' |')
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--search-depth', type = int, nargs = '+', default = [1, 2, 4, 8])
+    parser.add_argument('--batch-volume', type = float, nargs = '+', default = [3, 4, 5, 6])
+    parser.add_argument('--seeds', type = int, nargs = '+', default = [1, 2, 3])
+    parser.add_argument('--hours', type = float, default = 12)
+    parser.add_argument('--arrival-rate', type = float, default = 100, help = 'orders per hour')
+    parser.add_argument('--prep-noise', type = float, default = 0.3, help = 'coefficient of variation of preparation times')
+    parser.add_argument('--workers', type = int, default = os.cpu_count())
+    parser.add_argument('--json', action = 'store_true', help = 'print rows as JSON instead of a table')
+    args = parser.parse_args()
+
+    rows = sweep(
+        args.search_depth, args.batch_volume, args.seeds,
+        hours = args.hours,
+        arrival_rate = args.arrival_rate,
+        prep_noise = args.prep_noise,
+        workers = args.workers
+    )
+    print(json.dumps(rows, indent = 4) if args.json else formatTable(rows))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+'''
+End-to-end throughput benchmark for the Manager app.
+
+Replays a seeded order stream through /receive and has a simulated barista complete the front item
+through /complete, driving the FastAPI app in-process over ASGI. The day runs on a simulated clock,
+so a 12 hour day takes as long as the app needs to serve its requests. The Queue reads the same clock, so
+aging, the max wait SLA and the hold window behave as they would on the day. The barista works on the first
+item that isn't held, and customer waits are reported in minutes alongside how full the milk jugs were.
+
+    python -m benchmarks.throughput --seed 1 --hours 12 --arrival-rate 60 --completion-rate 150
+'''
+from Manager.app.scripts.queueManager import Queue, Batch
+from benchmarks.loadgen import generateOrderStream
+
+from datetime import date, datetime, time as clock_time, timedelta
+from typing import Dict, List, Optional
+import argparse, asyncio, json, logging, math, resource, time, tracemalloc
+import httpx
+
+JUG_SIZE = 5
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def currentMemoryMB(traced: bool) -> float:
+    if traced:
+        return tracemalloc.get_traced_memory()[0] / 2**20
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+async def runDay(seed: int = 1,
+                 hours: float = 12,
+                 arrival_rate: float = 60,
+                 completion_rate: float = 150,
+                 database_uri: str = "sqlite+aiosqlite:///:memory:",
+                 trace_memory: bool = False,
+                 aging_seconds: Optional[float] = -1,
+                 max_wait_seconds: Optional[float] = -1,
+                 hold_seconds: Optional[float] = -1,
+                 max_hold_seconds: Optional[float] = -1) -> dict:
+    '''
+    Parameters:
+        - seed: int seed for the order stream
+        - hours: float simulated opening hours
+        - arrival_rate: float mean orders per hour
+        - completion_rate: float drinks per hour the simulated barista can make
+        - database_uri: str database the Queue persists to
+        - trace_memory: bool report tracemalloc heap size instead of peak RSS; slows every request down
+        - aging_seconds, max_wait_seconds: Queue priority settings, None disables, -1 keeps config.json's
+        - hold_seconds, max_hold_seconds: Queue hold window settings, None disables, -1 keeps config.json's
+    '''
+    from Manager import main
+
+    await main.startQueue(database_uri)
+    queue: Queue = main.queue
+    # The day's orders arrive far faster than real time, admission's rate limits would shed them
+    main.CONFIG.get().ADMISSION.enabled = False
+    seconds_per_drink = 3600 / completion_rate
+    if aging_seconds != -1:
+        queue.agingSeconds = aging_seconds
+    if max_wait_seconds != -1:
+        queue.maxWaitSeconds = max_wait_seconds
+    if hold_seconds != -1:
+        queue.holdSeconds = hold_seconds
+    if max_hold_seconds != -1:
+        queue.maxHoldSeconds = max_hold_seconds or 0
+
+    receive_latency: List[float] = []
+    complete_latency: List[float] = []
+    received_at: Dict[str, float] = {}
+    waits: List[float] = []
+    jugs = 0
+    jug_volume = 0.0
+    memory: List[float] = []
+
+    if trace_memory:
+        tracemalloc.start()
+    memory.append(currentMemoryMB(trace_memory))
+
+    stream = generateOrderStream(seed, hours, arrival_rate)
+    next_arrival = next(stream, None)
+    working = None # (finish time, drinks) of the item the barista is making
+    clock = 0.0
+    next_sample = 3600.0
+    opened = datetime.combine(date.today(), clock_time(7, 0))
+    queue.now = lambda: opened + timedelta(seconds = clock)
+    held = lambda item: isinstance(item, Batch) and item.heldUntil is not None and item.heldUntil > queue.now()
+    orders = drinks = 0
+
+    transport = httpx.ASGITransport(app = main.app)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport = transport, base_url = "http://benchmark") as client:
+        while True:
+            release_time = None
+            if working is None and queue.orders:
+                ready = next((item for item in queue.orders if not held(item)), None)
+                if ready:
+                    working = (clock + len(ready.drinks) * seconds_per_drink, list(ready.drinks))
+                else:
+                    release_time = (queue.nextRelease() - opened).total_seconds()
+
+            arrival_time = next_arrival[0] if next_arrival else float('inf')
+            if working is not None and working[0] <= arrival_time:
+                clock, made = working
+                working = None
+                waits.extend(clock - received_at[d.orderID] for d in made)
+                volumes: Dict[str, float] = {}
+                for d in made:
+                    if d.milk_volume:
+                        volumes[f"{d.milk}_{d.texture}"] = volumes.get(f"{d.milk}_{d.texture}", 0) + d.milk_volume
+                jugs += sum(math.ceil(volume / JUG_SIZE) for volume in volumes.values())
+                jug_volume += sum(volumes.values())
+                t0 = time.perf_counter()
+                response = await client.post("/complete", data = {
+                    'selectedDrinkIDs': json.dumps([d.identifier for d in made])
+                })
+                complete_latency.append(time.perf_counter() - t0)
+                response.raise_for_status()
+            elif release_time is not None and release_time <= arrival_time:
+                clock = release_time
+            elif next_arrival:
+                clock, payload = next_arrival
+                t0 = time.perf_counter()
+                response = await client.post("/receive", json = payload)
+                receive_latency.append(time.perf_counter() - t0)
+                response.raise_for_status()
+                received_at[payload['orderID']] = clock
+                orders += 1
+                drinks += len(payload['drinks'])
+                next_arrival = next(stream, None)
+            else:
+                break
+
+            while clock >= next_sample:
+                memory.append(currentMemoryMB(trace_memory))
+                next_sample += 3600
+    elapsed = time.perf_counter() - started
+
+    if trace_memory:
+        tracemalloc.stop()
+    await main.stopQueue()
+
+    ms = lambda samples, q: round(percentile(samples, q) * 1000, 3) if samples else None
+    minutes = lambda samples, q: round(percentile(samples, q) / 60, 1) if samples else None
+    return {
+        'seed': seed,
+        'simulatedHours': round(clock / 3600, 2),
+        'orders': orders,
+        'drinks': drinks,
+        'wallSeconds': round(elapsed, 3),
+        'ordersPerSecond': round(orders / elapsed, 1) if elapsed else None,
+        'receiveMs': {'p50': ms(receive_latency, 0.5), 'p99': ms(receive_latency, 0.99)},
+        'completeMs': {'p50': ms(complete_latency, 0.5), 'p99': ms(complete_latency, 0.99)},
+        'waitMinutes': {'p50': minutes(waits, 0.5), 'p99': minutes(waits, 0.99)},
+        'jugs': jugs,
+        'jugFill': round(jug_volume / (jugs * JUG_SIZE), 3) if jugs else None,
+        'memoryMB': [round(m, 2) for m in memory],
+        'memoryGrowthMB': round(memory[-1] - memory[0], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type = int, default = 1)
+    parser.add_argument('--hours', type = float, default = 12)
+    parser.add_argument('--arrival-rate', type = float, default = 60, help = 'orders per hour')
+    parser.add_argument('--completion-rate', type = float, default = 150, help = 'drinks per hour')
+    parser.add_argument('--database', default = "sqlite+aiosqlite:///:memory:")
+    parser.add_argument('--trace-memory', action = 'store_true', help = 'measure heap with tracemalloc instead of peak RSS')
+    parser.add_argument('--aging', type = float, default = -1, help = 'aging seconds, 0 disables, default config.json')
+    parser.add_argument('--max-wait', type = float, default = -1, help = 'max wait SLA seconds, 0 disables, default config.json')
+    parser.add_argument('--hold', type = float, default = -1, help = 'hold window seconds, 0 disables, default config.json')
+    parser.add_argument('--max-hold', type = float, default = -1, help = 'max hold delay seconds, default config.json')
+    args = parser.parse_args()
+
+    # SQLAlchemy echo and the Queue's DEBUG logging would dominate the measurement
+    logging.disable(logging.WARNING)
+    result = asyncio.run(runDay(
+        seed = args.seed,
+        hours = args.hours,
+        arrival_rate = args.arrival_rate,
+        completion_rate = args.completion_rate,
+        database_uri = args.database,
+        trace_memory = args.trace_memory,
+        aging_seconds = args.aging or None,
+        max_wait_seconds = args.max_wait or None,
+        hold_seconds = args.hold or None,
+        max_hold_seconds = args.max_hold
+    ))
+    print(json.dumps(result, indent = 4))
+
+if __name__ == "__main__":
+    main()